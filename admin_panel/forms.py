@@ -2,6 +2,7 @@ from django import forms
 from django.db.models import Q
 from books.models import Book, Category, Review, Banner
 from orders.models import Order, Coupon, ShippingFee
+from orders.campaigns import MAX_CAMPAIGN_CODES, PREFIX_MAX_LENGTH, PREFIX_RE
 from rentals.models import RentalPlan, BookRental, RentalSettings
 from support.models import SupportAgent, QuickReply, ChatSettings
 from accounts.models import User
@@ -131,6 +132,29 @@ class CouponForm(forms.ModelForm):
         return cleaned_data
 
 
+class CouponCampaignForm(CouponForm):
+    """Form for creating a bulk campaign: the coupon's rules plus how many single-use codes to generate"""
+    
+    code_count = forms.IntegerField(
+        min_value=1,
+        max_value=MAX_CAMPAIGN_CODES,
+        initial=1000,
+        label='Number of codes',
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['code'].widget.attrs['placeholder'] = 'PREFIX'
+        self.fields['code'].widget.attrs['maxlength'] = PREFIX_MAX_LENGTH
+    
+    def clean_code(self):
+        code = super().clean_code()
+        if code and not PREFIX_RE.match(code):
+            raise forms.ValidationError(f"Use up to {PREFIX_MAX_LENGTH} letters and digits for the code prefix.")
+        return code
+
+
 class RentalPlanForm(forms.ModelForm):
     """Form for creating/editing rental plans with book assignment"""
     
@@ -404,10 +428,11 @@ class ShippingFeeForm(forms.ModelForm):
     
     class Meta:
         model = ShippingFee
-        fields = ['city_name', 'city_name_bn', 'fee', 'is_default', 'is_active']
+        fields = ['city_name', 'city_name_bn', 'aliases', 'fee', 'is_default', 'is_active']
         widgets = {
             'city_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'City name in English'}),
             'city_name_bn': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'City name in Bangla'}),
+            'aliases': forms.Textarea(attrs={'class': 'form-control', 'rows': 2, 'placeholder': 'e.g. Dacca, Dhaka City'}),
             'fee': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '0'}),
             'is_default': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
             'is_active': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
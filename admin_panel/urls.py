@@ -49,6 +49,8 @@ urlpatterns = [
     path('coupons/add/', views.coupon_add, name='coupon_add'),
     path('coupons/<int:pk>/edit/', views.coupon_edit, name='coupon_edit'),
     path('coupons/<int:pk>/delete/', views.coupon_delete, name='coupon_delete'),
+    path('coupons/campaigns/add/', views.coupon_campaign_add, name='coupon_campaign_add'),
+    path('coupons/<int:pk>/codes.csv', views.coupon_campaign_export, name='coupon_campaign_export'),
     
     # Rental Management
     path('rentals/', views.rental_list, name='rental_list'),
@@ -14,14 +14,27 @@ from django.db.models import Sum, Count, Q, Avg, F
 
 from django.utils import timezone
 
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 
 from datetime import timedelta, datetime
 
 from books.models import Book, Category, Review, Banner, Wishlist, Cart
 
+from books.catalog_cache import bump_catalog_version
+
+from books.search import search_queryset
+
+from books import autocomplete
+
+from books.ratings import refresh_book_ratings
+
+from books.facets import rebuild_facets
+
 from orders.models import Order, OrderItem, OrderStatusHistory, Coupon, CouponUsage, ShippingFee
 from orders.models import GiftForm, GiftCity, GiftOccasion
+from orders.inventory import InsufficientStock, release_order_stock, reserve_order_stock
+from orders.campaigns import INLINE_GENERATION_LIMIT, generate_codes as generate_campaign_codes, stream_codes_csv
+from orders.tasks import generate_campaign_codes_task
 from rentals.models import RentalPlan, BookRental, RentalStatusHistory, RentalSettings, RentalNotification, RentalFeedback
 from support.models import SupportAgent, Conversation, Message, QuickReply, ChatSettings
 
@@ -33,7 +46,7 @@ from django.core.paginator import Paginator
 
 from .forms import (
 
-    BookForm, CategoryForm, OrderStatusForm, CouponForm,
+    BookForm, CategoryForm, OrderStatusForm, CouponForm, CouponCampaignForm,
 
     RentalPlanForm, RentalStatusForm, RentalSettingsForm,
 
@@ -47,6 +60,12 @@ import json
 
 import csv
 
+import logging
+
+
+
+logger = logging.getLogger(__name__)
+
 
 
 
@@ -351,17 +370,7 @@ def book_list(request):
 
     if query:
 
-        books = books.filter(
-
-            Q(title__icontains=query) |
-
-            Q(author__icontains=query) |
-
-            Q(isbn__icontains=query) |
-
-            Q(publisher__icontains=query)
-
-        )
+        books = search_queryset(books, query)
 
     
 
@@ -725,6 +734,16 @@ def book_bulk_action(request):
 
         
 
+        # QuerySet.update() bypasses post_save, so invalidate cached catalog data here
+
+        rebuild_facets()
+
+        bump_catalog_version()
+
+        autocomplete.invalidate()
+
+        
+
         return redirect('admin_panel:book_list')
 
     
@@ -1395,6 +1414,14 @@ def order_update_status(request, order_number):
 
             order.save()
 
+            if order.status == 'cancelled':
+                release_order_stock(order, 'cancelled by staff')
+            elif old_status == 'cancelled':
+                try:
+                    reserve_order_stock(order)
+                except InsufficientStock as e:
+                    messages.warning(request, f'Order reopened, but its books are no longer in stock: {e}')
+
             
 
             # Create status history
@@ -1740,6 +1767,8 @@ def review_bulk_action(request):
 
         reviews = Review.objects.filter(id__in=review_ids)
 
+        book_ids = list(reviews.values_list('book_id', flat=True).distinct())
+
         
 
         if action == 'approve':
@@ -1764,6 +1793,14 @@ def review_bulk_action(request):
 
         
 
+        # QuerySet.update() bypasses post_save, so refresh stored ratings here
+
+        refresh_book_ratings(book_ids)
+
+        bump_catalog_version()
+
+        
+
         return redirect('admin_panel:review_list')
 
     
@@ -1931,6 +1968,51 @@ def coupon_delete(request, pk):
     return render(request, 'admin_panel/coupon_confirm_delete.html', {'coupon': coupon})
 
 
+@staff_member_required
+def coupon_campaign_add(request):
+    """Create a bulk campaign coupon and generate its single-use codes in the background"""
+    if request.method == 'POST':
+        form = CouponCampaignForm(request.POST)
+        if form.is_valid():
+            coupon = form.save(commit=False)
+            coupon.is_campaign = True
+            coupon.save()
+            count = form.cleaned_data['code_count']
+            try:
+                generate_campaign_codes_task.delay(coupon.id, count)
+            except Exception as exc:
+                logger.warning(f"Could not queue code generation for campaign {coupon.code}: {exc}")
+                if count > INLINE_GENERATION_LIMIT:
+                    # Too many to generate within the request: don't keep a campaign without codes
+                    coupon.delete()
+                    messages.error(
+                        request, f'Code generation could not be started. Try again later, or create at most {INLINE_GENERATION_LIMIT} codes.'
+                    )
+                    context = {'form': form, 'action': 'Add', 'is_campaign': True}
+                    return render(request, 'admin_panel/coupon_form.html', context)
+                generate_campaign_codes(coupon, count)
+                messages.success(request, f'Campaign "{coupon.code}" created with {count} codes.')
+                return redirect('admin_panel:coupon_list')
+            messages.success(
+                request, f'Campaign "{coupon.code}" created. Its {count} codes are being generated; export them from the coupon list.'
+            )
+            return redirect('admin_panel:coupon_list')
+    else:
+        form = CouponCampaignForm()
+
+    context = {'form': form, 'action': 'Add', 'is_campaign': True}
+    return render(request, 'admin_panel/coupon_form.html', context)
+
+
+@staff_member_required
+def coupon_campaign_export(request, pk):
+    """Stream a campaign's codes as CSV without loading them all"""
+    coupon = get_object_or_404(Coupon, pk=pk, is_campaign=True)
+    response = StreamingHttpResponse(stream_codes_csv(coupon), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="coupon_codes_{coupon.code}.csv"'
+    return response
+
+
 
 
 
@@ -5,16 +5,99 @@ from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from django.db import transaction
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
 from .models import Book, Category, Review
-from orders.models import Order
+from .search import search_queryset
+from .pagination import CURSOR_PARAM, get_keyset_ordering, keyset_page
+from .recommendations import TOP_N, recommended_books
+from orders.inventory import release_order_stock
+from orders.models import Order, OrderStatusHistory
 from .serializers import (
     BookListSerializer, BookDetailSerializer,
     CategorySerializer, ReviewSerializer, OrderSerializer
 )
 
 
+class BookSearchFilter(filters.BaseFilterBackend):
+    """
+    Search books through the catalog search index (`?search=...`)
+    
+    Results keep relevance order unless an explicit `?ordering=` is given,
+    so this backend must run after OrderingFilter.
+    """
+    
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(api_settings.SEARCH_PARAM, '')
+        if not query.strip():
+            return queryset
+        results = search_queryset(queryset, query)
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            # Re-apply the requested ordering over the relevance ordering
+            results = results.order_by(*queryset.query.order_by)
+        return results
+
+
+class BookKeysetPagination(PageNumberPagination):
+    """
+    Cursor pagination for book listings ordered by an indexed key
+    
+    `?ordering=` on created_at, price or sales (the default) pages by
+    `?cursor=` over the (field, id) indexes. Explicit `?page=` requests and
+    other orderings (e.g. search relevance, views) fall back to page numbers.
+    The response keeps the count/next/previous/results shape either way.
+    """
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_page = None
+        keyset = get_keyset_ordering(queryset.query.order_by)
+        if keyset is None or request.query_params.get(self.page_query_param):
+            return super().paginate_queryset(queryset, request, view)
+        
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        field, descending = keyset
+        self.cursor_page = keyset_page(
+            queryset, field, descending,
+            request.query_params.get(CURSOR_PARAM), page_size
+        )
+        return list(self.cursor_page)
+    
+    def _cursor_link(self, cursor):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, CURSOR_PARAM, cursor)
+    
+    def get_next_link(self):
+        if self.cursor_page is None:
+            return super().get_next_link()
+        if not self.cursor_page.has_next():
+            return None
+        return self._cursor_link(self.cursor_page.next_cursor)
+    
+    def get_previous_link(self):
+        if self.cursor_page is None:
+            return super().get_previous_link()
+        if not self.cursor_page.has_previous():
+            return None
+        return self._cursor_link(self.cursor_page.previous_cursor)
+    
+    def get_paginated_response(self, data):
+        if self.cursor_page is None:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.cursor_page.paginator.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for categories
@@ -30,9 +113,9 @@ class BookViewSet(viewsets.ReadOnlyModelViewSet):
     """
     queryset = Book.objects.filter(is_active=True)
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, BookSearchFilter]
+    pagination_class = BookKeysetPagination
     filterset_fields = ['category', 'language', 'is_featured', 'is_bestseller']
-    search_fields = ['title', 'author', 'isbn', 'publisher']
     ordering_fields = ['price', 'created_at', 'views', 'sales']
     ordering = ['-created_at']
     lookup_field = 'slug'
@@ -76,6 +159,18 @@ class BookViewSet(viewsets.ReadOnlyModelViewSet):
         books = self.queryset.order_by('-created_at')[:8]
         serializer = self.get_serializer(books, many=True)
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def recommendations(self, request, slug=None):
+        """Books customers also bought (precomputed, see books/recommendations.py)"""
+        book = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 8)), 1), TOP_N)
+        except ValueError:
+            limit = 8
+        books = recommended_books(book, limit).select_related('category')
+        serializer = BookListSerializer(books, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
 
 
 class ReviewViewSet(viewsets.ModelViewSet):
@@ -114,7 +209,16 @@ class OrderViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        order.status = 'cancelled'
-        order.save()
+        with transaction.atomic():
+            order.status = 'cancelled'
+            order.save()
+            OrderStatusHistory.objects.create(
+                order=order,
+                status='cancelled',
+                notes='Cancelled by customer (API)',
+                changed_by=request.user
+            )
+            # Return the order's reserved stock
+            release_order_stock(order, 'cancelled by customer')
         
         return Response({'message': 'Order cancelled successfully'})
@@ -0,0 +1,301 @@
+"""
+In-memory autocomplete for the navbar live search
+
+Active books are reduced to a sorted array of (term, book_id, weight) keys
+built from titles, authors and publishers in both languages (plus
+transliteration keys), and a small record per book holding what the live
+search response shows. A keystroke is answered with bisect range scans over
+that array - no database access.
+
+The index is shared between worker processes through a compressed snapshot in
+the cache. Each worker keeps a deserialized copy and only reloads it when the
+shared revision counter changes. Book saves and deletes patch the snapshot in
+place (see books/signals.py); if that is not possible the snapshot is dropped
+and the next lookup rebuilds it.
+
+The revision counter only ever moves forward with cache.incr, and every
+snapshot records the revision it was built for. A snapshot whose revision is
+not the current one is never used: a patch that raced with an invalidation is
+thrown away instead of overwriting it. A missing snapshot is rebuilt by one
+worker at a time while the others keep serving their old copy.
+"""
+import json
+import logging
+import time
+import zlib
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from .models import Book
+from .search import FIELD_WEIGHTS, INDEXED_FIELDS, index_key, query_key, query_terms, tokenize
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = 'autocomplete:snapshot'
+REVISION_KEY = 'autocomplete:revision'
+LOCK_KEY = 'autocomplete:lock'
+LOCK_TIMEOUT = 30
+BUILD_LOCK_KEY = 'autocomplete:build-lock'
+BUILD_LOCK_TIMEOUT = 120
+# How long a worker with no copy of its own waits for another worker's build
+BUILD_WAIT = 5
+BUILD_POLL_INTERVAL = 0.1
+SNAPSHOT_TIMEOUT = None  # Kept until replaced or invalidated
+
+# Fields offered as suggestions (ISBNs are left to the full search page)
+SUGGESTION_FIELDS = ('title', 'author', 'publisher')
+
+# Saving any of these columns changes what autocomplete shows
+AUTOCOMPLETE_SOURCE_FIELDS = frozenset(
+    [column for field in SUGGESTION_FIELDS for column in INDEXED_FIELDS[field]]
+    + ['price', 'cover_image', 'slug', 'is_active']
+)
+
+# Upper bound on index keys examined per query term
+SCAN_LIMIT = 5000
+DEFAULT_LIMIT = 10
+
+
+def book_record(book):
+    """The live search fields of a book, as a compact list"""
+    return [
+        book.title,
+        book.author,
+        book.publisher or '',
+        str(book.price),
+        book.cover_image.url if book.cover_image else '',
+        book.get_absolute_url(),
+        book.slug,
+    ]
+
+
+def book_keys(book):
+    """Autocomplete keys (term, book_id, weight) for a book"""
+    keys = {}
+    for field in SUGGESTION_FIELDS:
+        weight = FIELD_WEIGHTS[field]
+        for column in INDEXED_FIELDS[field]:
+            for term in tokenize(getattr(book, column, None)):
+                keys[term] = max(keys.get(term, 0), weight)
+                key = index_key(term)
+                if key:
+                    keys[key] = max(keys.get(key, 0), weight // 2)
+    return [(term, book.pk, weight) for term, weight in keys.items()]
+
+
+class AutocompleteIndex:
+    """Sorted key array plus per-book records"""
+
+    def __init__(self, keys=None, records=None, revision=0):
+        self.keys = keys or []
+        self.records = records or {}
+        self.revision = revision
+
+    @classmethod
+    def build(cls, revision=0):
+        keys = []
+        records = {}
+        books = Book.objects.filter(is_active=True).exclude(slug__isnull=True).exclude(slug='')
+        for book in books.iterator(chunk_size=1000):
+            records[book.pk] = book_record(book)
+            keys.extend(book_keys(book))
+        keys.sort()
+        return cls(keys, records, revision)
+
+    def dumps(self):
+        payload = {
+            'revision': self.revision,
+            'keys': self.keys,
+            'records': self.records,
+        }
+        return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    @classmethod
+    def loads(cls, blob):
+        payload = json.loads(zlib.decompress(blob).decode('utf-8'))
+        keys = [tuple(key) for key in payload['keys']]
+        records = {int(book_id): record for book_id, record in payload['records'].items()}
+        return cls(keys, records, payload['revision'])
+
+    def remove_book(self, book_id):
+        if self.records.pop(book_id, None) is not None:
+            self.keys = [key for key in self.keys if key[1] != book_id]
+
+    def add_book(self, book):
+        self.remove_book(book.pk)
+        self.records[book.pk] = book_record(book)
+        self.keys = sorted(self.keys + book_keys(book))
+
+    def _prefix_scores(self, prefix):
+        """Best weight per book for keys starting with prefix"""
+        scores = {}
+        keys = self.keys
+        start = bisect_left(keys, (prefix,))
+        for term, book_id, weight in keys[start:start + SCAN_LIMIT]:
+            if not term.startswith(prefix):
+                break
+            if weight > scores.get(book_id, 0):
+                scores[book_id] = weight
+        return scores
+
+    def _term_scores(self, term):
+        scores = self._prefix_scores(term)
+        key = query_key(term)
+        if key:
+            for book_id, weight in self._prefix_scores(key).items():
+                if weight > scores.get(book_id, 0):
+                    scores[book_id] = weight
+        return scores
+
+    def lookup(self, query, limit=DEFAULT_LIMIT):
+        """Best matching book IDs for a (partial) query, every term matched by prefix"""
+        totals = None
+        for term in query_terms(query):
+            scores = self._term_scores(term)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {
+                    book_id: total + scores[book_id]
+                    for book_id, total in totals.items()
+                    if book_id in scores
+                }
+            if not totals:
+                return []
+        if not totals:
+            return []
+        # Higher score first, newer books (higher IDs) break ties
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], -item[0]))
+        return [book_id for book_id, _ in ranked[:limit]]
+
+
+_local_index = None
+
+
+def get_revision():
+    """The current shared revision (created on first use)"""
+    revision = cache.get(REVISION_KEY)
+    if revision is None:
+        # Seeded from the clock so an evicted counter never repeats an old revision
+        cache.add(REVISION_KEY, int(time.time()), SNAPSHOT_TIMEOUT)
+        revision = cache.get(REVISION_KEY)
+    return revision
+
+
+def _load_snapshot(revision):
+    """The shared snapshot, if it was stored for this revision"""
+    blob = cache.get(SNAPSHOT_KEY)
+    if blob is None:
+        return None
+    index = AutocompleteIndex.loads(blob)
+    return index if index.revision == revision else None
+
+
+def _build(revision):
+    index = AutocompleteIndex.build(revision=revision)
+    # An invalidation during the build makes this copy stale: don't share it
+    if cache.get(REVISION_KEY) == revision:
+        cache.set(SNAPSHOT_KEY, index.dumps(), SNAPSHOT_TIMEOUT)
+    logger.info(f"Autocomplete index built: {len(index.records)} books, {len(index.keys)} keys")
+    return index
+
+
+def _rebuild(revision):
+    """Build the snapshot for this revision, one worker at a time"""
+    if cache.add(BUILD_LOCK_KEY, 1, BUILD_LOCK_TIMEOUT):
+        try:
+            return _build(revision)
+        finally:
+            cache.delete(BUILD_LOCK_KEY)
+    if _local_index is not None:
+        # Another worker is building: keep serving the previous copy meanwhile
+        return _local_index
+    deadline = time.monotonic() + BUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(BUILD_POLL_INTERVAL)
+        index = _load_snapshot(revision)
+        if index is not None:
+            return index
+    return AutocompleteIndex.build(revision=revision)
+
+
+def get_index():
+    """Get this process's copy of the index, reloading it if the shared snapshot changed"""
+    global _local_index
+
+    revision = get_revision()
+    if _local_index is not None and _local_index.revision == revision:
+        return _local_index
+
+    index = _load_snapshot(revision) or _rebuild(revision)
+    _local_index = index
+    return index
+
+
+def _patch_snapshot(apply):
+    """Apply a change to the shared snapshot, or drop it if another update is running"""
+    if not cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        invalidate()
+        return
+    try:
+        revision = get_revision()
+        index = _load_snapshot(revision)
+        if index is None:
+            # Nothing current to patch - the next lookup builds from the database
+            return
+        apply(index)
+        try:
+            index.revision = cache.incr(REVISION_KEY)
+        except ValueError:
+            # The revision counter was evicted: the next lookup rebuilds
+            cache.delete(SNAPSHOT_KEY)
+            return
+        if index.revision != revision + 1:
+            # Invalidated while patching: the rebuild will include this change
+            return
+        cache.set(SNAPSHOT_KEY, index.dumps(), SNAPSHOT_TIMEOUT)
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def update_book(book):
+    """Refresh one book in the shared index"""
+    if book.is_active and book.slug:
+        _patch_snapshot(lambda index: index.add_book(book))
+    else:
+        remove_book(book.pk)
+
+
+def remove_book(book_id):
+    """Remove one book from the shared index"""
+    _patch_snapshot(lambda index: index.remove_book(book_id))
+
+
+def invalidate():
+    """Drop the shared snapshot so the next lookup rebuilds it"""
+    try:
+        cache.incr(REVISION_KEY)
+    except ValueError:
+        # Evicted: the next lookup seeds a new revision
+        pass
+    cache.delete(SNAPSHOT_KEY)
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    """Live search results for a query, in the live search API format"""
+    index = get_index()
+    results = []
+    for book_id in index.lookup(query, limit):
+        title, author, publisher, price, image, url, slug = index.records[book_id]
+        results.append({
+            'id': book_id,
+            'title': title,
+            'author': author,
+            'publisher': publisher,
+            'price': price,
+            'image': image,
+            'url': url,
+            'slug': slug,
+        })
+    return results
@@ -0,0 +1,112 @@
+"""
+Cart helpers shared by the context processor, cart views and checkout
+
+The cart summary (item count and total) is computed with a single aggregate
+query and memoized in the cache under a per-cart version. Every view that
+changes the cart calls invalidate_cart(), which bumps that version.
+"""
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import DecimalField, F, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
+
+from .catalog_cache import get_catalog_version, CATALOG_CACHE_TIMEOUT
+from .models import Cart
+
+# Mirrors Book.final_price: a missing or zero discount price falls back to price
+FINAL_PRICE_EXPRESSION = Coalesce(
+    NullIf('book__discount_price', Value(0)),
+    'book__price',
+    output_field=DecimalField(max_digits=10, decimal_places=2),
+)
+
+
+def get_cart_owner(request):
+    """Get a stable identifier for the request's cart (None if there is no cart)"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    if request.session.session_key:
+        return f'session:{request.session.session_key}'
+    return None
+
+
+def get_cart_queryset(request):
+    """Get the cart rows for the current user or guest session"""
+    if request.user.is_authenticated:
+        return Cart.objects.filter(user=request.user)
+    if request.session.session_key:
+        return Cart.objects.filter(session_key=request.session.session_key)
+    return Cart.objects.none()
+
+
+def get_cart_version(owner):
+    """Get the version of a cart, bumped whenever its contents change"""
+    key = f'cart_version:{owner}'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time()), CATALOG_CACHE_TIMEOUT)
+        version = cache.get(key) or int(time.time())
+    return version
+
+
+def invalidate_cart(request):
+    """Mark the request's cart as changed so memoized summaries are rebuilt"""
+    owner = get_cart_owner(request)
+    if owner is None:
+        return
+    key = f'cart_version:{owner}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time()), CATALOG_CACHE_TIMEOUT)
+
+
+def aggregate_cart(queryset):
+    """Compute item count and total for cart rows in one query"""
+    totals = queryset.aggregate(
+        count=Sum('quantity'),
+        total=Sum(F('quantity') * FINAL_PRICE_EXPRESSION),
+    )
+    return {
+        'count': totals['count'] or 0,
+        'total': totals['total'] or Decimal('0.00'),
+    }
+
+
+class CartSummary:
+    """Lazy cart count/total - nothing is queried until a value is read"""
+
+    def __init__(self, request):
+        self.request = request
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            owner = get_cart_owner(self.request)
+            if owner is None:
+                self._data = {'count': 0, 'total': Decimal('0.00')}
+            else:
+                # Catalog version covers price edits on books already in the cart
+                key = f'cart_summary:{owner}:{get_cart_version(owner)}:{get_catalog_version()}'
+                self._data = cache.get(key)
+                if self._data is None:
+                    self._data = aggregate_cart(get_cart_queryset(self.request))
+                    cache.set(key, self._data, CATALOG_CACHE_TIMEOUT)
+        return self._data
+
+    @property
+    def count(self):
+        return self._load()['count']
+
+    @property
+    def total(self):
+        return self._load()['total']
+
+    # Bound methods below are passed to templates, which call them on first use
+    def get_count(self):
+        return self.count
+
+    def get_total(self):
+        return self.total
@@ -0,0 +1,118 @@
+"""
+Versioned cache for catalog-derived data
+
+Every cached entry is keyed by the current catalog version. Saving or
+deleting a Book, Category or Banner bumps the version (see books/signals.py), so
+entries built from the old catalog are never read again and simply expire.
+
+Orders change stock all the time, so they don't bump the catalog version.
+Stock only shows in the cached pages as in stock / out of stock, so
+reservations bump a separate stock version, and only when a book runs out or
+comes back (see orders/inventory.py). Fragments showing stock badges are
+keyed by both versions.
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models import Sum
+
+CATALOG_VERSION_KEY = 'catalog_version'
+STOCK_VERSION_KEY = 'catalog_stock_version'
+
+# Entries are invalidated by version bumps, the timeout only reclaims memory
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24  # 1 day
+
+
+def _seed_version():
+    """Seed a fresh version from the clock so an evicted counter never reuses old keys"""
+    return int(time.time())
+
+
+def get_catalog_version():
+    """Get the current catalog version (creates it on first use)"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, _seed_version(), None)
+        version = cache.get(CATALOG_VERSION_KEY) or _seed_version()
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every versioned catalog entry"""
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Counter was evicted or never created
+        version = _seed_version()
+        cache.set(CATALOG_VERSION_KEY, version, None)
+        return version
+
+
+def get_stock_version():
+    """Get the current stock availability version (creates it on first use)"""
+    version = cache.get(STOCK_VERSION_KEY)
+    if version is None:
+        cache.add(STOCK_VERSION_KEY, _seed_version(), None)
+        version = cache.get(STOCK_VERSION_KEY) or _seed_version()
+    return version
+
+
+def bump_stock_version():
+    """Retire cached fragments showing stock badges (a book ran out or came back)"""
+    try:
+        return cache.incr(STOCK_VERSION_KEY)
+    except ValueError:
+        version = _seed_version()
+        cache.set(STOCK_VERSION_KEY, version, None)
+        return version
+
+
+def catalog_cache_key(name, *parts):
+    """Build a cache key bound to the current catalog version"""
+    suffix = ':'.join(str(part) for part in parts)
+    key = f'catalog:{get_catalog_version()}:{name}'
+    return f'{key}:{suffix}' if suffix else key
+
+
+def get_or_build(name, builder, *parts, timeout=CATALOG_CACHE_TIMEOUT):
+    """Return a versioned cache entry, building and storing it on a miss"""
+    key = catalog_cache_key(name, *parts)
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, timeout)
+    return value
+
+
+def build_navigation_snapshot():
+    """Build the navbar data (categories, top authors and top publishers)"""
+    from .models import BookFacet, Category
+
+    active_categories = Category.objects.filter(is_active=True)
+    # Author/publisher counts come from the materialized facet table (books/facets.py)
+    facets = BookFacet.objects.filter(book_count__gt=0)
+    facets_with_publisher = facets.filter(publisher__isnull=False).exclude(publisher='')
+
+    return {
+        # Limit to 12 categories for navbar to prevent overflow
+        'categories': list(active_categories[:12]),
+        'all_categories_count': active_categories.count(),
+        # Limit to 15 authors/publishers for navbar
+        'nav_authors': list(
+            facets.values('author').annotate(
+                book_count=Sum('book_count')
+            ).order_by('-book_count', 'author')[:15]
+        ),
+        'all_authors_count': facets.values('author').distinct().count(),
+        'nav_publishers': list(
+            facets_with_publisher.values('publisher').annotate(
+                book_count=Sum('book_count')
+            ).order_by('-book_count', 'publisher')[:15]
+        ),
+        'all_publishers_count': facets_with_publisher.values('publisher').distinct().count(),
+    }
+
+
+def get_navigation_snapshot():
+    """Get the cached navbar data for the current catalog version"""
+    return get_or_build('navigation', build_navigation_snapshot)
@@ -1,67 +1,37 @@
 """
 Context processors for books app
 """
-from .models import Cart, Category, Book
+from django.conf import settings
+
+from .cart_utils import CartSummary, get_cart_queryset
 from .language_utils import get_current_language, get_language_display
-from django.db.models import Count
+from .catalog_cache import get_catalog_version, get_navigation_snapshot, get_stock_version
 
 
 def cart_context(request):
-    """Add cart information to context"""
-    cart_items = []
-    cart_count = 0
-    cart_total = 0
-    
-    if request.user.is_authenticated:
-        cart_items = Cart.objects.filter(user=request.user).select_related('book')
-    elif request.session.session_key:
-        cart_items = Cart.objects.filter(session_key=request.session.session_key).select_related('book')
-    
-    cart_count = sum(item.quantity for item in cart_items)
-    cart_total = sum(item.subtotal for item in cart_items)
-    
+    """Add cart information to context
+
+    Values are lazy: templates that never show the cart cost no queries, and
+    the count/total come from one memoized aggregate.
+    """
+    summary = CartSummary(request)
     return {
-        'cart_items': cart_items,
-        'cart_count': cart_count,
-        'cart_total': cart_total,
+        'cart_items': get_cart_queryset(request).select_related('book'),
+        'cart_summary': summary,
+        'cart_count': summary.get_count,
+        'cart_total': summary.get_total,
     }
 
 
 def categories_context(request):
-    """Add active categories, authors, and publishers to context"""
-    # Limit to 12 categories for navbar to prevent overflow
-    categories = Category.objects.filter(is_active=True)[:12]
-    all_categories_count = Category.objects.filter(is_active=True).count()
-    
-    # Get unique authors with book count for the site navigation (avoid clashing with
-    # view-level `authors` context variables used on listing pages)
-    # Limit to 15 authors for navbar
-    nav_authors = Book.objects.filter(is_active=True).values('author').annotate(
-        book_count=Count('id')
-    ).order_by('-book_count', 'author')[:15]
-    
-    all_authors_count = Book.objects.filter(is_active=True).values('author').distinct().count()
+    """Add active categories, authors, and publishers to context
 
-    # Get unique publishers with book count for the site navigation
-    # Limit to 15 publishers for navbar
-    nav_publishers = Book.objects.filter(is_active=True, publisher__isnull=False).exclude(
-        publisher=''
-    ).values('publisher').annotate(
-        book_count=Count('id')
-    ).order_by('-book_count', 'publisher')[:15]
-    
-    all_publishers_count = Book.objects.filter(is_active=True, publisher__isnull=False).exclude(
-        publisher=''
-    ).values('publisher').distinct().count()
-    
-    return {
-        'categories': categories,
-        'all_categories_count': all_categories_count,
-        'nav_authors': nav_authors,
-        'all_authors_count': all_authors_count,
-        'nav_publishers': nav_publishers,
-        'all_publishers_count': all_publishers_count,
-    }
+    The navbar data is cached per catalog version, so steady-state requests
+    cost no queries and admin edits show up on the next request.
+    """
+    # `nav_authors`/`nav_publishers` avoid clashing with view-level `authors`
+    # context variables used on listing pages
+    return get_navigation_snapshot()
 
 
 def language_context(request):
@@ -73,3 +43,18 @@ def language_context(request):
         'is_bangla': current_language == 'bn',
         'is_english': current_language == 'en',
     }
+
+
+def catalog_fragment_context(request):
+    """Keys for caching shared catalog fragments with `{% cache %}`
+
+    Templates cache user-neutral page bodies with
+    `{% cache catalog_fragment_timeout <name> catalog_version request.get_full_path current_language %}`,
+    so every catalog change (which bumps the version) retires them. Fragments
+    with stock badges add `stock_version`, bumped when a book runs out or comes back.
+    """
+    return {
+        'catalog_version': get_catalog_version(),
+        'stock_version': get_stock_version(),
+        'catalog_fragment_timeout': getattr(settings, 'CATALOG_FRAGMENT_TIMEOUT', 600),
+    }
@@ -0,0 +1,219 @@
+"""
+Materialized facet counts for the catalog filters
+
+BookFacet holds one row per distinct (category, language, author, publisher)
+combination of active books with the number of books in it. Book saves and
+deletes move a book between rows with +1/-1 updates (see books/signals.py), so
+the filter dropdowns, the navbar and the author/publisher directories read a
+table with one row per combination instead of grouping the books table.
+
+Counts for a listing are computed from a cached copy of that table: each
+dropdown counts the books matching every other selected filter (selecting an
+author still shows how many books the other authors have). Price range and
+rental plan filters are not facets and don't change the counts.
+"""
+import hashlib
+import json
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .catalog_cache import get_or_build
+from .models import Book, BookFacet, Category
+
+FACET_FIELDS = ('category_id', 'language', 'author', 'author_bn', 'publisher', 'publisher_bn')
+
+# Saving any of these fields can move a book to another facet row
+FACET_SOURCE_FIELDS = frozenset(['is_active', 'category', *FACET_FIELDS])
+
+
+def make_facet_key(values):
+    """Stable hash of a facet row's columns"""
+    raw = json.dumps([values[field] for field in FACET_FIELDS], ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _facet_values(get):
+    """Facet columns with empty values collapsed (so '' and NULL share a row)"""
+    values = {field: get(field) or None for field in FACET_FIELDS}
+    values['language'] = values['language'] or ''
+    values['author'] = values['author'] or ''
+    return values
+
+
+def book_facet_values(book):
+    """Facet columns of a book instance, or None if it isn't counted"""
+    if not book.is_active:
+        return None
+    return _facet_values(lambda field: getattr(book, field))
+
+
+def stored_facet_values(book_id):
+    """Facet columns of a book as currently stored, or None if it isn't counted"""
+    row = Book.objects.filter(pk=book_id, is_active=True).values(*FACET_FIELDS).first()
+    if row is None:
+        return None
+    return _facet_values(row.get)
+
+
+def adjust_facet(values, delta):
+    """Add delta books to a facet row, creating it if needed (and deleting it once empty)"""
+    key = make_facet_key(values)
+    if BookFacet.objects.filter(facet_key=key).update(book_count=F('book_count') + delta):
+        if delta < 0:
+            BookFacet.objects.filter(facet_key=key, book_count__lte=0).delete()
+        return
+    if delta <= 0:
+        return
+    try:
+        with transaction.atomic():
+            BookFacet.objects.create(facet_key=key, book_count=delta, **values)
+    except IntegrityError:
+        # Created concurrently
+        BookFacet.objects.filter(facet_key=key).update(book_count=F('book_count') + delta)
+
+
+def move_book(previous, current):
+    """Move one book between facet rows (either side may be None)"""
+    if previous == current:
+        return
+    with transaction.atomic():
+        if previous is not None:
+            adjust_facet(previous, -1)
+        if current is not None:
+            adjust_facet(current, 1)
+
+
+def rebuild_facets(book_model=Book, facet_model=BookFacet):
+    """Recount every facet row from the books table. Returns the number of rows.
+
+    Migrations pass their historical models.
+    """
+    rows = book_model.objects.filter(is_active=True).values(*FACET_FIELDS).annotate(
+        count=Count('id')
+    ).order_by()
+    totals = defaultdict(int)
+    facets = {}
+    for row in rows:
+        values = _facet_values(row.get)
+        key = make_facet_key(values)
+        facets[key] = values
+        totals[key] += row['count']
+
+    with transaction.atomic():
+        facet_model.objects.all().delete()
+        facet_model.objects.bulk_create(
+            [facet_model(facet_key=key, book_count=totals[key], **values) for key, values in facets.items()],
+            batch_size=1000,
+        )
+    return len(facets)
+
+
+def build_facet_snapshot():
+    """Facet rows plus the active categories, as plain data for the cache"""
+    categories = {
+        category['id']: category
+        for category in Category.objects.filter(is_active=True).values('id', 'slug', 'name', 'name_bn', 'order')
+    }
+    rows = list(BookFacet.objects.filter(book_count__gt=0).values_list(*FACET_FIELDS, 'book_count'))
+    return {'categories': categories, 'rows': rows}
+
+
+def get_facet_snapshot():
+    return get_or_build('facets', build_facet_snapshot)
+
+
+def category_id_for_slug(slug):
+    """Active category ID for a slug, from the facet snapshot"""
+    for category in get_facet_snapshot()['categories'].values():
+        if category['slug'] == slug:
+            return category['id']
+    return None
+
+
+def _named_counts(counts, names_bn):
+    return [
+        {'value': value, 'value_bn': names_bn.get(value), 'count': count}
+        for value, count in sorted(counts.items(), key=lambda item: item[0].casefold())
+    ]
+
+
+def build_facet_counts(category_id=None, language=None, author=None, publisher=None):
+    snapshot = get_facet_snapshot()
+    filters = {'category': category_id, 'language': language, 'author': author, 'publisher': publisher}
+
+    def matches(row, skip):
+        row_category, row_language, row_author, _, row_publisher, _, _ = row
+        values = {'category': row_category, 'language': row_language, 'author': row_author, 'publisher': row_publisher}
+        return all(
+            expected in (None, '') or values[name] == expected
+            for name, expected in filters.items() if name != skip
+        )
+
+    category_counts = defaultdict(int)
+    language_counts = defaultdict(int)
+    author_counts = defaultdict(int)
+    publisher_counts = defaultdict(int)
+    author_names_bn = {}
+    publisher_names_bn = {}
+    total = 0
+    for row in snapshot['rows']:
+        row_category, row_language, row_author, row_author_bn, row_publisher, row_publisher_bn, count = row
+        if matches(row, 'category'):
+            category_counts[row_category] += count
+        if matches(row, 'language'):
+            language_counts[row_language] += count
+        if matches(row, 'author'):
+            author_counts[row_author] += count
+            if row_author_bn:
+                author_names_bn.setdefault(row_author, row_author_bn)
+        if row_publisher and matches(row, 'publisher'):
+            publisher_counts[row_publisher] += count
+            if row_publisher_bn:
+                publisher_names_bn.setdefault(row_publisher, row_publisher_bn)
+        if matches(row, None):
+            total += count
+
+    categories = sorted(snapshot['categories'].values(), key=lambda category: (category['order'], category['name']))
+    return {
+        'total': total,
+        'categories': [
+            {**category, 'count': category_counts[category['id']]}
+            for category in categories if category_counts.get(category['id'])
+        ],
+        'languages': dict(language_counts),
+        'authors': _named_counts(author_counts, author_names_bn),
+        'publishers': _named_counts(publisher_counts, publisher_names_bn),
+    }
+
+
+def get_facet_counts(category_id=None, language=None, author=None, publisher=None):
+    """Facet counts for a listing's current filters, cached per catalog version
+
+    Returns total, categories (category dicts with a count), languages
+    (code -> count), authors and publishers (value/value_bn/count dicts).
+    """
+    parts = json.dumps([category_id, language, author, publisher], ensure_ascii=False)
+    digest = hashlib.md5(parts.encode('utf-8')).hexdigest()
+    return get_or_build(
+        'facet_counts',
+        lambda: build_facet_counts(category_id, language, author, publisher),
+        digest,
+    )
+
+
+def author_directory():
+    """Active authors with their book counts (GROUP BY over the facet table)"""
+    return BookFacet.objects.filter(book_count__gt=0).values('author', 'author_bn').annotate(
+        book_count=Sum('book_count')
+    ).order_by('author')
+
+
+def publisher_directory():
+    """Active publishers with their book counts (GROUP BY over the facet table)"""
+    return BookFacet.objects.filter(
+        book_count__gt=0, publisher__isnull=False
+    ).exclude(publisher='').values('publisher', 'publisher_bn').annotate(
+        book_count=Sum('book_count')
+    ).order_by('publisher')
@@ -0,0 +1,83 @@
+"""
+Homepage shelves
+
+The homepage (banners, category sections, featured, bestsellers and new
+arrivals) is assembled once per catalog version and language and cached as a
+whole. The category sections come from a single window-function query
+(newest books per category, ranked with ROW_NUMBER) instead of one query and
+one `.exists()` per category. Book, Category, Review and Banner changes bump
+the catalog version (see books/signals.py), so an edit shows up on the next
+request.
+"""
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .catalog_cache import get_or_build
+from .facets import get_facet_counts
+from .models import Banner, Book
+
+BANNER_LIMIT = 5
+SHELF_SIZE = 8
+CATEGORY_SECTION_LIMIT = 10
+CATEGORY_SHELF_SIZE = 4
+
+
+def storefront_books():
+    # Exclude books with missing slugs to avoid reverse URL errors in templates
+    return Book.objects.filter(is_active=True).exclude(slug__isnull=True).exclude(slug='')
+
+
+def category_shelf_books(category_ids):
+    """The newest CATEGORY_SHELF_SIZE books of each category, in one ROW_NUMBER query"""
+    return storefront_books().filter(
+        category_id__in=category_ids
+    ).annotate(
+        shelf_rank=Window(
+            expression=RowNumber(),
+            partition_by=[F('category_id')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        )
+    ).filter(shelf_rank__lte=CATEGORY_SHELF_SIZE).order_by('category_id', 'shelf_rank')
+
+
+def category_sections():
+    """Up to CATEGORY_SECTION_LIMIT categories with their newest books"""
+    # Categories with active books, from the materialized facet counts
+    categories = sorted(get_facet_counts()['categories'], key=lambda category: category['name'])
+    categories = categories[:CATEGORY_SECTION_LIMIT]
+    if not categories:
+        return []
+
+    ranked = category_shelf_books([category['id'] for category in categories])
+
+    books_by_category = {}
+    for book in ranked:
+        books_by_category.setdefault(book.category_id, []).append(book)
+
+    return [
+        {
+            'category': category,
+            'books': books_by_category[category['id']],
+        }
+        for category in categories if books_by_category.get(category['id'])
+    ]
+
+
+def build_home_shelves():
+    books = storefront_books()
+    return {
+        'banners': list(Banner.objects.filter(is_active=True).order_by('order')[:BANNER_LIMIT]),
+        'categories_with_books': category_sections(),
+        'featured_books': list(books.filter(is_featured=True)[:SHELF_SIZE]),
+        'bestsellers': list(books.filter(is_bestseller=True)[:SHELF_SIZE]),
+        'new_arrivals': list(books.order_by('-created_at')[:SHELF_SIZE]),
+    }
+
+
+def get_home_shelves(language='en'):
+    """Homepage context (everything except per-user data)
+
+    Cached per catalog version and per language, so the English and Bangla
+    homepages never share an entry.
+    """
+    return get_or_build('home_shelves', build_home_shelves, language)
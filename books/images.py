@@ -0,0 +1,217 @@
+"""
+Image derivatives for book covers, category images and banners
+
+Uploaded images are served at whatever size the admin uploaded, so each one
+also gets resized WebP and JPEG copies at fixed widths (DERIVATIVE_WIDTHS),
+stored under deterministic paths derived from the original file name:
+
+    media/derivatives/books/covers/<name>/grid.webp
+    media/derivatives/books/covers/<name>/grid.jpg
+
+A new upload gets a new file name, so a derivative URL never changes content.
+
+What was generated is recorded in the model's `image_derivatives` field:
+
+    {'cover_image': {'name': <original file name>, 'width': 1600, 'height': 2400,
+                     'derivatives': {'grid': [320, 480], 'detail': [640, 960], ...},
+                     'placeholder': 'data:image/webp;base64,...'}}
+
+so templates can pick a derivative (and know its size) without touching the
+file. Saves queue `books.tasks.generate_image_derivatives` (see
+books/signals.py); `python manage.py generate_image_derivatives` backfills
+existing media. Until a derivative exists, the original URL is used.
+"""
+import base64
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageFilter, ImageOps, UnidentifiedImageError
+
+from .models import Banner, Book, Category
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_ROOT = 'derivatives'
+
+# Derivative name -> width in pixels (images are never upscaled)
+DERIVATIVE_WIDTHS = {
+    'grid': 320,
+    'detail': 640,
+    'zoom': 1280,
+}
+
+# Format -> (file extension, Pillow save options)
+DERIVATIVE_FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+DEFAULT_FORMAT = 'jpeg'
+
+# Tiny blurred copy inlined as a data URI while the real image loads
+PLACEHOLDER_WIDTH = 16
+
+# Image fields with derivatives, per model
+IMAGE_FIELDS = {
+    Book: ('cover_image', 'image2', 'image3'),
+    Category: ('image',),
+    Banner: ('image',),
+}
+
+
+def derivative_path(name, derivative, image_format=DEFAULT_FORMAT):
+    """Storage path of one derivative of an original file name"""
+    extension = DERIVATIVE_FORMATS[image_format][0]
+    stem = os.path.splitext(name)[0]
+    return f"{DERIVATIVE_ROOT}/{stem}/{derivative}.{extension}"
+
+
+def _open_image(field_file):
+    field_file.open('rb')
+    try:
+        image = Image.open(field_file)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    finally:
+        field_file.close()
+    return image
+
+
+def _prepare(image, image_format):
+    if image_format == 'jpeg':
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # Flatten transparency onto white, as the storefront background is
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB') if image.mode != 'RGB' else image
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    return image.convert('RGBA' if image.mode in ('LA', 'P', 'PA') else 'RGB')
+
+
+def _save(storage, path, image, image_format):
+    buffer = io.BytesIO()
+    _prepare(image, image_format).save(buffer, **DERIVATIVE_FORMATS[image_format][1])
+    # Replace rather than let the storage pick a new name: paths are deterministic
+    if storage.exists(path):
+        storage.delete(path)
+    storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def placeholder_data_uri(image):
+    """A couple hundred bytes of blurred WebP to show in the image's box before it loads"""
+    width, height = image.size
+    small = _prepare(image, 'jpeg').resize(
+        (PLACEHOLDER_WIDTH, max(1, round(height * PLACEHOLDER_WIDTH / width))), Image.BILINEAR
+    ).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    small.save(buffer, format='WEBP', quality=30)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def render_derivatives(field_file):
+    """Write every derivative of one image file and return its metadata"""
+    image = _open_image(field_file)
+    width, height = image.size
+    derivatives = {}
+    for derivative, target_width in DERIVATIVE_WIDTHS.items():
+        derivative_width = min(target_width, width)
+        derivative_height = max(1, round(height * derivative_width / width))
+        resized = image
+        if derivative_width != width:
+            resized = image.resize((derivative_width, derivative_height), Image.LANCZOS)
+        for image_format in DERIVATIVE_FORMATS:
+            _save(field_file.storage, derivative_path(field_file.name, derivative, image_format), resized, image_format)
+        derivatives[derivative] = [derivative_width, derivative_height]
+    return {
+        'name': field_file.name,
+        'width': width,
+        'height': height,
+        'derivatives': derivatives,
+        'placeholder': placeholder_data_uri(image),
+    }
+
+
+def delete_derivatives(storage, name):
+    for derivative in DERIVATIVE_WIDTHS:
+        for image_format in DERIVATIVE_FORMATS:
+            path = derivative_path(name, derivative, image_format)
+            if storage.exists(path):
+                storage.delete(path)
+
+
+def stale_image_fields(instance):
+    """Image fields whose recorded derivatives don't match the current file"""
+    recorded = instance.image_derivatives or {}
+    stale = []
+    for field_name in IMAGE_FIELDS.get(type(instance), ()):
+        name = getattr(instance, field_name).name or None
+        if (recorded.get(field_name) or {}).get('name') != name:
+            stale.append(field_name)
+    return stale
+
+
+def uploaded_image_fields(instance):
+    """Image fields holding a new upload that is about to be written
+
+    A new upload may reuse an old file name, so it isn't always stale by name.
+    """
+    return [
+        field_name for field_name in IMAGE_FIELDS.get(type(instance), ())
+        if getattr(instance, field_name) and not getattr(instance, field_name)._committed
+    ]
+
+
+def generate_derivatives(instance, field_names=(), force=False):
+    """Bring an instance's derivatives up to date with its image fields
+
+    Stale fields and the given field_names (or every field, with force) are
+    regenerated. Writes the metadata with a queryset update (no save
+    signals). Returns True when anything changed.
+    """
+    recorded = dict(instance.image_derivatives or {})
+    stale = IMAGE_FIELDS[type(instance)] if force else stale_image_fields(instance)
+    field_names = [name for name in IMAGE_FIELDS[type(instance)] if name in stale or name in field_names]
+    for field_name in field_names:
+        field_file = getattr(instance, field_name)
+        previous = recorded.pop(field_name, None)
+        if previous and previous.get('name') != field_file.name:
+            delete_derivatives(field_file.storage, previous['name'])
+        if not field_file:
+            continue
+        try:
+            recorded[field_name] = render_derivatives(field_file)
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+            logger.warning(f"Could not create derivatives for {field_file.name}: {exc}")
+            # Recorded without derivatives so every save doesn't retry; --force does
+            recorded[field_name] = {'name': field_file.name, 'derivatives': {}}
+
+    if recorded == (instance.image_derivatives or {}):
+        return False
+    type(instance).objects.filter(pk=instance.pk).update(image_derivatives=recorded)
+    instance.image_derivatives = recorded
+    return True
+
+
+def derivative_info(field_file):
+    """Recorded metadata for a model image field, or None if not generated yet"""
+    instance = getattr(field_file, 'instance', None)
+    if not field_file or instance is None:
+        return None
+    info = (getattr(instance, 'image_derivatives', None) or {}).get(field_file.field.name)
+    if not info or info.get('name') != field_file.name:
+        return None
+    return info
+
+
+def derivative_url(field_file, derivative, image_format=DEFAULT_FORMAT):
+    """URL of a derivative, falling back to the original image"""
+    if not field_file:
+        return ''
+    info = derivative_info(field_file)
+    if info is None or derivative not in info['derivatives']:
+        return field_file.url
+    return field_file.storage.url(derivative_path(field_file.name, derivative, image_format))
@@ -0,0 +1,22 @@
+"""
+Recompute stored book rating summaries from approved reviews
+
+Usage: python manage.py backfill_book_ratings
+"""
+from django.core.management.base import BaseCommand
+
+from books.catalog_cache import bump_catalog_version
+from books.ratings import rebuild_all_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute Book.rating_avg and Book.rating_count from approved reviews'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Books per aggregate query')
+
+    def handle(self, *args, **options):
+        updated = rebuild_all_ratings(batch_size=options['batch_size'])
+        if updated:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Updated ratings for {updated} books'))
@@ -0,0 +1,76 @@
+"""
+Benchmark the co-purchase counting and ranking
+
+Generates a synthetic order history (popularity follows a long tail, like real
+sales) and times the same code the index build runs, without touching the
+database. --from-db times streaming the real OrderItem table instead.
+
+Usage: python manage.py benchmark_co_purchase [--items 1000000] [--books 20000] [--from-db]
+"""
+import itertools
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from books.recommendations import TOP_N, CoPurchaseCounts, rank_recommendations, stream_order_items
+
+
+def synthetic_order_items(items, books, basket_size, seed):
+    """(order_id, book_id) rows sorted by order_id, with long-tail book popularity"""
+    rng = random.Random(seed)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, books + 1)))
+    population = list(range(1, books + 1))
+    order_id, produced = 0, 0
+    while produced < items:
+        order_id += 1
+        size = min(max(1, int(rng.expovariate(1 / basket_size)) + 1), items - produced)
+        for book_id in rng.choices(population, cum_weights=cum_weights, k=size):
+            yield order_id, book_id
+        produced += size
+
+
+class Command(BaseCommand):
+    help = 'Time co-purchase counting and top-N ranking over 1M+ order items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1_000_000, help='Synthetic order items')
+        parser.add_argument('--books', type=int, default=20_000, help='Synthetic catalog size')
+        parser.add_argument('--basket', type=float, default=2.5, help='Average books per order')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--from-db', action='store_true', help='Stream the real OrderItem table')
+        parser.add_argument('--memory', action='store_true', help='Also report peak memory (slower)')
+
+    def handle(self, *args, **options):
+        if options['from_db']:
+            rows = stream_order_items()
+            source = 'OrderItem table'
+        else:
+            rows = synthetic_order_items(options['items'], options['books'], options['basket'], options['seed'])
+            source = f"synthetic ({options['items']:,} items, {options['books']:,} books)"
+
+        if options['memory']:
+            tracemalloc.start()
+
+        started = time.perf_counter()
+        counts = CoPurchaseCounts().consume(rows)
+        counted = time.perf_counter()
+
+        partners = counts.adjacency()
+        ranked = sum(
+            len(rank_recommendations(book_id, partners[book_id], counts.purchases, TOP_N))
+            for book_id in counts.purchases
+        )
+        finished = time.perf_counter()
+
+        self.stdout.write(f'Source: {source}')
+        self.stdout.write(f'Orders: {counts.orders:,}  items: {counts.items:,}  books: {len(counts.purchases):,}')
+        self.stdout.write(f'Co-purchase pairs: {len(counts.pairs):,}  recommendations: {ranked:,}')
+        self.stdout.write(f'Reading + counting: {counted - started:.2f}s ({counts.items / max(counted - started, 1e-9):,.0f} items/s)')
+        self.stdout.write(f'Ranking: {finished - counted:.2f}s')
+        if options['memory']:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(f'Peak memory: {peak / 1024 / 1024:.1f} MB')
+        self.stdout.write(self.style.SUCCESS(f'Total: {finished - started:.2f}s'))
@@ -0,0 +1,36 @@
+"""
+Build the static asset bundles and collect them with hashed, pre-compressed copies
+
+Usage: python manage.py build_assets [--no-collect] [--clear]
+"""
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from books.assets import brotli, build_bundles, bundle_path
+
+
+class Command(BaseCommand):
+    help = 'Concatenate and minify ASSET_BUNDLES, then collectstatic with hashed names and .gz/.br files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-collect', action='store_true', help='Only build the bundles under static/bundles/')
+        parser.add_argument('--clear', action='store_true', help='Empty STATIC_ROOT before collecting')
+
+    def handle(self, *args, **options):
+        for name, source_size, bundle_size in build_bundles():
+            self.stdout.write(
+                f'{bundle_path(name)}: {source_size / 1024:.1f} KB -> {bundle_size / 1024:.1f} KB'
+            )
+        if options['no_collect']:
+            return
+
+        call_command(
+            'collectstatic', interactive=False, clear=options['clear'],
+            verbosity=max(options['verbosity'] - 1, 0), stdout=self.stdout, stderr=self.stderr,
+        )
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('brotli is not installed: wrote .gz files only'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Static files collected to {settings.STATIC_ROOT} (manifest: staticfiles.json)'
+        ))
@@ -0,0 +1,27 @@
+"""
+Build the co-purchase recommendation index from order history
+
+Usage: python manage.py build_co_purchase_index [--full]
+"""
+from django.core.management.base import BaseCommand
+
+from books.recommendations import TOP_N, build_co_purchase_index
+
+
+class Command(BaseCommand):
+    help = 'Count co-purchases from OrderItem history and store the top recommendations per book'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recount every order instead of only orders since the last run',
+        )
+        parser.add_argument('--top', type=int, default=TOP_N, help='Recommendations to keep per book')
+
+    def handle(self, *args, **options):
+        run = build_co_purchase_index(full=options['full'], top_n=options['top'])
+        kind = 'Full rebuild' if run.full else 'Update'
+        self.stdout.write(self.style.SUCCESS(
+            f'{kind}: {run.orders} orders, {run.items} items, up to order {run.last_order_id}'
+        ))
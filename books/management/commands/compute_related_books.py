@@ -0,0 +1,30 @@
+"""
+Compute the precomputed "related books" neighbors
+
+Usage: python manage.py compute_related_books [--full]
+"""
+from django.core.management.base import BaseCommand
+
+from books.catalog_cache import bump_catalog_version
+from books.related import TOP_K, compute_related_books, update_related_books
+
+
+class Command(BaseCommand):
+    help = 'Compute related books (TF-IDF content similarity blended with co-purchases)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute every book instead of only books without neighbors',
+        )
+        parser.add_argument('--top', type=int, default=TOP_K, help='Neighbors to keep per book')
+
+    def handle(self, *args, **options):
+        if options['full']:
+            processed = compute_related_books(top_k=options['top'])
+        else:
+            processed = update_related_books(top_k=options['top'])
+        if processed:
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Computed related books for {processed} books'))
@@ -0,0 +1,137 @@
+"""
+Show the database query plan of each storefront catalog query
+
+Usage: python manage.py explain_catalog_queries [--query NAME] [--sql] [--strict]
+
+Each query is built the same way the storefront views build it, then run
+through EXPLAIN. Plans that scan the whole books table or sort without an
+index are flagged, so a missing or unused index shows up after a change.
+
+Run it against MySQL: SQLite filters boolean columns without a comparison and
+so never uses the is_active indexes, which makes its plans misleading.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from books.home_shelves import CATEGORY_SECTION_LIMIT, SHELF_SIZE, category_shelf_books
+from books.models import Book, Category
+from books.pagination import CATALOG_SORTS, get_sort_ordering
+from books.search import search_queryset
+
+SAMPLE_SEARCH = 'book'
+
+
+def storefront_books():
+    """Base queryset shared by the storefront listings"""
+    return Book.objects.filter(is_active=True).exclude(slug__isnull=True).exclude(slug='')
+
+
+def storefront_queries():
+    """(name, queryset) for every catalog query shape the storefront runs"""
+    books = storefront_books()
+    category = Category.objects.filter(is_active=True).first()
+    category_id = category.pk if category else 0
+    shelf_category_ids = list(
+        Category.objects.filter(is_active=True).order_by('name').values_list('pk', flat=True)[:CATEGORY_SECTION_LIMIT]
+    ) or [0]
+    sample = Book.objects.filter(is_active=True).values('author', 'publisher', 'language').first() or {}
+
+    queries = [
+        ('home: featured', books.filter(is_featured=True)[:SHELF_SIZE]),
+        ('home: bestsellers', books.filter(is_bestseller=True)[:SHELF_SIZE]),
+        ('home: new arrivals', books.order_by('-created_at')[:SHELF_SIZE]),
+        # The categories themselves come from the cached facet snapshot
+        ('home: category shelves', category_shelf_books(shelf_category_ids)),
+    ]
+
+    seen = set()
+    for sort, ordering in CATALOG_SORTS.items():
+        if tuple(ordering) in seen:
+            continue
+        seen.add(tuple(ordering))
+        queries.append((f'book_list: sort={sort}', books.order_by(*get_sort_ordering(sort))[:12]))
+
+    queries += [
+        ('book_list: category', books.filter(category_id=category_id).order_by('-created_at')[:12]),
+        ('book_list: language', books.filter(language=sample.get('language', 'en')).order_by('-created_at')[:12]),
+        ('book_list: author', books.filter(author=sample.get('author', '')).order_by('-created_at')[:12]),
+        ('book_list: publisher', books.filter(publisher=sample.get('publisher') or '').order_by('-created_at')[:12]),
+        ('book_list: price range', books.filter(price__gte=100, price__lte=500).order_by('price')[:12]),
+        ('category_books', books.filter(category_id=category_id).order_by('-created_at')[:12]),
+        ('search_books', search_queryset(Book.objects.filter(is_active=True), SAMPLE_SEARCH)[:12]),
+        ('api: books', Book.objects.filter(is_active=True).order_by('-created_at')[:20]),
+    ]
+    return queries
+
+
+def explain(queryset):
+    """Plan rows for a queryset as a list of dicts (column -> value)"""
+    sql, params = queryset.query.sql_with_params()
+    prefix = 'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        columns = [column[0].lower() for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def plan_warnings(rows):
+    """Full table scans and unindexed sorts in a plan
+
+    Reading a derived table (the ranked rows of a window query) back is not
+    flagged: it holds only the rows the inner query selected.
+    """
+    warnings = []
+    for row in rows:
+        if connection.vendor == 'mysql':
+            table = row.get('table')
+            extra = row.get('extra') or ''
+            if row.get('type') == 'ALL' and not str(table).startswith('<derived'):
+                warnings.append(f'full scan of {table}')
+            if 'Using filesort' in extra:
+                warnings.append(f'filesort on {table}')
+            if 'Using temporary' in extra:
+                warnings.append(f'temporary table for {table}')
+        elif connection.vendor == 'sqlite':
+            detail = row.get('detail') or ''
+            derived = detail.startswith(('SCAN (subquery', 'SCAN qualify'))
+            if detail.startswith('SCAN') and 'INDEX' not in detail and not derived:
+                warnings.append(detail.lower())
+            if 'TEMP B-TREE' in detail:
+                warnings.append(detail.lower())
+    return warnings
+
+
+def format_row(row):
+    return '  '.join(f'{column}={value}' for column, value in row.items() if value not in (None, ''))
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the storefront catalog queries and flag table scans and unindexed sorts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--query', help='Only explain queries whose name contains this text')
+        parser.add_argument('--sql', action='store_true', help='Print the SQL of each query')
+        parser.add_argument('--strict', action='store_true', help='Exit with an error if any plan is flagged')
+
+    def handle(self, *args, **options):
+        flagged = 0
+        for name, queryset in storefront_queries():
+            if options['query'] and options['query'] not in name:
+                continue
+
+            rows = explain(queryset)
+            warnings = plan_warnings(rows)
+            style = self.style.WARNING if warnings else self.style.SUCCESS
+            self.stdout.write(style(f'== {name}'))
+            if options['sql']:
+                self.stdout.write(f'   {queryset.query}')
+            for row in rows:
+                self.stdout.write(f'   {format_row(row)}')
+            for warning in warnings:
+                self.stdout.write(self.style.WARNING(f'   ! {warning}'))
+            flagged += bool(warnings)
+
+        summary = f'{flagged} flagged quer{"y" if flagged == 1 else "ies"} ({connection.vendor})'
+        if flagged and options['strict']:
+            raise CommandError(summary)
+        self.stdout.write(summary)
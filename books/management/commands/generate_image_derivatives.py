@@ -0,0 +1,44 @@
+"""
+Create resized derivatives for existing book, category and banner images
+
+Usage: python manage.py generate_image_derivatives [--model book] [--force] [--queue]
+"""
+from django.core.management.base import BaseCommand
+
+from books.catalog_cache import bump_catalog_version
+from books.images import IMAGE_FIELDS, generate_derivatives, stale_image_fields
+
+
+class Command(BaseCommand):
+    help = 'Backfill WebP/JPEG derivatives (grid, detail, zoom) for existing images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            choices=[model._meta.model_name for model in IMAGE_FIELDS],
+            help='Only process this model',
+        )
+        parser.add_argument('--force', action='store_true', help='Regenerate derivatives that already exist')
+        parser.add_argument('--queue', action='store_true', help='Queue Celery tasks instead of resizing here')
+
+    def handle(self, *args, **options):
+        from books.tasks import generate_image_derivatives
+
+        processed = 0
+        for model in IMAGE_FIELDS:
+            if options['model'] and model._meta.model_name != options['model']:
+                continue
+            for instance in model.objects.order_by('pk').iterator(chunk_size=200):
+                if not options['force'] and not stale_image_fields(instance):
+                    continue
+                if options['queue']:
+                    generate_image_derivatives.delay(model._meta.label_lower, instance.pk, force=options['force'])
+                elif not generate_derivatives(instance, force=options['force']):
+                    continue
+                processed += 1
+            self.stdout.write(f'{model._meta.verbose_name_plural}: done')
+
+        if processed and not options['queue']:
+            bump_catalog_version()
+        verb = 'Queued' if options['queue'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f'{verb} derivatives for {processed} objects'))
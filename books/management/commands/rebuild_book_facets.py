@@ -0,0 +1,18 @@
+"""
+Recount the materialized catalog facets
+
+Usage: python manage.py rebuild_book_facets
+"""
+from django.core.management.base import BaseCommand
+
+from books.catalog_cache import bump_catalog_version
+from books.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the BookFacet counts (category/language/author/publisher) from the books table'
+
+    def handle(self, *args, **options):
+        rows = rebuild_facets()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} facet rows'))
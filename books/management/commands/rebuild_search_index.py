@@ -0,0 +1,19 @@
+"""
+Rebuild the catalog search index
+
+Usage: python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+
+from books.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the BookSearchTerm index for every book'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} books'))
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def index_books(apps, schema_editor):
+    from books.search import rebuild_index
+
+    rebuild_index(
+        apps.get_model('books', 'Book').objects.all(), term_model=apps.get_model('books', 'BookSearchTerm'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_book_author_bn_book_description_bn_book_publisher_bn_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, verbose_name='Term')),
+                ('field', models.CharField(choices=[('title', 'Title'), ('author', 'Author'), ('publisher', 'Publisher'), ('isbn', 'ISBN')], max_length=20, verbose_name='Field')),
+                ('weight', models.PositiveSmallIntegerField(default=1, verbose_name='Weight')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='books.book')),
+            ],
+            options={
+                'verbose_name': 'Book Search Term',
+                'verbose_name_plural': 'Book Search Terms',
+                'indexes': [models.Index(fields=['term', 'book'], name='books_books_term_ca50ad_idx')],
+                'unique_together': {('book', 'term', 'field')},
+            },
+        ),
+        migrations.RunPython(index_books, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:04
+
+from django.db import migrations, models
+
+
+def summarize_ratings(apps, schema_editor):
+    from books.ratings import rebuild_all_ratings
+
+    rebuild_all_ratings(book_model=apps.get_model('books', 'Book'), review_model=apps.get_model('books', 'Review'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_booksearchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='rating_avg',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=2, verbose_name='Average Rating'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Approved Reviews'),
+        ),
+        migrations.RunPython(summarize_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0005_book_rating_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_active', 'created_at', 'id'], name='book_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_active', 'price', 'id'], name='book_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_active', 'sales', 'id'], name='book_active_sales_idx'),
+        ),
+    ]
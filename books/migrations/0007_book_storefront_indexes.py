@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_book_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_active', 'views', 'sales'], name='book_active_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_active', 'title'], name='book_active_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['category', 'is_active', 'created_at'], name='book_category_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_featured', 'is_active', 'created_at'], name='book_featured_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_bestseller', 'is_active', 'created_at'], name='book_bestseller_idx'),
+        ),
+    ]
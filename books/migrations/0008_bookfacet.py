@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_facets(apps, schema_editor):
+    from books.facets import rebuild_facets
+
+    rebuild_facets(apps.get_model('books', 'Book'), apps.get_model('books', 'BookFacet'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_book_storefront_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('language', models.CharField(max_length=10, verbose_name='Language')),
+                ('author', models.CharField(max_length=300, verbose_name='Author')),
+                ('author_bn', models.CharField(blank=True, max_length=300, null=True, verbose_name='Author (Bangla)')),
+                ('publisher', models.CharField(blank=True, max_length=300, null=True, verbose_name='Publisher')),
+                ('publisher_bn', models.CharField(blank=True, max_length=300, null=True, verbose_name='Publisher (Bangla)')),
+                ('facet_key', models.CharField(max_length=40, unique=True)),
+                ('book_count', models.IntegerField(default=0, verbose_name='Books')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='book_facets', to='books.category')),
+            ],
+            options={
+                'verbose_name': 'Book Facet',
+                'verbose_name_plural': 'Book Facets',
+            },
+        ),
+        migrations.RunPython(count_facets, migrations.RunPython.noop),
+    ]
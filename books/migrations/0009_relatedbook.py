@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_bookfacet'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedBook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Rank')),
+                ('score', models.FloatField(verbose_name='Similarity')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='books.book')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbor_of', to='books.book')),
+            ],
+            options={
+                'verbose_name': 'Related Book',
+                'verbose_name_plural': 'Related Books',
+                'ordering': ['book', 'rank'],
+                'unique_together': {('book', 'rank')},
+            },
+        ),
+    ]
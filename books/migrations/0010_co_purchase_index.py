@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_relatedbook'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoPurchaseRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('full', models.BooleanField(default=False, verbose_name='Full Rebuild')),
+                ('last_order_id', models.BigIntegerField(default=0, verbose_name='Last Order ID')),
+                ('orders', models.PositiveIntegerField(default=0, verbose_name='Orders Processed')),
+                ('items', models.PositiveIntegerField(default=0, verbose_name='Items Processed')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Co-purchase Run',
+                'verbose_name_plural': 'Co-purchase Runs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BookRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Rank')),
+                ('score', models.FloatField(verbose_name='Similarity')),
+                ('orders', models.PositiveIntegerField(verbose_name='Orders Together')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='books.book')),
+                ('recommended', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_with', to='books.book')),
+            ],
+            options={
+                'verbose_name': 'Book Recommendation',
+                'verbose_name_plural': 'Book Recommendations',
+                'ordering': ['book', 'rank'],
+                'unique_together': {('book', 'rank')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BookCoPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField(default=0, verbose_name='Orders')),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='co_purchases', to='books.book')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='books.book')),
+            ],
+            options={
+                'verbose_name': 'Book Co-purchase',
+                'verbose_name_plural': 'Book Co-purchases',
+                'unique_together': {('book', 'other')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0010_co_purchase_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='banner',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Image Derivatives'),
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Image Derivatives'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Image Derivatives'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:31
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0011_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cart',
+            name='quantity',
+            field=models.IntegerField(default=1, help_text='Maximum 10 pieces per book', validators=[django.core.validators.MinValueValidator(1, message='Quantity must be at least 1.'), django.core.validators.MaxValueValidator(10, message='You cannot order more than 10 pieces of the same book.')]),
+        ),
+    ]
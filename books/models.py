@@ -1,4 +1,5 @@
 from django.db import models
+from django.urls import reverse
 from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
@@ -31,6 +32,8 @@ class Category(models.Model):
     slug = models.SlugField(max_length=200, unique=True, blank=True, allow_unicode=True)
     description = models.TextField(blank=True, verbose_name='Description')
     image = models.ImageField(upload_to='categories/', null=True, blank=True, verbose_name='Category Image')
+    # Resized copies of the image, written by books/images.py
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Image Derivatives')
     is_active = models.BooleanField(default=True, verbose_name='Active')
     order = models.IntegerField(default=0, verbose_name='Display Order')
     
@@ -101,6 +104,8 @@ class Book(models.Model):
     cover_image = models.ImageField(upload_to='books/covers/', verbose_name='Cover Image')
     image2 = models.ImageField(upload_to='books/', null=True, blank=True, verbose_name='Image 2')
     image3 = models.ImageField(upload_to='books/', null=True, blank=True, verbose_name='Image 3')
+    # Resized copies of the images above, written by books/images.py
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Image Derivatives')
     
     # Book Details
     pages = models.IntegerField(null=True, blank=True, verbose_name='Number of Pages')
@@ -116,6 +121,10 @@ class Book(models.Model):
     views = models.IntegerField(default=0, verbose_name='Views')
     sales = models.IntegerField(default=0, verbose_name='Total Sales')
     
+    # Approved review summary, kept current by books/ratings.py
+    rating_avg = models.DecimalField(max_digits=2, decimal_places=1, default=0, verbose_name='Average Rating')
+    rating_count = models.PositiveIntegerField(default=0, verbose_name='Approved Reviews')
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -123,6 +132,18 @@ class Book(models.Model):
         verbose_name = 'Book'
         verbose_name_plural = 'Books'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the catalog listings (books/pagination.py)
+            models.Index(fields=['is_active', 'created_at', 'id'], name='book_active_created_idx'),
+            models.Index(fields=['is_active', 'price', 'id'], name='book_active_price_idx'),
+            models.Index(fields=['is_active', 'sales', 'id'], name='book_active_sales_idx'),
+            # Remaining storefront sorts and shelves (see `manage.py explain_catalog_queries`)
+            models.Index(fields=['is_active', 'views', 'sales'], name='book_active_popular_idx'),
+            models.Index(fields=['is_active', 'title'], name='book_active_title_idx'),
+            models.Index(fields=['category', 'is_active', 'created_at'], name='book_category_active_idx'),
+            models.Index(fields=['is_featured', 'is_active', 'created_at'], name='book_featured_idx'),
+            models.Index(fields=['is_bestseller', 'is_active', 'created_at'], name='book_bestseller_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -182,6 +203,9 @@ class Book(models.Model):
         
         super().save(*args, **kwargs)
     
+    def get_absolute_url(self):
+        return reverse('books:book_detail', args=[self.slug])
+    
     @property
     def is_in_stock(self):
         return self.stock > 0
@@ -198,14 +222,145 @@ class Book(models.Model):
     
     @property
     def average_rating(self):
-        reviews = self.reviews.filter(is_approved=True)
-        if reviews.exists():
-            return round(reviews.aggregate(models.Avg('rating'))['rating__avg'], 1)
-        return 0
+        return float(self.rating_avg)
     
     @property
     def total_reviews(self):
-        return self.reviews.filter(is_approved=True).count()
+        return self.rating_count
+
+
+class BookSearchTerm(models.Model):
+    """Inverted search index entry - one normalized term from one field of a book
+    
+    Maintained on Book save (see books/signals.py) and rebuilt with
+    `python manage.py rebuild_search_index`. Queried through books/search.py.
+    """
+    
+    FIELD_CHOICES = [
+        ('title', 'Title'),
+        ('author', 'Author'),
+        ('publisher', 'Publisher'),
+        ('isbn', 'ISBN'),
+    ]
+    
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=100, verbose_name='Term')
+    field = models.CharField(max_length=20, choices=FIELD_CHOICES, verbose_name='Field')
+    weight = models.PositiveSmallIntegerField(default=1, verbose_name='Weight')
+    
+    class Meta:
+        verbose_name = 'Book Search Term'
+        verbose_name_plural = 'Book Search Terms'
+        unique_together = ['book', 'term', 'field']
+        indexes = [
+            models.Index(fields=['term', 'book']),
+        ]
+    
+    def __str__(self):
+        return f"{self.term} ({self.field}) -> {self.book_id}"
+
+
+class BookFacet(models.Model):
+    """Number of active books sharing one category/language/author/publisher combination
+
+    Kept current on Book save and delete (see books/signals.py) and rebuilt with
+    `python manage.py rebuild_book_facets`. Read through books/facets.py.
+    """
+
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='book_facets')
+    language = models.CharField(max_length=10, verbose_name='Language')
+    author = models.CharField(max_length=300, verbose_name='Author')
+    author_bn = models.CharField(max_length=300, null=True, blank=True, verbose_name='Author (Bangla)')
+    publisher = models.CharField(max_length=300, null=True, blank=True, verbose_name='Publisher')
+    publisher_bn = models.CharField(max_length=300, null=True, blank=True, verbose_name='Publisher (Bangla)')
+    # Hash of the columns above (they are too long for a composite unique index)
+    facet_key = models.CharField(max_length=40, unique=True)
+    book_count = models.IntegerField(default=0, verbose_name='Books')
+
+    class Meta:
+        verbose_name = 'Book Facet'
+        verbose_name_plural = 'Book Facets'
+
+    def __str__(self):
+        return f"{self.author} / {self.publisher} / {self.language}: {self.book_count}"
+
+
+class RelatedBook(models.Model):
+    """Precomputed "related books" neighbor of a book, ranked by similarity
+
+    Written by `python manage.py compute_related_books` (see books/related.py).
+    """
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='neighbors')
+    related = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='neighbor_of')
+    rank = models.PositiveSmallIntegerField(verbose_name='Rank')
+    score = models.FloatField(verbose_name='Similarity')
+
+    class Meta:
+        verbose_name = 'Related Book'
+        verbose_name_plural = 'Related Books'
+        unique_together = ['book', 'rank']
+        ordering = ['book', 'rank']
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.related_id} ({self.score:.3f})"
+
+
+class BookCoPurchase(models.Model):
+    """Number of orders containing both books (one row per direction)
+
+    The row with other == book holds the number of orders containing the book.
+    Written by `python manage.py build_co_purchase_index` (see books/recommendations.py).
+    """
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='co_purchases')
+    other = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    orders = models.PositiveIntegerField(default=0, verbose_name='Orders')
+
+    class Meta:
+        verbose_name = 'Book Co-purchase'
+        verbose_name_plural = 'Book Co-purchases'
+        unique_together = ['book', 'other']
+
+    def __str__(self):
+        return f"{self.book_id} + {self.other_id}: {self.orders}"
+
+
+class BookRecommendation(models.Model):
+    """Precomputed "customers who bought this also bought" entry for a book"""
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommended_with')
+    rank = models.PositiveSmallIntegerField(verbose_name='Rank')
+    score = models.FloatField(verbose_name='Similarity')
+    orders = models.PositiveIntegerField(verbose_name='Orders Together')
+
+    class Meta:
+        verbose_name = 'Book Recommendation'
+        verbose_name_plural = 'Book Recommendations'
+        unique_together = ['book', 'rank']
+        ordering = ['book', 'rank']
+
+    def __str__(self):
+        return f"{self.book_id} -> {self.recommended_id} ({self.score:.3f})"
+
+
+class CoPurchaseRun(models.Model):
+    """One co-purchase index build; the latest run's last_order_id is where the next update resumes"""
+
+    full = models.BooleanField(default=False, verbose_name='Full Rebuild')
+    last_order_id = models.BigIntegerField(default=0, verbose_name='Last Order ID')
+    orders = models.PositiveIntegerField(default=0, verbose_name='Orders Processed')
+    items = models.PositiveIntegerField(default=0, verbose_name='Items Processed')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Co-purchase Run'
+        verbose_name_plural = 'Co-purchase Runs'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{'Full' if self.full else 'Update'} up to order {self.last_order_id}"
 
 
 class Review(models.Model):
@@ -308,6 +463,8 @@ class Banner(models.Model):
     title = models.CharField(max_length=200, verbose_name='Title')
     subtitle = models.CharField(max_length=300, null=True, blank=True, verbose_name='Subtitle')
     image = models.ImageField(upload_to='banners/', verbose_name='Banner Image')
+    # Resized copies of the image, written by books/images.py
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False, verbose_name='Image Derivatives')
     link = models.URLField(null=True, blank=True, verbose_name='Link URL')
     button_text = models.CharField(max_length=50, null=True, blank=True, verbose_name='Button Text')
     is_active = models.BooleanField(default=True, verbose_name='Active')
@@ -0,0 +1,137 @@
+"""
+Text normalization for catalog search
+
+The same pipeline runs when a book is indexed and when a query is parsed, so
+variants of a word end up as the same index term:
+- Unicode NFKC normalization (composed/decomposed Bangla, compatibility forms)
+- Zero-width joiners/non-joiners and other invisible characters removed
+- Bangla digits folded to ASCII digits (so ISBNs match in either script)
+- Case folding
+
+Bangla words can also produce a transliteration key - a Latin consonant
+skeleton - so an English query like "gitanjali" finds "গীতাঞ্জলি".
+"""
+import re
+import unicodedata
+
+# ZWSP, ZWNJ, ZWJ, word joiner, BOM and soft hyphen
+INVISIBLE_CHARACTERS = dict.fromkeys(map(ord, '\u200b\u200c\u200d\u2060\ufeff\u00ad'))
+
+# Bangla digits ০-৯ -> 0-9
+BANGLA_DIGITS = {ord('\u09e6') + i: str(i) for i in range(10)}
+
+BANGLA_RE = re.compile(r'[\u0980-\u09FF]')
+ISBN_QUERY_RE = re.compile(r'^[\dXx\-\s]+$')
+ISBN_MIN_DIGITS = 4
+
+# Marks transliteration keys in the index so they never collide with real words
+TRANSLITERATION_KEY_PREFIX = '~'
+TRANSLITERATION_KEY_MIN_LENGTH = 2
+
+# Nukta letters (after NFKC they are base letter + U+09BC)
+BANGLA_NUKTA_LETTERS = {
+    '\u09a1\u09bc': 'r',   # ড়
+    '\u09a2\u09bc': 'rh',  # ঢ়
+    '\u09af\u09bc': 'y',   # য়
+}
+
+BANGLA_TO_LATIN = {
+    # Independent vowels
+    'অ': 'a', 'আ': 'a', 'ই': 'i', 'ঈ': 'i', 'উ': 'u', 'ঊ': 'u', 'ঋ': 'ri',
+    'এ': 'e', 'ঐ': 'oi', 'ও': 'o', 'ঔ': 'ou',
+    # Vowel signs
+    'া': 'a', 'ি': 'i', 'ী': 'i', 'ু': 'u', 'ূ': 'u', 'ৃ': 'ri',
+    'ে': 'e', 'ৈ': 'oi', 'ো': 'o', 'ৌ': 'ou',
+    # Consonants
+    'ক': 'k', 'খ': 'kh', 'গ': 'g', 'ঘ': 'gh', 'ঙ': 'ng',
+    'চ': 'ch', 'ছ': 'chh', 'জ': 'j', 'ঝ': 'jh', 'ঞ': 'n',
+    'ট': 't', 'ঠ': 'th', 'ড': 'd', 'ঢ': 'dh', 'ণ': 'n',
+    'ত': 't', 'থ': 'th', 'দ': 'd', 'ধ': 'dh', 'ন': 'n',
+    'প': 'p', 'ফ': 'ph', 'ব': 'b', 'ভ': 'bh', 'ম': 'm',
+    'য': 'j', 'র': 'r', 'ল': 'l', 'শ': 'sh', 'ষ': 'sh', 'স': 's', 'হ': 'h',
+    'ৎ': 't', 'ং': 'ng', 'ঃ': 'h',
+    # Signs without a sound of their own
+    '\u0981': '', '\u09bc': '', '\u09cd': '',  # chandrabindu, nukta, hasanta
+}
+
+# Spelling variants that sound alike are folded before vowels are dropped
+LATIN_SOUND_FOLDS = [
+    ('chh', 'c'), ('ch', 'c'), ('kh', 'k'), ('gh', 'g'), ('jh', 'j'),
+    ('th', 't'), ('dh', 'd'), ('ph', 'f'), ('bh', 'b'), ('sh', 's'),
+    ('ng', 'n'), ('q', 'k'), ('x', 'ks'), ('z', 'j'), ('v', 'b'), ('w', 'b'),
+]
+LATIN_VOWELS_RE = re.compile(r'[aeiouy]')
+REPEATED_LETTER_RE = re.compile(r'(.)\1+')
+
+
+def strip_invisible(text):
+    """Remove zero-width joiners and other invisible characters"""
+    return text.translate(INVISIBLE_CHARACTERS)
+
+
+def fold_digits(text):
+    """Convert Bangla digits to ASCII digits"""
+    return text.translate(BANGLA_DIGITS)
+
+
+def normalize_text(text):
+    """Normalize text for indexing or querying"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', str(text))
+    text = strip_invisible(text)
+    text = fold_digits(text)
+    return text.casefold()
+
+
+def normalize_isbn(value):
+    """Compact an ISBN to its digits (and check character X)"""
+    if not value:
+        return ''
+    return re.sub(r'[^0-9x]', '', normalize_text(value))
+
+
+def looks_like_isbn(query):
+    """Whether a query is an ISBN, possibly hyphenated or in Bangla digits"""
+    query = normalize_text(query).strip()
+    if not ISBN_QUERY_RE.match(query):
+        return False
+    return sum(char.isdigit() for char in query) >= ISBN_MIN_DIGITS
+
+
+def is_bangla(text):
+    return bool(BANGLA_RE.search(text))
+
+
+def romanize_bangla(text):
+    """Rough Latin spelling of Bangla text (inherent vowels are not written)"""
+    text = unicodedata.normalize('NFKC', text)
+    for letters, latin in BANGLA_NUKTA_LETTERS.items():
+        text = text.replace(letters, latin)
+    return ''.join(BANGLA_TO_LATIN.get(char, char) for char in text)
+
+
+def latin_skeleton(text):
+    """Reduce a Latin spelling to its consonant skeleton"""
+    for spelling, sound in LATIN_SOUND_FOLDS:
+        text = text.replace(spelling, sound)
+    text = LATIN_VOWELS_RE.sub('', text)
+    return REPEATED_LETTER_RE.sub(r'\1', text)
+
+
+def transliteration_key(term):
+    """Transliteration key for a normalized term, or '' if it has none
+
+    Bangla words and plain ASCII words map to the same key when they sound
+    alike, e.g. "গীতাঞ্জলি" and "gitanjali" both become "~gtnjl".
+    """
+    if is_bangla(term):
+        latin = romanize_bangla(term)
+    elif term.isascii() and term.isalpha():
+        latin = term
+    else:
+        return ''
+    skeleton = latin_skeleton(latin)
+    if len(skeleton) < TRANSLITERATION_KEY_MIN_LENGTH or not skeleton.isascii():
+        return ''
+    return TRANSLITERATION_KEY_PREFIX + skeleton
@@ -0,0 +1,245 @@
+"""
+Catalog sorting and keyset (cursor) pagination
+
+OFFSET pagination gets slower with every page and pays a COUNT(*) per request.
+For the sorts backed by a composite index - (created_at, id), (price, id) and
+(sales, id) - listings page by key instead: the next page starts after the
+last (value, id) seen, so every page is an index range read.
+
+Cursors are opaque URL-safe strings. Legacy `?page=N` links and the sorts
+without a keyset index (title, popularity) still use Django's Paginator.
+"""
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.db.models import Q
+
+from .catalog_cache import CATALOG_CACHE_TIMEOUT, get_catalog_version
+from .models import Book
+
+# Sort parameter -> ORDER BY fields (template values plus the older view values)
+CATALOG_SORTS = {
+    '-created_at': ['-created_at'],
+    'newest': ['-created_at'],
+    'price': ['price'],
+    'price_low': ['price'],
+    '-price': ['-price'],
+    'price_high': ['-price'],
+    '-sales': ['-sales'],
+    'bestselling': ['-sales'],
+    'title': ['title'],
+    '-title': ['-title'],
+    'popular': ['-views', '-sales'],
+}
+DEFAULT_SORT = '-created_at'
+
+# Fields with a (field, id) composite index, usable as keyset keys
+KEYSET_FIELDS = ('created_at', 'price', 'sales')
+
+CURSOR_PARAM = 'cursor'
+
+
+def get_sort_ordering(sort_by):
+    """ORDER BY fields for a catalog sort parameter"""
+    return CATALOG_SORTS.get(sort_by, CATALOG_SORTS[DEFAULT_SORT])
+
+
+def get_keyset_ordering(ordering):
+    """(field, descending) if an ordering can be keyset-paginated, else None"""
+    ordering = [str(field) for field in ordering]
+    if len(ordering) == 2 and ordering[1].lstrip('-') in ('id', 'pk'):
+        # An explicit id tie-breaker must run in the same direction
+        if ordering[0].startswith('-') != ordering[1].startswith('-'):
+            return None
+        ordering = ordering[:1]
+    if len(ordering) != 1:
+        return None
+    field = ordering[0].lstrip('-')
+    if field not in KEYSET_FIELDS:
+        return None
+    return field, ordering[0].startswith('-')
+
+
+def encode_cursor(position):
+    raw = json.dumps(position, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor, or return None if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        return None
+    if not isinstance(position, dict) or not {'v', 'id', 'r'} <= position.keys():
+        return None
+    if not isinstance(position['v'], str) or not isinstance(position['r'], bool):
+        return None
+    if not isinstance(position['id'], int) or isinstance(position['id'], bool):
+        return None
+    return position
+
+
+def count_mode():
+    """How listings count results: 'exact', 'cached' or 'estimate'"""
+    return getattr(settings, 'CATALOG_COUNT_MODE', 'cached')
+
+
+def _estimate_count(queryset):
+    """Row estimate from the MySQL query plan (no scan)"""
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN {sql}', params)
+        columns = [column[0].lower() for column in cursor.description]
+        rows = cursor.fetchall()
+    if 'rows' not in columns or not rows:
+        return None
+    rows_index = columns.index('rows')
+    filtered_index = columns.index('filtered') if 'filtered' in columns else None
+    estimate = rows[0][rows_index] or 0
+    if filtered_index is not None and rows[0][filtered_index] is not None:
+        estimate = estimate * float(rows[0][filtered_index]) / 100
+    return int(estimate)
+
+
+def approximate_count(queryset):
+    """Result count for the "N results" label, without a COUNT(*) per request
+
+    'cached' counts once per catalog version and filter combination, 'estimate'
+    reads the MySQL query plan, 'exact' always runs COUNT(*).
+    """
+    mode = count_mode()
+    if mode == 'exact':
+        return queryset.count()
+    if mode == 'estimate' and connection.vendor == 'mysql':
+        estimate = _estimate_count(queryset)
+        if estimate is not None:
+            return estimate
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.md5(f'{sql}|{params}'.encode('utf-8')).hexdigest()
+    key = f'catalog:{get_catalog_version()}:count:{digest}'
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, CATALOG_CACHE_TIMEOUT)
+    return count
+
+
+class CursorPaginator:
+    """Minimal paginator facade so templates can read `page_obj.paginator.count`"""
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    @property
+    def count(self):
+        if not hasattr(self, '_count'):
+            self._count = approximate_count(self.queryset)
+        return self._count
+
+
+class CursorPage:
+    """One keyset page of results"""
+
+    is_cursor_page = True
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _position(obj, field, reverse):
+    value = getattr(obj, field)
+    return {'v': value.isoformat() if hasattr(value, 'isoformat') else str(value), 'id': obj.pk, 'r': reverse}
+
+
+def _cursor_value(field, position):
+    """The cursor's field value as a Python value, or None if it doesn't parse"""
+    try:
+        return Book._meta.get_field(field).to_python(position['v'])
+    except (ValidationError, ValueError, TypeError):
+        return None
+
+
+def keyset_page(queryset, field, descending, cursor=None, per_page=12):
+    """Fetch the page after (or before) a cursor, ordered by (field, id)
+
+    A malformed cursor is ignored, so the listing starts from the first page.
+    """
+    position = decode_cursor(cursor) if cursor else None
+    value = _cursor_value(field, position) if position else None
+    if value is None:
+        position = None
+    # Paging backwards walks the index in the opposite direction, then flips the rows
+    reverse = bool(position and position['r'])
+    walk_descending = descending != reverse
+
+    page_qs = queryset
+    if position:
+        after = 'lt' if walk_descending else 'gt'
+        page_qs = page_qs.filter(
+            Q(**{f'{field}__{after}': value}) |
+            Q(**{field: value, f'pk__{after}': position['id']})
+        )
+
+    prefix = '-' if walk_descending else ''
+    rows = list(page_qs.order_by(f'{prefix}{field}', f'{prefix}id')[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if reverse:
+        rows.reverse()
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or reverse:
+            next_cursor = encode_cursor(_position(rows[-1], field, False))
+        if position and (has_more or not reverse):
+            previous_cursor = encode_cursor(_position(rows[0], field, True))
+
+    return CursorPage(rows, CursorPaginator(queryset), next_cursor, previous_cursor)
+
+
+def paginate_catalog(request, queryset, ordering, per_page=12):
+    """Paginate a catalog listing, by cursor when the ordering allows it
+
+    Returns a CursorPage or a regular Django Page; both work with the listing
+    templates (see includes/pagination.html).
+    """
+    keyset = get_keyset_ordering(ordering)
+    use_cursor = (
+        keyset is not None
+        and getattr(settings, 'CATALOG_CURSOR_PAGINATION', True)
+        and not request.GET.get('page')
+    )
+    if use_cursor:
+        field, descending = keyset
+        return keyset_page(queryset, field, descending, request.GET.get(CURSOR_PARAM), per_page)
+
+    paginator = Paginator(queryset.order_by(*ordering), per_page)
+    return paginator.get_page(request.GET.get('page'))
@@ -0,0 +1,65 @@
+"""
+Stored rating summaries
+
+Book.rating_avg and Book.rating_count hold the average and number of approved
+reviews, so listings and serializers don't run an aggregate per book. They are
+refreshed whenever a review is saved or deleted (see books/signals.py) and can
+be rebuilt with `python manage.py backfill_book_ratings`.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import Avg, Case, Count, DecimalField, IntegerField, Q, Value, When
+
+from .models import Book, Review
+
+ZERO_RATING = Decimal('0.0')
+
+
+def _round_rating(value):
+    if value is None:
+        return ZERO_RATING
+    return Decimal(str(value)).quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)
+
+
+def refresh_book_ratings(book_ids, book_model=Book, review_model=Review):
+    """Recompute the stored rating summary of the given books
+
+    One aggregate query and one UPDATE for all the given books. Only books
+    whose summary changed are written. Returns the number of books changed.
+    Migrations pass their historical models.
+    """
+    book_ids = set(book_ids)
+    if not book_ids:
+        return 0
+
+    summaries = {
+        row['book_id']: row
+        for row in review_model.objects.filter(
+            book_id__in=book_ids, is_approved=True
+        ).values('book_id').annotate(avg=Avg('rating'), count=Count('id'))
+    }
+
+    # Books without approved reviews fall through to the defaults
+    rating_avg = Case(
+        *[When(pk=book_id, then=Value(_round_rating(row['avg']))) for book_id, row in summaries.items()],
+        default=Value(ZERO_RATING),
+        output_field=DecimalField(max_digits=2, decimal_places=1),
+    )
+    rating_count = Case(
+        *[When(pk=book_id, then=Value(row['count'])) for book_id, row in summaries.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    # update() skips Book signals - a rating change doesn't touch search or autocomplete data
+    return book_model.objects.filter(pk__in=book_ids).filter(
+        ~Q(rating_avg=rating_avg) | ~Q(rating_count=rating_count)
+    ).update(rating_avg=rating_avg, rating_count=rating_count)
+
+
+def rebuild_all_ratings(batch_size=1000, book_model=Book, review_model=Review):
+    """Recompute rating summaries for every book, one UPDATE per batch. Returns the number of books changed."""
+    updated = 0
+    book_ids = list(book_model.objects.values_list('pk', flat=True))
+    for start in range(0, len(book_ids), batch_size):
+        updated += refresh_book_ratings(book_ids[start:start + batch_size], book_model, review_model)
+    return updated
@@ -0,0 +1,286 @@
+"""
+Co-purchase recommendations ("customers who bought this also bought")
+
+OrderItem rows are streamed in order_id order, so one order's books arrive
+together, and counted into a sparse item-item co-occurrence matrix:
+BookCoPurchase holds one row per (book, other) pair bought in the same order,
+and the diagonal (other == book) holds how many orders contain the book.
+
+The similarity of two books is cosine over order membership,
+
+    orders(a, b) / sqrt(orders(a) * orders(b))
+
+so bestsellers don't dominate every list. The top TOP_N per book are stored in
+BookRecommendation and served by the books API.
+
+`build_co_purchase_index(full=True)` recounts every order. Otherwise only
+orders after the last run's watermark (CoPurchaseRun.last_order_id) are
+counted and added to the matrix, and only the books whose scores moved get
+their recommendations recomputed. Orders cancelled or refunded after they were
+counted stay in the matrix until the next full rebuild.
+"""
+import heapq
+import logging
+import math
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Book, BookCoPurchase, BookRecommendation, CoPurchaseRun
+
+logger = logging.getLogger(__name__)
+
+TOP_N = 10
+
+# Pairs bought together fewer times than this are not recommended
+MIN_CO_PURCHASES = 1
+
+# Bulk orders (schools, libraries) say little about taste and add n^2 pairs
+MAX_BASKET_SIZE = 50
+
+# Orders that never reached the customer don't count as co-purchases
+EXCLUDED_ORDER_STATUSES = ('cancelled', 'refunded')
+
+# Recent orders are left for the next run (late commits, quick cancellations)
+ORDER_SETTLE_DELAY = timedelta(hours=1)
+
+STREAM_BATCH_SIZE = 10000
+WRITE_BATCH_SIZE = 2000
+BOOK_CHUNK_SIZE = 500
+
+
+class CoPurchaseCounts:
+    """Sparse co-occurrence counts accumulated from a stream of order items"""
+
+    def __init__(self):
+        # book_id -> orders containing it (the diagonal)
+        self.purchases = Counter()
+        # (smaller book_id, larger book_id) -> orders containing both
+        self.pairs = Counter()
+        self.orders = 0
+        self.items = 0
+        self.last_order_id = 0
+
+    def add_basket(self, basket):
+        self.orders += 1
+        for book_id in basket:
+            self.purchases[book_id] += 1
+        if len(basket) > MAX_BASKET_SIZE:
+            return
+        ordered = sorted(basket)
+        for index, book_id in enumerate(ordered):
+            for other_id in ordered[index + 1:]:
+                self.pairs[book_id, other_id] += 1
+
+    def consume(self, rows):
+        """Count (order_id, book_id) rows sorted by order_id"""
+        current_order, basket = None, set()
+        for order_id, book_id in rows:
+            self.items += 1
+            if order_id != current_order:
+                if basket:
+                    self.add_basket(basket)
+                current_order, basket = order_id, set()
+            basket.add(book_id)
+        if basket:
+            self.add_basket(basket)
+        if current_order is not None:
+            self.last_order_id = max(self.last_order_id, current_order)
+        return self
+
+    def adjacency(self):
+        """book_id -> {other_id: orders together}, both directions"""
+        partners = defaultdict(dict)
+        for (book_id, other_id), together in self.pairs.items():
+            partners[book_id][other_id] = together
+            partners[other_id][book_id] = together
+        return partners
+
+
+def stream_order_items(after_order_id=0, until=None):
+    """(order_id, book_id) of countable order items, in order_id order
+
+    Read in keyset batches over (order_id, id) so a large table is never
+    loaded at once.
+    """
+    from orders.models import OrderItem
+
+    items = OrderItem.objects.filter(
+        order_id__gt=after_order_id,
+        book_id__isnull=False,
+    ).exclude(order__status__in=EXCLUDED_ORDER_STATUSES)
+    if until is not None:
+        items = items.filter(order__created_at__lt=until)
+    items = items.order_by('order_id', 'id')
+
+    last = None
+    while True:
+        batch = items
+        if last is not None:
+            batch = batch.filter(Q(order_id__gt=last[0]) | Q(order_id=last[0], id__gt=last[1]))
+        rows = list(batch.values_list('order_id', 'id', 'book_id')[:STREAM_BATCH_SIZE])
+        for order_id, _, book_id in rows:
+            yield order_id, book_id
+        if len(rows) < STREAM_BATCH_SIZE:
+            return
+        last = rows[-1][:2]
+
+
+def similarity(together, purchases_a, purchases_b):
+    if not purchases_a or not purchases_b:
+        return 0.0
+    return together / math.sqrt(purchases_a * purchases_b)
+
+
+def rank_recommendations(book_id, partners, purchases, top_n=TOP_N):
+    """Best (score, other_id, together) entries for one book"""
+    own = purchases.get(book_id, 0)
+    return heapq.nlargest(top_n, (
+        (similarity(together, own, purchases.get(other_id, 0)), other_id, together)
+        for other_id, together in partners.items()
+        if together >= MIN_CO_PURCHASES and other_id != book_id
+    ))
+
+
+def _chunks(values, size=BOOK_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _write_full_matrix(counts):
+    def rows():
+        for book_id, purchased in counts.purchases.items():
+            yield BookCoPurchase(book_id=book_id, other_id=book_id, orders=purchased)
+        for (book_id, other_id), together in counts.pairs.items():
+            yield BookCoPurchase(book_id=book_id, other_id=other_id, orders=together)
+            yield BookCoPurchase(book_id=other_id, other_id=book_id, orders=together)
+
+    BookCoPurchase.objects.all().delete()
+    batch = []
+    for row in rows():
+        batch.append(row)
+        if len(batch) >= WRITE_BATCH_SIZE:
+            BookCoPurchase.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        BookCoPurchase.objects.bulk_create(batch)
+
+
+def _apply_matrix_delta(counts):
+    """Add newly counted orders to the stored matrix. Returns the touched book IDs."""
+    deltas = defaultdict(dict)
+    for book_id, purchased in counts.purchases.items():
+        deltas[book_id][book_id] = purchased
+    for (book_id, other_id), together in counts.pairs.items():
+        deltas[book_id][other_id] = together
+        deltas[other_id][book_id] = together
+
+    for book_ids in _chunks(deltas):
+        existing = {
+            (row.book_id, row.other_id): row
+            for row in BookCoPurchase.objects.filter(book_id__in=book_ids)
+        }
+        changed, created = [], []
+        for book_id in book_ids:
+            for other_id, delta in deltas[book_id].items():
+                row = existing.get((book_id, other_id))
+                if row is None:
+                    created.append(BookCoPurchase(book_id=book_id, other_id=other_id, orders=delta))
+                else:
+                    row.orders += delta
+                    changed.append(row)
+        BookCoPurchase.objects.bulk_update(changed, ['orders'], batch_size=WRITE_BATCH_SIZE)
+        BookCoPurchase.objects.bulk_create(created, batch_size=WRITE_BATCH_SIZE)
+    return set(deltas)
+
+
+def rebuild_recommendations(book_ids=None, top_n=TOP_N):
+    """Recompute stored recommendations from the matrix (all books by default)"""
+    if book_ids is None:
+        book_ids = BookCoPurchase.objects.filter(book_id=F('other_id')).values_list('book_id', flat=True)
+    processed = 0
+    for chunk in _chunks(book_ids):
+        partners = defaultdict(dict)
+        purchases = {}
+        for book_id, other_id, orders in BookCoPurchase.objects.filter(
+            book_id__in=chunk
+        ).values_list('book_id', 'other_id', 'orders'):
+            if book_id == other_id:
+                purchases[book_id] = orders
+            else:
+                partners[book_id][other_id] = orders
+        others = {other_id for book_partners in partners.values() for other_id in book_partners}
+        purchases.update(BookCoPurchase.objects.filter(
+            book_id__in=others - set(purchases), other_id=F('book_id')
+        ).values_list('book_id', 'orders'))
+
+        rows = []
+        for book_id in chunk:
+            ranked = rank_recommendations(book_id, partners[book_id], purchases, top_n)
+            rows.extend(
+                BookRecommendation(
+                    book_id=book_id, recommended_id=other_id, rank=rank,
+                    score=round(score, 6), orders=together,
+                )
+                for rank, (score, other_id, together) in enumerate(ranked, start=1)
+            )
+        with transaction.atomic():
+            BookRecommendation.objects.filter(book_id__in=chunk).delete()
+            BookRecommendation.objects.bulk_create(rows, batch_size=WRITE_BATCH_SIZE)
+        processed += len(chunk)
+    return processed
+
+
+def build_co_purchase_index(full=False, top_n=TOP_N):
+    """Count new orders into the matrix and refresh the affected recommendations
+
+    Runs a full rebuild when asked to or when there is no previous run.
+    Returns the CoPurchaseRun recorded for this build.
+    """
+    previous = CoPurchaseRun.objects.first()
+    full = full or previous is None
+    after_order_id = 0 if full else previous.last_order_id
+    until = timezone.now() - ORDER_SETTLE_DELAY
+
+    counts = CoPurchaseCounts().consume(stream_order_items(after_order_id, until))
+    last_order_id = max(counts.last_order_id, after_order_id)
+
+    with transaction.atomic():
+        if full:
+            _write_full_matrix(counts)
+        elif counts.orders:
+            touched = _apply_matrix_delta(counts)
+        run = CoPurchaseRun.objects.create(
+            full=full, last_order_id=last_order_id,
+            orders=counts.orders, items=counts.items,
+        )
+
+    if full:
+        BookRecommendation.objects.exclude(book_id__in=list(counts.purchases)).delete()
+        rebuild_recommendations(counts.purchases.keys(), top_n)
+    elif counts.orders:
+        # A book's purchase total appears in every score it takes part in, so
+        # the partners of touched books need new lists too
+        affected = set(touched)
+        for chunk in _chunks(touched):
+            affected.update(
+                BookCoPurchase.objects.filter(book_id__in=chunk).values_list('other_id', flat=True)
+            )
+        rebuild_recommendations(affected, top_n)
+
+    logger.info(
+        f"Co-purchase index ({'full' if full else 'update'}): "
+        f"{counts.orders} orders, {counts.items} items, up to order {last_order_id}"
+    )
+    return run
+
+
+def recommended_books(book, limit=TOP_N):
+    """Active books most often bought together with this one, best first"""
+    return Book.objects.filter(
+        recommended_with__book=book, is_active=True
+    ).order_by('recommended_with__rank')[:limit]
@@ -0,0 +1,236 @@
+"""
+"Related books" engine
+
+Neighbors are computed offline and stored in RelatedBook, so book_detail reads
+them with one indexed join. Two signals are blended:
+
+- Content: TF-IDF vectors over title, author, publisher and description (English
+  and Bangla), tokenized with the search normalizer; cosine similarity is
+  accumulated through an inverted index, so only books sharing a term are
+  compared.
+- Co-purchase: the "also bought" scores of the co-purchase index
+  (books/recommendations.py), cosine over order membership.
+
+Vectors are sparse dicts rather than NumPy/SciPy matrices - the catalog is
+small enough, and it keeps the job free of extra dependencies.
+
+`compute_related_books()` recomputes everything; `update_related_books()` only
+handles books that have no neighbors yet and slots them into the lists of
+existing books they beat.
+"""
+import heapq
+import logging
+import math
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.utils.html import strip_tags
+
+from .models import Book, BookRecommendation, RelatedBook
+from .search import tokenize
+
+logger = logging.getLogger(__name__)
+
+TOP_K = 8
+
+# Term frequency multiplier per text field
+TEXT_FIELDS = {
+    'title': 3, 'title_bn': 3,
+    'author': 2, 'author_bn': 2,
+    'publisher': 1, 'publisher_bn': 1,
+    'description': 1, 'description_bn': 1,
+}
+
+# Terms in more than this share of books carry no signal
+MAX_DOCUMENT_FREQUENCY = 0.4
+MIN_TERM_LENGTH = 2
+
+# Blend of the two similarity signals
+CONTENT_WEIGHT = 0.6
+PURCHASE_WEIGHT = 0.4
+# Same-category books rank first among equals
+CATEGORY_BONUS = 0.05
+
+
+def book_terms(book):
+    """Weighted term counts of a book's text fields"""
+    counts = Counter()
+    for field, multiplier in TEXT_FIELDS.items():
+        value = getattr(book, field, None)
+        if not value:
+            continue
+        if field.startswith('description'):
+            value = strip_tags(value)
+        for term in tokenize(value):
+            if len(term) >= MIN_TERM_LENGTH and not term.isdigit():
+                counts[term] += multiplier
+    return counts
+
+
+class ContentModel:
+    """TF-IDF vectors for the active catalog, with an inverted index"""
+
+    def __init__(self, books):
+        self.categories = {}
+        self.category_members = defaultdict(list)
+        term_counts = {}
+        document_frequency = Counter()
+        for book in books:
+            counts = book_terms(book)
+            term_counts[book.pk] = counts
+            self.categories[book.pk] = book.category_id
+            self.category_members[book.category_id].append(book.pk)
+            document_frequency.update(counts.keys())
+
+        total = max(len(term_counts), 1)
+        max_df = max(2, int(total * MAX_DOCUMENT_FREQUENCY))
+        idf = {
+            term: math.log(total / df)
+            for term, df in document_frequency.items() if df <= max_df
+        }
+
+        self.vectors = {}
+        self.postings = defaultdict(list)
+        for book_id, counts in term_counts.items():
+            vector = {
+                term: (1 + math.log(count)) * idf[term]
+                for term, count in counts.items() if term in idf and idf[term] > 0
+            }
+            norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+            if not norm:
+                continue
+            vector = {term: weight / norm for term, weight in vector.items()}
+            self.vectors[book_id] = vector
+            for term, weight in vector.items():
+                self.postings[term].append((book_id, weight))
+
+    def similarities(self, book_id):
+        """Cosine similarity to every book sharing a term"""
+        scores = defaultdict(float)
+        for term, weight in self.vectors.get(book_id, {}).items():
+            for other_id, other_weight in self.postings[term]:
+                if other_id != book_id:
+                    scores[other_id] += weight * other_weight
+        return scores
+
+
+class PurchaseModel:
+    """Co-purchase similarities from the recommendation index (books/recommendations.py)"""
+
+    def __init__(self):
+        self.scores = defaultdict(dict)
+        rows = BookRecommendation.objects.values_list('book_id', 'recommended_id', 'score')
+        for book_id, other_id, score in rows.iterator(chunk_size=5000):
+            self.scores[book_id][other_id] = score
+
+    def similarities(self, book_id):
+        return self.scores.get(book_id, {})
+
+
+def build_models(books=None):
+    if books is None:
+        books = Book.objects.filter(is_active=True).only('pk', 'category_id', *TEXT_FIELDS)
+    return ContentModel(books), PurchaseModel()
+
+
+def rank_neighbors(book_id, content, purchases, top_k=TOP_K):
+    """Best (score, related_id) pairs for one book"""
+    scores = defaultdict(float)
+    for other_id, similarity in content.similarities(book_id).items():
+        scores[other_id] += CONTENT_WEIGHT * similarity
+    for other_id, similarity in purchases.similarities(book_id).items():
+        if other_id in content.categories:
+            scores[other_id] += PURCHASE_WEIGHT * similarity
+
+    # Same-category books also fill the list when the text and order signals are thin
+    category_id = content.categories.get(book_id)
+    if category_id is not None:
+        for other_id in content.category_members[category_id]:
+            if other_id != book_id:
+                scores[other_id] += CATEGORY_BONUS
+
+    return heapq.nlargest(top_k, ((score, other_id) for other_id, score in scores.items()))
+
+
+def _neighbor_rows(book_id, ranked):
+    return [
+        RelatedBook(book_id=book_id, related_id=related_id, rank=rank, score=round(score, 6))
+        for rank, (score, related_id) in enumerate(ranked, start=1)
+    ]
+
+
+def compute_related_books(top_k=TOP_K, batch_size=500):
+    """Recompute the neighbors of every active book. Returns books processed."""
+    content, purchases = build_models()
+    rows = []
+    with transaction.atomic():
+        RelatedBook.objects.all().delete()
+        for book_id in content.categories:
+            rows.extend(_neighbor_rows(book_id, rank_neighbors(book_id, content, purchases, top_k)))
+            if len(rows) >= batch_size:
+                RelatedBook.objects.bulk_create(rows, batch_size=batch_size)
+                rows = []
+        if rows:
+            RelatedBook.objects.bulk_create(rows, batch_size=batch_size)
+    logger.info(f"Computed related books for {len(content.categories)} books")
+    return len(content.categories)
+
+
+def update_related_books(top_k=TOP_K):
+    """Compute neighbors for active books that have none yet
+
+    New books are also offered to their neighbors' lists, replacing the
+    weakest entry when they score higher. Returns books processed.
+    """
+    content, purchases = build_models()
+    new_ids = set(content.categories) - set(
+        RelatedBook.objects.values_list('book_id', flat=True).distinct()
+    )
+    if not new_ids:
+        return 0
+
+    # Existing lists of the books the new ones may join: book_id -> [(score, related_id)]
+    ranked_new = {book_id: rank_neighbors(book_id, content, purchases, top_k) for book_id in new_ids}
+    affected = {related_id for ranked in ranked_new.values() for _, related_id in ranked} - new_ids
+    current = defaultdict(list)
+    for row in RelatedBook.objects.filter(book_id__in=affected).values_list('book_id', 'score', 'related_id'):
+        current[row[0]].append((row[1], row[2]))
+
+    updated_lists = {}
+    for book_id, ranked in ranked_new.items():
+        for score, related_id in ranked:
+            if related_id not in affected:
+                continue
+            # Symmetric similarity: the new book scores the same from the other side
+            entries = updated_lists.get(related_id, current[related_id])
+            if len(entries) < top_k or score > min(entries)[0]:
+                entries = heapq.nlargest(top_k, entries + [(score, book_id)])
+                updated_lists[related_id] = entries
+
+    with transaction.atomic():
+        rows = []
+        for book_id, ranked in ranked_new.items():
+            rows.extend(_neighbor_rows(book_id, ranked))
+        for book_id, entries in updated_lists.items():
+            rows.extend(_neighbor_rows(book_id, entries))
+        RelatedBook.objects.filter(book_id__in=set(ranked_new) | set(updated_lists)).delete()
+        RelatedBook.objects.bulk_create(rows, batch_size=500)
+    return len(new_ids)
+
+
+def get_related_books(book, limit=4):
+    """Precomputed neighbors of a book (one query), falling back to its category"""
+    related = list(
+        Book.objects.filter(
+            neighbor_of__book=book, is_active=True
+        ).exclude(slug__isnull=True).exclude(slug='').order_by('neighbor_of__rank')[:limit]
+    )
+    if related:
+        return related
+    # Not computed yet (new book) - same category, as before
+    return list(
+        Book.objects.filter(
+            category=book.category,
+            is_active=True
+        ).exclude(id=book.id).exclude(slug__isnull=True).exclude(slug='')[:limit]
+    )
@@ -0,0 +1,217 @@
+"""
+Catalog search
+
+Book titles, authors, publishers (English and Bangla) and ISBNs are split into
+terms and stored in the BookSearchTerm inverted index whenever a book is saved.
+A query is answered with indexed prefix lookups on that table instead of
+OR-ed `icontains` scans over the books table, and results are ranked so title
+matches come before ISBN, author and publisher matches.
+
+Text is normalized the same way at index and query time (see
+books/normalization.py), so Unicode variants, zero-width joiners and Bangla
+digits don't break matches. With SEARCH_TRANSLITERATION enabled, Bangla words
+are also indexed under a Latin transliteration key for English queries.
+
+All storefront, admin and API search entry points go through search_queryset().
+"""
+import operator
+import re
+from functools import reduce
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, OuterRef, Q, Subquery, Value, When
+
+from .models import Book, BookSearchTerm
+from .normalization import (
+    is_bangla, looks_like_isbn, normalize_isbn, normalize_text, transliteration_key,
+)
+
+# Relevance weight per indexed field
+FIELD_WEIGHTS = {
+    'title': 10,
+    'isbn': 8,
+    'author': 5,
+    'publisher': 3,
+}
+
+# Book columns feeding each indexed field
+INDEXED_FIELDS = {
+    'title': ['title', 'title_bn'],
+    'author': ['author', 'author_bn'],
+    'publisher': ['publisher', 'publisher_bn'],
+    'isbn': ['isbn'],
+}
+
+# Saving any of these columns requires re-indexing the book
+INDEXED_SOURCE_FIELDS = frozenset(
+    column for columns in INDEXED_FIELDS.values() for column in columns
+)
+
+TERM_MAX_LENGTH = 100
+MAX_QUERY_TERMS = 8
+
+# Word characters plus the whole Bengali block (vowel signs are not \w)
+TOKEN_RE = re.compile(r'[\w\u0980-\u09FF]+')
+
+
+def transliteration_enabled():
+    return getattr(settings, 'SEARCH_TRANSLITERATION', True)
+
+
+def index_key(term):
+    """Transliteration key indexed for a Bangla term ('' for other terms)
+
+    Only Bangla words get a key, so an English query's key finds their Latin
+    spelling without matching unrelated English words by consonants alone.
+    """
+    if not transliteration_enabled() or not is_bangla(term):
+        return ''
+    return transliteration_key(term)
+
+
+def query_key(term):
+    """Transliteration key an ASCII query term is also matched by ('' for other terms)"""
+    if not transliteration_enabled() or not term.isascii():
+        return ''
+    return transliteration_key(term)
+
+
+def tokenize(text):
+    """Split text into normalized search terms"""
+    return [token[:TERM_MAX_LENGTH] for token in TOKEN_RE.findall(normalize_text(text))]
+
+
+def field_terms(field, value):
+    """Index terms for one field value, with their weights"""
+    weight = FIELD_WEIGHTS[field]
+    if field == 'isbn':
+        isbn = normalize_isbn(value)
+        return [(isbn, weight)] if isbn else []
+
+    terms = []
+    for term in tokenize(value):
+        terms.append((term, weight))
+        key = index_key(term)
+        if key:
+            # Sound-alike matches rank below exact spellings
+            terms.append((key[:TERM_MAX_LENGTH], max(weight // 2, 1)))
+    return terms
+
+
+def build_book_terms(book, term_model=BookSearchTerm):
+    """Build (unsaved) BookSearchTerm rows for a book"""
+    terms = {}
+    for field, columns in INDEXED_FIELDS.items():
+        for column in columns:
+            for term, weight in field_terms(field, getattr(book, column, None)):
+                terms[(term, field)] = term_model(
+                    book_id=book.pk,
+                    term=term,
+                    field=field,
+                    weight=weight,
+                )
+    return list(terms.values())
+
+
+def index_book(book):
+    """Replace the indexed terms of a single book"""
+    with transaction.atomic():
+        BookSearchTerm.objects.filter(book_id=book.pk).delete()
+        BookSearchTerm.objects.bulk_create(build_book_terms(book))
+
+
+def rebuild_index(queryset=None, batch_size=500, term_model=BookSearchTerm):
+    """Rebuild the search index for the given books (all books by default)
+
+    Returns the number of books indexed. Migrations pass their historical
+    books queryset and term model.
+    """
+    if queryset is None:
+        queryset = Book.objects.all()
+        term_model.objects.all().delete()
+    else:
+        term_model.objects.filter(book__in=queryset).delete()
+
+    indexed = 0
+    pending = []
+    for book in queryset.only('pk', *INDEXED_SOURCE_FIELDS).iterator(chunk_size=batch_size):
+        pending.extend(build_book_terms(book, term_model))
+        indexed += 1
+        if len(pending) >= batch_size:
+            term_model.objects.bulk_create(pending, batch_size=batch_size)
+            pending = []
+    if pending:
+        term_model.objects.bulk_create(pending, batch_size=batch_size)
+    return indexed
+
+
+def query_terms(query):
+    """Unique normalized terms of a search query, in order"""
+    if looks_like_isbn(query):
+        # "978-0-7475" or "৯৭৮০৭৪৭৫" is one ISBN prefix, not several words
+        return [normalize_isbn(query)]
+
+    terms = []
+    for term in tokenize(query):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def term_condition(term):
+    """Index rows matched by one query term: its prefix, or (English terms) its transliteration key"""
+    condition = Q(term__istartswith=term)
+    key = query_key(term)
+    if key:
+        condition |= Q(term__istartswith=key)
+    return condition
+
+
+def ranked_matches(terms):
+    """Book IDs matching every query term (by prefix), annotated with a relevance score
+
+    Each query term scores the weight of the best field it matched in, so a
+    title match outranks any number of author or publisher matches for the
+    same term. The score is the sum over the query terms.
+    """
+    conditions = [term_condition(term) for term in terms]
+    best = {
+        f'best_{i}': Max(Case(
+            When(condition, then=F('weight')),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+        for i, condition in enumerate(conditions)
+    }
+    return BookSearchTerm.objects.filter(
+        reduce(operator.or_, conditions)
+    ).values('book_id').annotate(
+        **best
+    ).annotate(
+        score=reduce(operator.add, (F(name) for name in best)),
+    ).filter(**{f'{name}__gt': 0 for name in best})
+
+
+def search_queryset(queryset, query):
+    """Restrict a Book queryset to search matches, ordered by relevance
+
+    Matching books are annotated with `search_rank`. An empty query leaves the
+    queryset untouched.
+    """
+    if not query or not query.strip():
+        return queryset
+
+    terms = query_terms(query)
+    if not terms:
+        return queryset.none()
+
+    matches = ranked_matches(terms)
+    return queryset.filter(
+        pk__in=matches.values('book_id')
+    ).annotate(
+        search_rank=Subquery(
+            matches.filter(book_id=OuterRef('pk')).values('score')[:1],
+            output_field=IntegerField(),
+        )
+    ).order_by('-search_rank', '-created_at')
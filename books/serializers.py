@@ -15,8 +15,8 @@ class CategorySerializer(serializers.ModelSerializer):
 
 class BookListSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
-    average_rating = serializers.ReadOnlyField()
-    total_reviews = serializers.ReadOnlyField()
+    average_rating = serializers.FloatField(source='rating_avg', read_only=True)
+    total_reviews = serializers.IntegerField(source='rating_count', read_only=True)
     
     class Meta:
         model = Book
@@ -30,8 +30,8 @@ class BookListSerializer(serializers.ModelSerializer):
 
 class BookDetailSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
-    average_rating = serializers.ReadOnlyField()
-    total_reviews = serializers.ReadOnlyField()
+    average_rating = serializers.FloatField(source='rating_avg', read_only=True)
+    total_reviews = serializers.IntegerField(source='rating_count', read_only=True)
     
     class Meta:
         model = Book
@@ -0,0 +1,143 @@
+"""
+Signal handlers for books app
+"""
+import logging
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Banner, Book, Category, Review
+from .catalog_cache import bump_catalog_version
+from .search import INDEXED_SOURCE_FIELDS, index_book
+from . import autocomplete
+from .ratings import refresh_book_ratings
+from .facets import FACET_SOURCE_FIELDS, book_facet_values, move_book, rebuild_facets, stored_facet_values
+from .images import stale_image_fields, uploaded_image_fields
+
+logger = logging.getLogger(__name__)
+
+# Saves touching only these fields don't change anything the catalog caches show
+CATALOG_NEUTRAL_FIELDS = frozenset(['views'])
+
+
+def _is_catalog_neutral(update_fields):
+    return bool(update_fields) and set(update_fields) <= CATALOG_NEUTRAL_FIELDS
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Banner)
+def catalog_saved(sender, instance, update_fields=None, **kwargs):
+    """Invalidate cached catalog data when a book, category or banner changes"""
+    if _is_catalog_neutral(update_fields):
+        return
+    bump_catalog_version()
+
+
+@receiver(post_delete, sender=Book)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Banner)
+def catalog_deleted(sender, instance, **kwargs):
+    """Invalidate cached catalog data when a book, category or banner is removed"""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Book)
+def book_saved_update_search_index(sender, instance, update_fields=None, **kwargs):
+    """Keep the search index in sync with a book's searchable fields"""
+    if update_fields and not set(update_fields) & INDEXED_SOURCE_FIELDS:
+        return
+    index_book(instance)
+
+
+@receiver(post_save, sender=Book)
+def book_saved_update_autocomplete(sender, instance, update_fields=None, **kwargs):
+    """Patch the shared autocomplete index when a book's suggestion data changes"""
+    if update_fields and not set(update_fields) & autocomplete.AUTOCOMPLETE_SOURCE_FIELDS:
+        return
+    autocomplete.update_book(instance)
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted_update_autocomplete(sender, instance, **kwargs):
+    autocomplete.remove_book(instance.pk)
+
+
+@receiver(pre_save, sender=Book)
+def book_saving_remember_facets(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Remember which facet row the stored book is counted in before it changes"""
+    if raw or (update_fields and not set(update_fields) & FACET_SOURCE_FIELDS):
+        return
+    instance._facet_previous = None if instance._state.adding else stored_facet_values(instance.pk)
+
+
+@receiver(post_save, sender=Book)
+def book_saved_update_facets(sender, instance, **kwargs):
+    """Move the book to its new facet row"""
+    if not hasattr(instance, '_facet_previous'):
+        return
+    move_book(instance.__dict__.pop('_facet_previous'), book_facet_values(instance))
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted_update_facets(sender, instance, **kwargs):
+    move_book(book_facet_values(instance), None)
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted_rebuild_facets(sender, instance, **kwargs):
+    """The category's books were moved to no category by a bulk UPDATE"""
+    rebuild_facets()
+
+
+@receiver(pre_save, sender=Book)
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=Banner)
+def image_saving_remember_uploads(sender, instance, raw=False, **kwargs):
+    """Note which image fields get a new upload (committed by the save itself)"""
+    if not raw:
+        instance._uploaded_image_fields = uploaded_image_fields(instance)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Banner)
+def image_saved_queue_derivatives(sender, instance, raw=False, **kwargs):
+    """Resize new or replaced images in the background once the save commits"""
+    uploaded = instance.__dict__.pop('_uploaded_image_fields', [])
+    if raw or not (uploaded or stale_image_fields(instance)):
+        return
+    from .tasks import generate_image_derivatives
+
+    model_label = instance._meta.label_lower
+
+    def queue():
+        try:
+            generate_image_derivatives.delay(model_label, instance.pk, uploaded)
+        except Exception as exc:
+            # Broker down: the original image is served until the backfill command runs
+            logger.warning(f"Could not queue image derivatives for {model_label} {instance.pk}: {exc}")
+
+    transaction.on_commit(queue)
+
+
+@receiver(pre_save, sender=Review)
+def review_saving_remember_approval(sender, instance, raw=False, **kwargs):
+    """Remember whether the stored review was shown, before it changes"""
+    if raw or instance._state.adding:
+        return
+    instance._was_approved = Review.objects.filter(pk=instance.pk, is_approved=True).exists()
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    """Keep the stored rating summary of the reviewed book current
+
+    Pending reviews aren't shown, so saving one only retires cached pages
+    if it is (or was) approved or the book's rating summary changed.
+    """
+    changed = refresh_book_ratings([instance.book_id])
+    if changed or instance.is_approved or instance.__dict__.pop('_was_approved', False):
+        bump_catalog_version()
@@ -0,0 +1,69 @@
+"""
+Celery tasks for books app
+"""
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def flush_book_views():
+    """
+    Flush buffered book view counts to the database
+    Runs every minute (see CELERY_BEAT_SCHEDULE)
+    """
+    from .view_counter import flush_view_counts
+    
+    updated = flush_view_counts()
+    if updated:
+        logger.info(f"Flushed view counts for {updated} books")
+    return updated
+
+
+@shared_task
+def refresh_related_books(full=False):
+    """
+    Recompute the precomputed related books
+    Runs daily (see CELERY_BEAT_SCHEDULE); only new books unless full=True
+    """
+    from .catalog_cache import bump_catalog_version
+    from .related import compute_related_books, update_related_books
+
+    processed = compute_related_books() if full else update_related_books()
+    if processed:
+        bump_catalog_version()
+        logger.info(f"Computed related books for {processed} books")
+    return processed
+
+
+@shared_task
+def update_co_purchase_index(full=False):
+    """
+    Count new orders into the co-purchase recommendations
+    Runs daily (see CELERY_BEAT_SCHEDULE); recounts everything when full=True
+    """
+    from .recommendations import build_co_purchase_index
+
+    run = build_co_purchase_index(full=full)
+    return run.orders
+
+
+@shared_task
+def generate_image_derivatives(model_label, pk, field_names=(), force=False):
+    """
+    Create the resized copies of one book's, category's or banner's images
+    Queued when an image is uploaded or replaced (see books/signals.py)
+    """
+    from django.apps import apps
+    from .catalog_cache import bump_catalog_version
+    from .images import generate_derivatives
+
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if instance is None:
+        return False
+    changed = generate_derivatives(instance, field_names, force=force)
+    if changed:
+        # Cached pages still point at the original image
+        bump_catalog_version()
+    return changed
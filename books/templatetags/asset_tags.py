@@ -0,0 +1,28 @@
+"""
+Template helpers for static asset bundles (see books/assets.py)
+"""
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from books.assets import bundle_path, bundle_sources, bundling_enabled
+
+register = template.Library()
+
+TAGS = {
+    '.css': '<link rel="stylesheet" href="{}">',
+    '.js': '<script src="{}"></script>',
+}
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    <link>/<script> tag(s) for an ASSET_BUNDLES entry: the built bundle under
+    its content-hashed name, or each source file while bundling is off
+    Usage: {% bundle 'site.css' %}
+    """
+    tag = TAGS['.css' if name.endswith('.css') else '.js']
+    if bundling_enabled():
+        return format_html(tag, static(bundle_path(name)))
+    return format_html_join('\n', tag, ((static(source),) for source in bundle_sources(name)))
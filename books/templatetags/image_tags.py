@@ -0,0 +1,81 @@
+"""
+Template helpers for resized image derivatives (see books/images.py)
+"""
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from books.images import DEFAULT_FORMAT, derivative_info, derivative_path, derivative_url as build_derivative_url
+
+register = template.Library()
+
+# Rendered width of each derivative's usual slot, for the `sizes` attribute
+DEFAULT_SIZES = {
+    'grid': '(max-width: 576px) 50vw, (max-width: 992px) 33vw, 260px',
+    'detail': '(max-width: 768px) 100vw, 420px',
+    'zoom': '100vw',
+}
+
+
+@register.filter
+def derivative_url(field_file, spec):
+    """
+    URL of a resized copy of an image field, or of the original if none exists yet
+    Usage: {{ book.cover_image|derivative_url:"grid" }} or {{ book.cover_image|derivative_url:"grid.webp" }}
+    """
+    derivative, _, image_format = spec.partition('.')
+    return build_derivative_url(field_file, derivative, image_format or DEFAULT_FORMAT)
+
+
+def _srcset(field_file, widths, image_format):
+    storage = field_file.storage
+    return ', '.join(
+        f"{storage.url(derivative_path(field_file.name, derivative, image_format))} {width}w"
+        for width, derivative in widths.items()
+    )
+
+
+@register.simple_tag
+def responsive_image(field_file, derivative='grid', sizes=None, loading='lazy', **attrs):
+    """
+    <picture> with WebP/JPEG srcsets over every derivative width, intrinsic
+    width/height and a blurred placeholder, all read from the recorded
+    metadata (no file is opened). Falls back to a plain lazy <img>.
+    Usage: {% responsive_image book.cover_image "grid" class="book-cover-img" alt=book.title %}
+    Pass loading="eager" fetchpriority="high" for the main image above the fold.
+    """
+    if not field_file:
+        return ''
+    info = derivative_info(field_file)
+    if info is None or not info['derivatives']:
+        return format_html('<img{}>', flatatt({'src': field_file.url, 'loading': loading, **attrs}))
+
+    # Derivative widths, smallest first (small originals give duplicates)
+    widths = {}
+    for name, (width, _) in sorted(info['derivatives'].items(), key=lambda item: item[1][0]):
+        widths.setdefault(width, name)
+    if derivative not in info['derivatives']:
+        derivative = next(iter(widths.values()))
+    width, height = info['derivatives'][derivative]
+    sizes = sizes or DEFAULT_SIZES.get(derivative, '100vw')
+
+    img_attrs = {
+        'src': field_file.storage.url(derivative_path(field_file.name, derivative, 'jpeg')),
+        'srcset': _srcset(field_file, widths, 'jpeg'),
+        'sizes': sizes,
+        'width': width,
+        'height': height,
+        'loading': loading,
+        'decoding': 'async',
+        **attrs,
+    }
+    img_attrs['class'] = ' '.join(filter(None, [attrs.get('class'), 'responsive-img']))
+    if info.get('placeholder'):
+        img_attrs['style'] = ' '.join(filter(None, [
+            f"background-image: url('{info['placeholder']}');", attrs.get('style'),
+        ]))
+
+    return format_html(
+        '<picture class="responsive-image"><source type="image/webp" srcset="{}" sizes="{}"><img{}></picture>',
+        _srcset(field_file, widths, 'webp'), sizes, flatatt(img_attrs),
+    )
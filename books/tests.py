@@ -0,0 +1,148 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from accounts.models import User
+
+from .autocomplete import AutocompleteIndex
+from .catalog_cache import get_catalog_version
+from .facets import rebuild_facets
+from .models import Book, BookFacet, Review
+from .pagination import encode_cursor, keyset_page
+from .search import search_queryset
+
+
+class SearchRankingTests(TestCase):
+    def test_title_match_ranks_above_author_and_publisher_matches(self):
+        by_author = Book.objects.create(
+            title='Collected Essays', author='Robert Roberts', publisher='Robinson Robbins', price=100,
+        )
+        robin = Book.objects.create(title='Robin Hood', author='Anonymous', price=100)
+        robots = Book.objects.create(title='Robots of Dawn', author='Isaac Asimov', price=100)
+
+        results = list(search_queryset(Book.objects.all(), 'rob'))
+
+        self.assertEqual(set(results[:2]), {robin, robots})
+        self.assertEqual(results[2], by_author)
+
+    def test_english_words_do_not_match_by_consonant_skeleton(self):
+        Book.objects.create(title='Act of Will', author='A. Writer', price=100)
+        Book.objects.create(title='City Lights', author='A. Writer', price=100)
+        cat = Book.objects.create(title='The Cat', author='A. Writer', price=100)
+
+        self.assertEqual(list(search_queryset(Book.objects.all(), 'cat')), [cat])
+
+    def test_english_query_finds_bangla_spelling(self):
+        gitanjali = Book.objects.create(title='গীতাঞ্জলি', author='রবীন্দ্রনাথ ঠাকুর', price=100)
+
+        self.assertEqual(list(search_queryset(Book.objects.all(), 'gitanjali')), [gitanjali])
+
+
+class RatingSummaryTests(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='Reviewed Book', author='A. Writer', price=100)
+        self.users = [
+            User.objects.create_user(email=f'reader{index}@example.com', password='secret', full_name='Reader')
+            for index in range(2)
+        ]
+
+    def review(self, user, rating, **fields):
+        return Review.objects.create(book=self.book, user=user, rating=rating, title='Review', comment='Text', **fields)
+
+    def summary(self):
+        self.book.refresh_from_db()
+        return self.book.rating_avg, self.book.rating_count
+
+    def test_summary_counts_approved_reviews(self):
+        self.review(self.users[0], 5, is_approved=True)
+        pending = self.review(self.users[1], 2)
+        self.assertEqual(self.summary(), (Decimal('5.0'), 1))
+
+        pending.is_approved = True
+        pending.save()
+        self.assertEqual(self.summary(), (Decimal('3.5'), 2))
+
+        pending.delete()
+        self.assertEqual(self.summary(), (Decimal('5.0'), 1))
+
+    def test_pending_reviews_keep_catalog_version(self):
+        version = get_catalog_version()
+        pending = self.review(self.users[0], 4)
+        pending.comment = 'Edited'
+        pending.save()
+        self.assertEqual(get_catalog_version(), version)
+
+        pending.is_approved = True
+        pending.save()
+        self.assertGreater(get_catalog_version(), version)
+
+        version = get_catalog_version()
+        pending.is_approved = False
+        pending.save()
+        self.assertGreater(get_catalog_version(), version)
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.books = [Book.objects.create(title=f'Book {index}', author='A. Writer', price=100 + index) for index in range(5)]
+
+    def test_pages_forward_and_back(self):
+        first = keyset_page(Book.objects.all(), 'price', False, per_page=2)
+        second = keyset_page(Book.objects.all(), 'price', False, first.next_cursor, per_page=2)
+        back = keyset_page(Book.objects.all(), 'price', False, second.previous_cursor, per_page=2)
+
+        self.assertEqual(list(first), self.books[:2])
+        self.assertEqual(list(second), self.books[2:4])
+        self.assertEqual(list(back), self.books[:2])
+
+    def test_malformed_cursor_starts_from_first_page(self):
+        cursors = [
+            'not-a-cursor',
+            encode_cursor({'v': 'abc', 'id': 1, 'r': False}),
+            encode_cursor({'v': '101', 'id': 'x', 'r': False}),
+            encode_cursor({'v': '101', 'id': 1, 'r': 'yes'}),
+            encode_cursor({'v': ['101'], 'id': 1, 'r': False}),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                page = keyset_page(Book.objects.all(), 'price', False, cursor, per_page=2)
+                self.assertEqual(list(page), self.books[:2])
+                self.assertIsNone(page.previous_cursor)
+
+
+class FacetTests(TestCase):
+    def facet_counts(self):
+        return dict(BookFacet.objects.values_list('author', 'book_count'))
+
+    def test_saves_move_books_between_facet_rows(self):
+        book = Book.objects.create(title='First', author='Humayun Ahmed', price=100)
+        Book.objects.create(title='Second', author='Humayun Ahmed', price=100)
+        self.assertEqual(self.facet_counts(), {'Humayun Ahmed': 2})
+
+        book.author = 'Zafar Iqbal'
+        book.save()
+        self.assertEqual(self.facet_counts(), {'Humayun Ahmed': 1, 'Zafar Iqbal': 1})
+
+        book.is_active = False
+        book.save()
+        self.assertEqual(self.facet_counts(), {'Humayun Ahmed': 1})
+
+    def test_rebuild_matches_incremental_counts(self):
+        Book.objects.create(title='First', author='Humayun Ahmed', price=100)
+        Book.objects.create(title='Second', author='Zafar Iqbal', price=100)
+        counts = self.facet_counts()
+
+        self.assertEqual(rebuild_facets(), 2)
+        self.assertEqual(self.facet_counts(), counts)
+
+
+class AutocompleteTests(TestCase):
+    def test_english_words_do_not_match_by_consonant_skeleton(self):
+        Book.objects.create(title='Hero Stories', author='A. Writer', price=100, slug='hero-stories')
+        harry = Book.objects.create(title='Harry Potter', author='J. K. Rowling', price=100, slug='harry-potter')
+        gitanjali = Book.objects.create(title='গীতাঞ্জলি', author='রবীন্দ্রনাথ ঠাকুর', price=100, slug='gitanjali')
+
+        index = AutocompleteIndex.build()
+
+        self.assertEqual(index.lookup('harry'), [harry.pk])
+        self.assertEqual(index.lookup('gitanj'), [gitanjali.pk])
@@ -23,6 +23,7 @@ urlpatterns = [
     path('category/<str:slug>/', views.category_books, name='category_books'),
     path('search/', views.search_books, name='search'),
     path('api/search/', views.live_search_api, name='live_search_api'),
+    path('api/user-fragments/', views.user_fragments, name='user_fragments'),
     
     # Cart (Now integrated into checkout)
     path('cart/', lambda request: redirect('orders:checkout'), name='cart'),
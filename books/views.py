@@ -1,11 +1,25 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, Avg, Sum
+from django.db.models.functions import Coalesce
 from django.core.paginator import Paginator
 from django.http import JsonResponse
-from .models import Book, Category, Cart, Wishlist, Review, Banner
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.utils.functional import SimpleLazyObject
+from .models import Book, Category, Cart, Wishlist, Review
 from .forms import ReviewForm
+from .cart_utils import CartSummary, aggregate_cart, invalidate_cart
+from .related import get_related_books
+from .search import search_queryset
+from . import autocomplete
+from .view_counter import record_view
+from .pagination import DEFAULT_SORT, get_sort_ordering, paginate_catalog
+from .facets import author_directory, category_id_for_slug, get_facet_counts, publisher_directory
+from .home_shelves import get_home_shelves
+from .language_utils import get_current_language
+from rentals.availability import annotate_rentable, rental_plan_ids
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,43 +27,15 @@ logger = logging.getLogger(__name__)
 
 def home(request):
     """Homepage view"""
-    banners = Banner.objects.filter(is_active=True).order_by('order')[:5]
-    # Exclude books with missing slugs to avoid reverse URL errors in templates
-    featured_books = Book.objects.filter(is_active=True, is_featured=True).exclude(slug__isnull=True).exclude(slug='')[:8]
-    bestsellers = Book.objects.filter(is_active=True, is_bestseller=True).exclude(slug__isnull=True).exclude(slug='')[:8]
-    new_arrivals = Book.objects.filter(is_active=True).exclude(slug__isnull=True).exclude(slug='').order_by('-created_at')[:8]
-    
-    # Get categories with books for category-wise section
-    categories_with_books = []
-    categories = Category.objects.filter(is_active=True).annotate(
-        book_count=Count('books', filter=Q(books__is_active=True))
-    ).filter(book_count__gt=0).order_by('name')[:10]  # Get up to 10 categories
-    
-    for category in categories:
-        books = Book.objects.filter(
-            category=category,
-            is_active=True
-        ).exclude(slug__isnull=True).exclude(slug='')[:4]  # Get 4 books per category
-        
-        if books.exists():
-            categories_with_books.append({
-                'category': category,
-                'books': books
-            })
+    # Shelves are cached per catalog version; only the wishlist is per request
+    context = dict(get_home_shelves(get_current_language(request)))
     
     # Get user's wishlist book IDs for authenticated users
     wishlist_book_ids = []
     if request.user.is_authenticated:
         wishlist_book_ids = list(Wishlist.objects.filter(user=request.user).values_list('book_id', flat=True))
     
-    context = {
-        'banners': banners,
-        'categories_with_books': categories_with_books,
-        'featured_books': featured_books,
-        'bestsellers': bestsellers,
-        'new_arrivals': new_arrivals,
-        'wishlist_book_ids': wishlist_book_ids,
-    }
+    context['wishlist_book_ids'] = wishlist_book_ids
     return render(request, 'books/home.html', context)
 
 
@@ -98,28 +84,20 @@ def book_list(request):
         books = books.filter(price__lte=max_price)
     
     # Sorting
-    sort_by = request.GET.get('sort', '-created_at')
-    if sort_by == 'price_low':
-        books = books.order_by('price')
-    elif sort_by == 'price_high':
-        books = books.order_by('-price')
-    elif sort_by == 'title':
-        books = books.order_by('title')
-    elif sort_by == 'popular':
-        books = books.order_by('-views', '-sales')
-    elif sort_by == 'newest':
-        books = books.order_by('-created_at')
-    else:
-        books = books.order_by('-created_at')
+    sort_by = request.GET.get('sort', DEFAULT_SORT)
+    ordering = get_sort_ordering(sort_by)
     
-    # Get unique authors and publishers for filter dropdowns
-    authors = Book.objects.filter(is_active=True).values_list('author', flat=True).distinct().order_by('author')
-    publishers = Book.objects.filter(is_active=True, publisher__isnull=False).exclude(publisher='').values_list('publisher', flat=True).distinct().order_by('publisher')
+    # Filter dropdowns with per-option counts for the current filters
+    facets = get_facet_counts(
+        category_id=category_id_for_slug(category_slug) if category_slug else None,
+        language=language,
+        author=author,
+        publisher=publisher,
+    )
     
-    # Pagination
-    paginator = Paginator(books, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination (keyset cursors for indexed sorts, page numbers otherwise).
+    # Lazy, so a cached page fragment (see catalog_fragment_context) skips the queries.
+    page_obj = SimpleLazyObject(lambda: paginate_catalog(request, books, ordering, per_page=12))
     
     # Get wishlist book IDs for authenticated users
     wishlist_book_ids = []
@@ -128,10 +106,11 @@ def book_list(request):
     
     context = {
         'page_obj': page_obj,
-        'books': page_obj.object_list,
+        'books': SimpleLazyObject(lambda: annotate_rentable(page_obj.object_list)),
         'wishlist_book_ids': wishlist_book_ids,
-        'authors': authors,
-        'publishers': publishers,
+        'facets': facets,
+        'authors': facets['authors'],
+        'publishers': facets['publishers'],
         'selected_rental_plan': selected_rental_plan,  # Pass to template
     }
     return render(request, 'books/book_list.html', context)
@@ -166,41 +145,35 @@ def category_books(request, slug):
         books = books.filter(price__lte=max_price)
     
     # Sorting
-    sort_by = request.GET.get('sort', '-created_at')
-    if sort_by == 'price_low':
-        books = books.order_by('price')
-    elif sort_by == 'price_high':
-        books = books.order_by('-price')
-    elif sort_by == 'title':
-        books = books.order_by('title')
-    else:
-        books = books.order_by('-created_at')
+    sort_by = request.GET.get('sort', DEFAULT_SORT)
+    ordering = get_sort_ordering(sort_by)
     
-    # Get unique authors and publishers for filter dropdowns (from this category only)
-    authors = Book.objects.filter(is_active=True, category=category).values_list('author', flat=True).distinct().order_by('author')
-    publishers = Book.objects.filter(is_active=True, category=category, publisher__isnull=False).exclude(publisher='').values_list('publisher', flat=True).distinct().order_by('publisher')
+    # Filter dropdowns with per-option counts (within this category)
+    facets = get_facet_counts(
+        category_id=category.pk,
+        language=language,
+        author=author,
+        publisher=publisher,
+    )
     
-    # Pagination
-    paginator = Paginator(books, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination (keyset cursors for indexed sorts, page numbers otherwise).
+    # Lazy, so a cached page fragment (see catalog_fragment_context) skips the queries.
+    page_obj = SimpleLazyObject(lambda: paginate_catalog(request, books, ordering, per_page=12))
     
     # Get wishlist book IDs for authenticated users
     wishlist_book_ids = []
     if request.user.is_authenticated:
         wishlist_book_ids = list(Wishlist.objects.filter(user=request.user).values_list('book_id', flat=True))
     
-    # Get all categories for the category filter dropdown
-    categories = Category.objects.filter(is_active=True).order_by('name')
-    
     context = {
         'category': category,
         'page_obj': page_obj,
-        'books': page_obj.object_list,
+        'books': SimpleLazyObject(lambda: annotate_rentable(page_obj.object_list)),
         'wishlist_book_ids': wishlist_book_ids,
-        'authors': authors,
-        'publishers': publishers,
-        'categories': categories,
+        'facets': facets,
+        'authors': facets['authors'],
+        'publishers': facets['publishers'],
+        'categories': facets['categories'],
     }
     return render(request, 'books/category_books.html', context)
 
@@ -209,9 +182,8 @@ def book_detail(request, slug):
     """Book detail view"""
     book = get_object_or_404(Book, slug=slug, is_active=True)
     
-    # Increment views
-    book.views += 1
-    book.save(update_fields=['views'])
+    # Count the view (buffered, flushed to Book.views by books.tasks.flush_book_views)
+    record_view(book.id)
     
     # Get reviews
     reviews = Review.objects.filter(book=book, is_approved=True).select_related('user')
@@ -221,25 +193,14 @@ def book_detail(request, slug):
     if request.user.is_authenticated:
         user_has_reviewed = Review.objects.filter(book=book, user=request.user).exists()
     
-    # Related books
-    related_books = Book.objects.filter(
-        category=book.category,
-        is_active=True
-    ).exclude(id=book.id).exclude(slug__isnull=True).exclude(slug='')[:4]
-    # Check if this book is assigned to any active rental plan
-    rental_available = False
-    default_rental_plan_id = None
-    try:
-        from rentals.models import RentalPlan
-        plans_qs = RentalPlan.objects.filter(is_active=True, books=book)
-        rental_available = plans_qs.exists()
-        # If exactly one plan assigned, use it as default so we can pre-select on rental page
-        if plans_qs.count() == 1:
-            default_rental_plan_id = plans_qs.first().id
-    except Exception:
-        # If rentals app isn't available or any error occurs, default to False
-        rental_available = False
-        default_rental_plan_id = None
+    # Related books (precomputed neighbors, see books/related.py); lazy so a
+    # cached fragment doesn't query them
+    related_books = SimpleLazyObject(lambda: get_related_books(book))
+    # Active rental plans this book is offered under (cached availability map)
+    plan_ids = rental_plan_ids(book.id)
+    rental_available = bool(plan_ids)
+    # If exactly one plan assigned, use it as default so we can pre-select on rental page
+    default_rental_plan_id = plan_ids[0] if len(plan_ids) == 1 else None
     
     context = {
         'book': book,
@@ -255,15 +216,7 @@ def book_detail(request, slug):
 def search_books(request):
     """Search books"""
     query = request.GET.get('q', '')
-    books = Book.objects.filter(is_active=True)
-    
-    if query:
-        books = books.filter(
-            Q(title__icontains=query) |
-            Q(author__icontains=query) |
-            Q(publisher__icontains=query) |
-            Q(isbn__icontains=query)
-        )
+    books = search_queryset(Book.objects.filter(is_active=True), query)
     
     # Pagination
     paginator = Paginator(books, 12)
@@ -273,7 +226,7 @@ def search_books(request):
     context = {
         'query': query,
         'page_obj': page_obj,
-        'books': page_obj.object_list,
+        'books': annotate_rentable(page_obj.object_list),
     }
     return render(request, 'books/search_results.html', context)
 
@@ -284,27 +237,34 @@ def live_search_api(request):
     results = []
     
     if query and len(query) >= 1:  # Start searching from first character
-        books = Book.objects.filter(
-            Q(title__icontains=query) |
-            Q(author__icontains=query) |
-            Q(publisher__icontains=query)
-        ).filter(is_active=True)[:10]  # Limit to 10 results
-        
-        for book in books:
-            results.append({
-                'id': book.id,
-                'title': book.title,
-                'author': book.author,
-                'publisher': book.publisher or '',
-                'price': str(book.price),
-                'image': book.cover_image.url if book.cover_image else '',
-                'url': book.get_absolute_url(),
-                'slug': book.slug,
-            })
+        # Served from the in-memory autocomplete index, no database queries
+        results = autocomplete.suggest(query, limit=10)
     
     return JsonResponse({'results': results, 'count': len(results)})
 
 
+@never_cache
+@ensure_csrf_cookie
+def user_fragments(request):
+    """Per-visitor state for pages rendered from shared cached fragments
+
+    main.js fills in the cart badge and wishlist hearts from this when a page
+    carries no inline user data. Also sets the CSRF cookie the AJAX cart and
+    wishlist buttons need.
+    """
+    summary = CartSummary(request)
+    wishlist_book_ids = []
+    if request.user.is_authenticated:
+        wishlist_book_ids = list(Wishlist.objects.filter(user=request.user).values_list('book_id', flat=True))
+    
+    return JsonResponse({
+        'authenticated': request.user.is_authenticated,
+        'cart_count': summary.count,
+        'cart_total': str(summary.total),
+        'wishlist_book_ids': wishlist_book_ids,
+    })
+
+
 def cart(request):
     """Shopping cart view"""
     cart_items = []
@@ -400,6 +360,8 @@ def add_to_cart(request, book_id):
         # Get cart count for guest users
         cart_count = Cart.objects.filter(session_key=request.session.session_key).count()
     
+    invalidate_cart(request)
+    
     # Check if it's an AJAX request
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
@@ -474,14 +436,17 @@ def update_cart(request, cart_id):
             cart_item.delete()
             item_subtotal = 0
         
+        invalidate_cart(request)
+        
         # Calculate updated cart totals
         if request.user.is_authenticated:
             cart_items = Cart.objects.filter(user=request.user)
         else:
             cart_items = Cart.objects.filter(session_key=session_key)
         
-        subtotal = sum(item.subtotal for item in cart_items)
-        cart_count = sum(item.quantity for item in cart_items)
+        totals = aggregate_cart(cart_items)
+        subtotal = totals['total']
+        cart_count = totals['count']
         shipping_cost = 60 if subtotal > 0 else 0
         total = subtotal + shipping_cost
         
@@ -521,6 +486,7 @@ def remove_from_cart(request, cart_id):
                 return JsonResponse({'success': False, 'message': 'Cart item not found'})
         
         cart_item.delete()
+        invalidate_cart(request)
         
         # Calculate updated cart totals
         if request.user.is_authenticated:
@@ -528,8 +494,9 @@ def remove_from_cart(request, cart_id):
         else:
             cart_items = Cart.objects.filter(session_key=session_key)
         
-        subtotal = sum(item.subtotal for item in cart_items)
-        cart_count = sum(item.quantity for item in cart_items)
+        totals = aggregate_cart(cart_items)
+        subtotal = totals['total']
+        cart_count = totals['count']
         shipping_cost = 60 if subtotal > 0 else 0
         total = subtotal + shipping_cost
         
@@ -552,6 +519,7 @@ def clear_cart(request):
         Cart.objects.filter(user=request.user).delete()
     elif request.session.session_key:
         Cart.objects.filter(session_key=request.session.session_key).delete()
+    invalidate_cart(request)
     
     messages.success(request, 'Cart cleared!')
     return redirect('books:cart')
@@ -651,7 +619,7 @@ def add_review(request, slug):
 def all_categories(request):
     """View to display all categories with pagination"""
     categories_list = Category.objects.filter(is_active=True).annotate(
-        book_count=Count('books', filter=Q(books__is_active=True))
+        book_count=Coalesce(Sum('book_facets__book_count'), 0)
     ).order_by('name')
     
     # Pagination
@@ -669,9 +637,7 @@ def all_categories(request):
 def all_authors(request):
     """View to display all authors with pagination"""
     # Get unique authors with book count
-    authors_list = Book.objects.filter(is_active=True).values('author', 'author_bn').annotate(
-        book_count=Count('id')
-    ).order_by('author')
+    authors_list = author_directory()
     
     # Search functionality
     search_query = request.GET.get('search', '').strip()
@@ -697,12 +663,7 @@ def all_authors(request):
 def all_publishers(request):
     """View to display all publishers with pagination"""
     # Get unique publishers with book count
-    publishers_list = Book.objects.filter(
-        is_active=True, 
-        publisher__isnull=False
-    ).exclude(publisher='').values('publisher', 'publisher_bn').annotate(
-        book_count=Count('id')
-    ).order_by('publisher')
+    publishers_list = publisher_directory()
     
     # Search functionality
     search_query = request.GET.get('search', '').strip()
@@ -6,3 +6,8 @@ import pymysql
 
 # Use PyMySQL as a replacement for mysqlclient
 pymysql.install_as_MySQLdb()
+
+# Load the Celery app so shared tasks queued from web processes use its settings
+from .celery import app as celery_app  # noqa: E402
+
+__all__ = ('celery_app',)
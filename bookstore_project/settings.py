@@ -78,6 +78,7 @@ TEMPLATES = [
                 'books.context_processors.cart_context',
                 'books.context_processors.categories_context',
                 'books.context_processors.language_context',
+                'books.context_processors.catalog_fragment_context',
             ],
         },
     },
@@ -149,6 +150,26 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 
+# Hashed file names + staticfiles.json manifest, with .gz/.br copies of text
+# assets (collected by `python manage.py build_assets`, see books/assets.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'books.assets.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Bundle name -> static source files, concatenated and minified in this order
+ASSET_BUNDLES = {
+    'site.css': ['css/style.css', 'css/chat-widget.css'],
+    'site.js': ['js/main.js', 'js/chat-widget.js'],
+    'admin-panel.css': ['css/admin-panel.css'],
+}
+# Serve the built bundles instead of the source files
+ASSET_BUNDLING = config('ASSET_BUNDLING', default=not DEBUG, cast=bool)
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -188,6 +209,21 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Catalog Search
+# Index Bangla words under a Latin transliteration key so English queries find them
+# (run `python manage.py rebuild_search_index` after changing this)
+SEARCH_TRANSLITERATION = config('SEARCH_TRANSLITERATION', default=True, cast=bool)
+
+# Catalog Pagination
+# Page listings sorted by date, price or sales with keyset cursors instead of OFFSET
+CATALOG_CURSOR_PAGINATION = config('CATALOG_CURSOR_PAGINATION', default=True, cast=bool)
+# Result counts on cursor pages: 'exact', 'cached' (per catalog version) or 'estimate' (MySQL EXPLAIN)
+CATALOG_COUNT_MODE = config('CATALOG_COUNT_MODE', default='cached')
+
+# Catalog Page Fragments
+# Seconds to keep shared (user-neutral) catalog page bodies cached; 0 renders every request
+CATALOG_FRAGMENT_TIMEOUT = config('CATALOG_FRAGMENT_TIMEOUT', default=600, cast=int)
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -326,6 +362,48 @@ CELERY_BEAT_SCHEDULE = {
             'expires': 1800,  # Task expires after 30 minutes if not executed
         },
     },
+    # Flush buffered book view counts (every minute)
+    'flush-book-views': {
+        'task': 'books.tasks.flush_book_views',
+        'schedule': 60.0,
+        'options': {
+            'expires': 50,  # Skip if the next run is already due
+        },
+    },
+    # Co-purchase recommendations from new orders (3 AM every day)
+    'update-co-purchase-index': {
+        'task': 'books.tasks.update_co_purchase_index',
+        'schedule': crontab(hour=3, minute=0),
+        'options': {
+            'expires': 3600,
+        },
+    },
+    # Full co-purchase recount, dropping cancelled and refunded orders (Sunday 2 AM)
+    'rebuild-co-purchase-index': {
+        'task': 'books.tasks.update_co_purchase_index',
+        'schedule': crontab(hour=2, minute=0, day_of_week=0),
+        'kwargs': {'full': True},
+        'options': {
+            'expires': 3600,
+        },
+    },
+    # Related books for newly added books (3:30 AM every day)
+    'refresh-related-books': {
+        'task': 'books.tasks.refresh_related_books',
+        'schedule': crontab(hour=3, minute=30),
+        'options': {
+            'expires': 3600,
+        },
+    },
+    # Full related books recompute, picking up new orders and edits (Sunday 4 AM)
+    'recompute-related-books': {
+        'task': 'books.tasks.refresh_related_books',
+        'schedule': crontab(hour=4, minute=0, day_of_week=0),
+        'kwargs': {'full': True},
+        'options': {
+            'expires': 3600,
+        },
+    },
 }
 
 # Logging Configuration
@@ -10,6 +10,7 @@ from django.http import HttpResponse
 import csv
 import logging
 from .email_utils import send_order_confirmation_email
+from .inventory import release_order_stock
 
 logger = logging.getLogger(__name__)
 
@@ -138,6 +139,7 @@ class OrderAdmin(admin.ModelAdmin):
             if order.status != 'cancelled':
                 order.status = 'cancelled'
                 order.save()
+                release_order_stock(order, 'cancelled by staff')
                 OrderStatusHistory.objects.create(order=order, status='cancelled', changed_by=request.user)
                 count += 1
         self.message_user(request, f"Marked {count} order(s) as cancelled")
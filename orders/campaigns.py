@@ -0,0 +1,105 @@
+"""
+Bulk coupon campaigns
+
+A campaign is a Coupon with is_campaign set. It holds the rules (discount,
+minimum purchase, validity, uses per customer), and its code is only the
+prefix of the codes customers enter. Those are CampaignCode rows that hold
+just the code (the primary key), the coupon and a used flag, e.g.
+"EID24-7KQ2M9XDPA". Every campaign code maps to that one coupon, so pricing
+and redemption (orders/pricing.py, orders/coupons.py) treat it like any other.
+
+generate_codes inserts random codes in batches with bulk_create, skipping
+the rare duplicate, then counts the campaign's codes once and tops up any
+that collided. Looking up
+an entered code is a single primary key query (find_campaign_code).
+stream_codes_csv exports a campaign's codes in keyset-paginated batches, so
+a 100k-code export never holds more than one batch in memory.
+"""
+import csv
+import re
+import secrets
+
+from .models import CampaignCode, Coupon
+
+# No 0/O or 1/I, so codes survive being read out or retyped
+CODE_ALPHABET = '23456789ABCDEFGHJKLMNPQRSTUVWXYZ'
+CODE_LENGTH = 10
+PREFIX_MAX_LENGTH = 12
+
+GENERATION_BATCH_SIZE = 5000
+EXPORT_BATCH_SIZE = 5000
+
+# Generating more at once is left to repeated runs
+MAX_CAMPAIGN_CODES = 500000
+
+# Most codes the admin generates within the request when the task queue is down
+INLINE_GENERATION_LIMIT = GENERATION_BATCH_SIZE
+
+PREFIX_RE = re.compile(rf'^[A-Z0-9]{{1,{PREFIX_MAX_LENGTH}}}$')
+CAMPAIGN_CODE_RE = re.compile(rf'^[A-Z0-9]{{1,{PREFIX_MAX_LENGTH}}}-[{CODE_ALPHABET}]{{{CODE_LENGTH}}}$')
+
+
+def random_code(prefix):
+    # 32 letters, so the low 5 bits of each random byte pick one without bias
+    return f"{prefix}-{''.join(CODE_ALPHABET[byte & 31] for byte in secrets.token_bytes(CODE_LENGTH))}"
+
+
+def generate_codes(coupon, count, batch_size=GENERATION_BATCH_SIZE):
+    """Add count new single-use codes to a campaign coupon. Returns how many were created."""
+    existing = coupon.campaign_codes.count()
+    target = existing + count
+    created = existing
+    while created < target:
+        missing = target - created
+        for start in range(0, missing, batch_size):
+            size = min(batch_size, missing - start)
+            CampaignCode.objects.bulk_create(
+                [CampaignCode(code=random_code(coupon.code), coupon=coupon) for _ in range(size)],
+                ignore_conflicts=True,
+            )
+        # Codes colliding with existing ones were skipped: count what actually went in
+        created = coupon.campaign_codes.count()
+    Coupon.objects.filter(pk=coupon.pk).update(campaign_size=created)
+    coupon.campaign_size = created
+    return created - existing
+
+
+def find_campaign_code(code):
+    """The campaign code entered (with its coupon), or None for codes that aren't campaign codes"""
+    if not CAMPAIGN_CODE_RE.match(code):
+        return None
+    return CampaignCode.objects.select_related('coupon').filter(pk=code).first()
+
+
+def iter_codes(coupon, batch_size=EXPORT_BATCH_SIZE):
+    """(code, is_used) for every code of a campaign, fetched one batch at a time"""
+    last = ''
+    while True:
+        batch = list(
+            CampaignCode.objects.filter(coupon=coupon, code__gt=last)
+            .order_by('code').values_list('code', 'is_used')[:batch_size]
+        )
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        last = batch[-1][0]
+
+
+class _Echo:
+    """File-like object whose write returns the line (csv.writer writes into it)"""
+
+    def write(self, value):
+        return value
+
+
+def stream_codes_csv(coupon):
+    """CSV lines (header first) of a campaign's codes, for a StreamingHttpResponse"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(['code', 'used'])
+    for code, is_used in iter_codes(coupon):
+        yield writer.writerow([code, 'yes' if is_used else 'no'])
+
+
+def mark_code_used(coupon, code):
+    """Use up a campaign code, once. Returns False if it was already used (or isn't the coupon's)."""
+    return bool(CampaignCode.objects.filter(pk=code, coupon=coupon, is_used=False).update(is_used=True))
@@ -0,0 +1,146 @@
+"""
+Coupon lookup and redemption
+
+Coupons are read by code from the cache (get_coupon), so a flash-sale code
+isn't fetched from the database on every apply. Entries are bound to a
+version counter that saving or deleting any coupon bumps (see
+orders/signals.py). The cached used_count can lag behind, so validation
+only uses it as a hint. The limits are enforced when the coupon is redeemed.
+
+redeem_coupon runs in the order's transaction and counts the use with two
+conditional UPDATEs:
+
+    UPDATE orders_couponuserusage SET uses = uses + 1
+     WHERE coupon_id = 5 AND user_id = 9 AND uses < 1        (max_uses_per_user)
+
+    UPDATE orders_coupon SET used_count = used_count + 1
+     WHERE id = 5 AND is_active AND valid_from <= now AND valid_to >= now
+       AND (max_uses IS NULL OR used_count < max_uses)
+
+Each one checks and increments its row under the row lock, so parallel
+checkouts can't go over max_uses or max_uses_per_user. A user's counter row
+is unique per coupon and is created on their first redemption. If either
+update matches nothing, the redemption raises CouponUnavailable and its
+savepoint rolls the other one back. The shared coupon row is updated last,
+which keeps its lock as short as possible. A bulk campaign code (see
+orders/campaigns.py) is marked used first, by the same kind of update.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .campaigns import mark_code_used
+from .models import Coupon, CouponUsage, CouponUserUsage
+
+COUPONS_VERSION_KEY = 'coupons_version'
+COUPON_CACHE_TIMEOUT = 60 * 5
+
+# Cached for codes that don't exist, so guessed codes don't reach the database
+MISSING = 0
+
+
+class CouponUnavailable(Exception):
+    """Raised when a coupon can't be redeemed. `reason` is 'code_used', 'user_limit' or 'used_up' (or expired)."""
+
+    def __init__(self, message, reason):
+        self.reason = reason
+        super().__init__(message)
+
+
+def normalize_code(code):
+    return (code or '').strip().upper()
+
+
+def get_coupons_version():
+    version = cache.get(COUPONS_VERSION_KEY)
+    if version is None:
+        # Seeded from the clock so an evicted counter never repeats an old version
+        cache.add(COUPONS_VERSION_KEY, int(time.time()), None)
+        version = cache.get(COUPONS_VERSION_KEY)
+    return version
+
+
+def invalidate_coupons():
+    try:
+        cache.incr(COUPONS_VERSION_KEY)
+    except ValueError:
+        cache.set(COUPONS_VERSION_KEY, int(time.time()), None)
+
+
+def coupon_cache_key(code):
+    return f'coupon:{get_coupons_version()}:{code}'
+
+
+def get_coupon(code):
+    """The coupon with this code (case-insensitive), or None
+
+    Campaign coupons aren't found by their prefix: their generated codes
+    are looked up with campaigns.find_campaign_code.
+    """
+    code = normalize_code(code)
+    if not code:
+        return None
+    key = coupon_cache_key(code)
+    coupon = cache.get(key)
+    if coupon is None:
+        coupon = Coupon.objects.filter(code=code, is_campaign=False).first() or MISSING
+        cache.set(key, coupon, COUPON_CACHE_TIMEOUT)
+    return coupon or None
+
+
+def forget_coupon(code):
+    """Drop a cached coupon whose use count changed (so the next read sees it used up)"""
+    cache.delete(coupon_cache_key(normalize_code(code)))
+
+
+def _count_user_use(coupon, user):
+    counters = CouponUserUsage.objects.filter(coupon=coupon, user=user, uses__lt=coupon.max_uses_per_user)
+    if counters.update(uses=F('uses') + 1):
+        return True
+    try:
+        with transaction.atomic():
+            CouponUserUsage.objects.create(coupon=coupon, user=user, uses=1)
+        return True
+    except IntegrityError:
+        # The row exists: this user is at the limit, or a parallel checkout created it first
+        return bool(counters.update(uses=F('uses') + 1))
+
+
+def _count_use(coupon):
+    now = timezone.now()
+    return bool(
+        Coupon.objects.filter(pk=coupon.pk, is_active=True, valid_from__lte=now, valid_to__gte=now)
+        .filter(Q(max_uses__isnull=True) | Q(used_count__lt=F('max_uses')))
+        .update(used_count=F('used_count') + 1)
+    )
+
+
+def redeem_coupon(coupon, user, order=None, code=None):
+    """Count one use of the coupon by the user and record it, within its limits
+
+    Call it inside the transaction that creates the order, so the use is
+    only counted if the order is. Campaign coupons also need the code that
+    was entered. Raises CouponUnavailable (and counts nothing) if that code
+    was used already, the coupon is used up or no longer valid, or the user
+    has used it max_uses_per_user times.
+    """
+    with transaction.atomic():
+        if coupon.is_campaign and not mark_code_used(coupon, normalize_code(code)):
+            transaction.set_rollback(True)
+            message = "This coupon code has already been used"
+            reason = 'code_used'
+        elif not _count_user_use(coupon, user):
+            transaction.set_rollback(True)
+            message = f"You have already used this coupon {coupon.max_uses_per_user} time(s)"
+            reason = 'user_limit'
+        elif not _count_use(coupon):
+            transaction.set_rollback(True)
+            message = "This coupon has expired or is no longer available"
+            reason = 'used_up'
+        else:
+            return CouponUsage.objects.create(coupon=coupon, user=user, order=order)
+    forget_coupon(coupon.code)
+    raise CouponUnavailable(message, reason)
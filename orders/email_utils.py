@@ -21,7 +21,7 @@ def send_order_confirmation_email(order):
     # Render email HTML
     html_message = render_to_string('emails/order_confirmation.html', {
         'order': order,
-        'order_items': order.items.all(),
+        'order_items': order.items.select_related('book'),
         'site_url': site_url,
     })
     
@@ -0,0 +1,136 @@
+"""
+Stock reservation for orders
+
+Checkout reserves stock for the whole cart with one conditional UPDATE:
+
+    UPDATE books_book
+       SET stock = stock - CASE id WHEN 1 THEN 2 WHEN 7 THEN 1 END, sales = ...
+     WHERE id IN (1, 7) AND stock >= CASE id WHEN 1 THEN 2 WHEN 7 THEN 1 END
+
+The database checks and decrements each row atomically under its row lock,
+so two checkouts racing for the last copy can't both get it. If fewer rows
+were updated than books requested, something ran out: the reservation
+raises InsufficientStock and its savepoint rolls the partial update back.
+
+Stock changes leave the catalog cache alone. Only a book running out (or
+coming back in stock) bumps the stock version, which retires the cached
+listing fragments that show stock badges.
+
+An order holds its reservation while Order.stock_reserved is set. Releasing
+(order cancelled, payment failed or abandoned) clears the flag with a
+conditional update first, so a reservation is returned exactly once however
+many callbacks arrive.
+"""
+import logging
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from books.catalog_cache import bump_stock_version
+from books.models import Book
+
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+
+class InsufficientStock(Exception):
+    """Raised when a reservation can't be met. `shortages` lists (book, requested)."""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        titles = ', '.join(book.title for book, _ in shortages)
+        super().__init__(f"Insufficient stock: {titles}")
+
+
+def _quantities(lines):
+    """{book_id: quantity} from (book_id, quantity) pairs, merging repeats"""
+    quantities = Counter()
+    for book_id, quantity in lines:
+        if quantity > 0:
+            quantities[book_id] += quantity
+    return quantities
+
+
+def _per_book(quantities):
+    return Case(
+        *(When(pk=book_id, then=Value(quantity)) for book_id, quantity in quantities.items()),
+        output_field=IntegerField(),
+    )
+
+
+def _shortages(quantities):
+    books = Book.objects.in_bulk(list(quantities))
+    return [
+        (books.get(book_id) or Book(pk=book_id, title=f"Book #{book_id}"), quantity)
+        for book_id, quantity in quantities.items()
+        if book_id not in books or books[book_id].stock < quantity
+    ]
+
+
+def reserve_stock(lines):
+    """Take stock for (book_id, quantity) pairs, all or nothing
+
+    Runs in a savepoint: call it inside the transaction that creates the
+    order, so the order and its stock commit together.
+    """
+    quantities = _quantities(lines)
+    if not quantities:
+        return
+    needed = _per_book(quantities)
+    with transaction.atomic():
+        updated = Book.objects.filter(pk__in=quantities, stock__gte=needed).update(
+            stock=F('stock') - needed, sales=F('sales') + needed,
+        )
+        if updated != len(quantities):
+            # Something ran out: give back the rows that were taken
+            transaction.set_rollback(True)
+    if updated != len(quantities):
+        raise InsufficientStock(_shortages(quantities))
+    if Book.objects.filter(pk__in=quantities, stock=0).exists():
+        # A book sold out
+        transaction.on_commit(bump_stock_version)
+
+
+def return_stock(lines):
+    """Put (book_id, quantity) pairs back on the shelf"""
+    quantities = _quantities(lines)
+    if not quantities:
+        return
+    returned = _per_book(quantities)
+    Book.objects.filter(pk__in=quantities).update(
+        stock=F('stock') + returned, sales=F('sales') - returned,
+    )
+    if Book.objects.filter(pk__in=quantities, stock=returned).exists():
+        # A sold-out book is back in stock
+        transaction.on_commit(bump_stock_version)
+
+
+def order_lines(order):
+    return order.items.exclude(book=None).values_list('book_id', 'quantity')
+
+
+def release_order_stock(order, reason=''):
+    """Return an order's reserved stock, once. Returns True if anything was released."""
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order.pk, stock_reserved=True).update(stock_reserved=False):
+            return False
+        return_stock(order_lines(order))
+    order.stock_reserved = False
+    logger.info(f"Released stock for order {order.order_number}{f' ({reason})' if reason else ''}")
+    return True
+
+
+def reserve_order_stock(order):
+    """Take stock again for an order whose reservation was released
+
+    Used when a payment arrives after the order's stock was given back.
+    Raises InsufficientStock if it has been sold in the meantime.
+    """
+    with transaction.atomic():
+        if not Order.objects.filter(pk=order.pk, stock_reserved=False).update(stock_reserved=True):
+            return False
+        reserve_stock(order_lines(order))
+    order.stock_reserved = True
+    return True
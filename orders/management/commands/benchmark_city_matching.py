@@ -0,0 +1,70 @@
+"""
+Benchmark shipping city resolution against the real address corpus
+
+Reads every city customers have typed (saved addresses and order shipping
+cities), resolves them with the shipping fee table and reports how each was
+matched, how long resolution takes cold and cached, and the most common
+cities that matched nothing (candidates for ShippingFee aliases).
+
+Usage: python manage.py benchmark_city_matching [--repeat 20] [--unmatched 20]
+"""
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from accounts.models import Address
+from orders.models import Order
+from orders.shipping import ShippingFeeTable, normalize_city
+
+
+class Command(BaseCommand):
+    help = 'Resolve every address and order city and time the shipping fee city matching'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Passes over the corpus for the cached timing')
+        parser.add_argument('--unmatched', type=int, default=20, help='Unmatched cities to list')
+
+    def handle(self, *args, **options):
+        corpus = Counter(Address.objects.values_list('city', flat=True))
+        corpus.update(Order.objects.values_list('shipping_city', flat=True))
+        corpus.pop(None, None)
+        corpus.pop('', None)
+        if not corpus:
+            self.stdout.write(self.style.WARNING('No address or order cities to match'))
+            return
+        total = sum(corpus.values())
+
+        started = time.perf_counter()
+        table = ShippingFeeTable.build()
+        built = time.perf_counter()
+
+        methods = Counter()
+        unmatched = Counter()
+        for city, count in corpus.items():
+            match = table.resolve(city)
+            methods[match.method if match else 'unmatched'] += count
+            if match is None:
+                unmatched[normalize_city(city)] += count
+        resolved = time.perf_counter()
+
+        cities = list(corpus.elements())
+        for _ in range(options['repeat']):
+            for city in cities:
+                table.fee_for(city)
+        cached = time.perf_counter()
+
+        self.stdout.write(
+            f'Corpus: {total:,} cities ({len(corpus):,} distinct spellings), '
+            f'table: {len(table.names):,} names, built in {(built - started) * 1000:.1f} ms'
+        )
+        for method in ('exact', 'alias', 'sound', 'fuzzy', 'unmatched'):
+            self.stdout.write(f'  {method:<10} {methods[method]:>8,}  {methods[method] / total:6.1%}')
+        self.stdout.write(f'Cold resolution: {(resolved - built) / len(corpus) * 1e6:.1f} µs per distinct spelling')
+        lookups = len(cities) * options['repeat']
+        if lookups:
+            self.stdout.write(f'Cached lookup: {(cached - resolved) / lookups * 1e6:.2f} µs ({lookups:,} lookups)')
+        if unmatched and options['unmatched']:
+            self.stdout.write('Most common unmatched cities (default fee charged):')
+            for city, count in unmatched.most_common(options['unmatched']):
+                self.stdout.write(f'  {count:>6,}  {city}')
@@ -0,0 +1,115 @@
+"""
+Concurrency stress test for coupon redemption
+
+Creates a throwaway flash-sale coupon and users, then has many threads (each
+on its own database connection) redeem the one code at once, the way a
+flash sale would. Passes when no limit was exceeded: used_count equals the
+successful redemptions and never passes max_uses, no user went over
+max_uses_per_user, every use was recorded once, and nobody was refused while
+uses were left. The coupon and users are deleted afterwards.
+
+Run it against the real database engine (MySQL): SQLite serialises writers.
+
+Usage: python manage.py stress_test_coupon [--workers 64] [--redemptions 5000] [--max-uses 1000] [--users 2000]
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from accounts.models import User
+from orders.coupons import CouponUnavailable, redeem_coupon
+from orders.models import Coupon, CouponUsage, CouponUserUsage
+
+
+class Command(BaseCommand):
+    help = 'Race concurrent redemptions of one coupon code and verify its limits are never exceeded'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=64, help='Concurrent redemptions')
+        parser.add_argument('--redemptions', type=int, default=5000, help='Redemptions attempted in total')
+        parser.add_argument('--max-uses', type=int, default=1000, help='Uses the coupon allows in total')
+        parser.add_argument('--per-user', type=int, default=1, help='Uses each user is allowed')
+        parser.add_argument('--users', type=int, default=2000, help='Distinct users redeeming')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        coupon = Coupon.objects.create(
+            code=f'STRESS{int(time.time())}', description='Coupon stress test', discount_type='fixed',
+            discount_value=1, max_uses=options['max_uses'], max_uses_per_user=options['per_user'],
+            valid_from=now - timedelta(hours=1), valid_to=now + timedelta(hours=1),
+        )
+        marker = f'coupon-stress-{coupon.pk}'
+        User.objects.bulk_create([
+            User(email=f'{marker}-{index}@example.invalid', full_name='Coupon stress test', is_active=False)
+            for index in range(options['users'])
+        ], batch_size=1000)
+        users = list(User.objects.filter(email__startswith=marker))
+        results = {'redeemed': 0, 'used_up': 0, 'user_limit': 0, 'errors': 0}
+        lock = threading.Lock()
+        first_wave = min(options['workers'], options['redemptions'])
+        start = threading.Barrier(first_wave)
+
+        def redeem(attempt):
+            if attempt < first_wave:
+                start.wait()  # release the first wave together
+            try:
+                with transaction.atomic():
+                    redeem_coupon(coupon, users[attempt % len(users)])
+                outcome = 'redeemed'
+            except CouponUnavailable as e:
+                outcome = e.reason
+            except OperationalError:
+                # Lock wait timeout / deadlock: the transaction rolled back
+                outcome = 'errors'
+            finally:
+                connection.close()
+            with lock:
+                results[outcome] += 1
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                list(pool.map(redeem, range(options['redemptions'])))
+            elapsed = time.perf_counter() - started
+
+            failures = []
+            coupon.refresh_from_db()
+            recorded = CouponUsage.objects.filter(coupon=coupon).count()
+            if coupon.used_count > coupon.max_uses:
+                failures.append(f'used_count {coupon.used_count} is over max_uses {coupon.max_uses}')
+            if coupon.used_count != results['redeemed']:
+                failures.append(f'used_count {coupon.used_count} for {results["redeemed"]} successful redemptions')
+            if recorded != results['redeemed']:
+                failures.append(f'{recorded} usages recorded for {results["redeemed"]} successful redemptions')
+            if results['used_up'] and coupon.used_count < coupon.max_uses:
+                failures.append(f'Redemptions were refused with {coupon.max_uses - coupon.used_count} uses left')
+            recorded_per_user = dict(
+                CouponUsage.objects.filter(coupon=coupon).values_list('user').annotate(uses=Count('id')).order_by()
+            )
+            for user_id, uses in CouponUserUsage.objects.filter(coupon=coupon).values_list('user_id', 'uses'):
+                if uses > coupon.max_uses_per_user:
+                    failures.append(f'User {user_id} redeemed {uses} times (limit {coupon.max_uses_per_user})')
+                if uses != recorded_per_user.get(user_id, 0):
+                    failures.append(f'User {user_id}: counter {uses}, {recorded_per_user.get(user_id, 0)} usages')
+        finally:
+            coupon.delete()
+            User.objects.filter(email__startswith=marker).delete()
+
+        self.stdout.write(
+            f"{options['redemptions']} redemptions of one code by {len(users)} users "
+            f"(max {options['max_uses']}, {options['per_user']} per user), {options['workers']} workers, "
+            f"{elapsed:.2f}s ({options['redemptions'] / elapsed:.0f}/s)"
+        )
+        self.stdout.write(
+            f"Redeemed: {results['redeemed']}  used up: {results['used_up']}  "
+            f"user limit: {results['user_limit']}  lock errors: {results['errors']}"
+        )
+        if failures:
+            raise CommandError('Limits exceeded:\n' + '\n'.join(failures[:20]))
+        self.stdout.write(self.style.SUCCESS('No coupon limit exceeded'))
@@ -0,0 +1,99 @@
+"""
+Concurrency stress test for checkout stock reservation
+
+Creates throwaway books with a little stock, then has many threads (each on
+its own database connection) check out carts holding all of them at once,
+the way simultaneous checkouts would. Passes when nothing is oversold:
+every successful cart took exactly one unit set, stock never went negative,
+and carts were all-or-nothing. The books are deleted afterwards.
+
+Run it against the real database engine (MySQL): SQLite serialises writers.
+
+Usage: python manage.py stress_test_stock [--workers 32] [--checkouts 200] [--stock 25] [--books 3]
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+
+from books.models import Book
+from orders.inventory import InsufficientStock, reserve_stock
+
+
+class Command(BaseCommand):
+    help = 'Race concurrent checkouts for the same books and verify stock is never oversold'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=32, help='Concurrent checkouts')
+        parser.add_argument('--checkouts', type=int, default=200, help='Checkouts attempted in total')
+        parser.add_argument('--stock', type=int, default=25, help='Starting stock of each book')
+        parser.add_argument('--quantity', type=int, default=1, help='Copies of each book per cart')
+        parser.add_argument('--books', type=int, default=3, help='Books in every cart')
+
+    def handle(self, *args, **options):
+        quantity = options['quantity']
+        books = [
+            Book.objects.create(
+                title=f'Stock stress test {index}', author='Stress test', price=100,
+                stock=options['stock'], is_active=False,
+            )
+            for index in range(options['books'])
+        ]
+        cart = [(book.pk, quantity) for book in books]
+        results = {'reserved': 0, 'out_of_stock': 0, 'errors': 0}
+        lock = threading.Lock()
+        first_wave = min(options['workers'], options['checkouts'])
+        start = threading.Barrier(first_wave)
+
+        def checkout(attempt):
+            if attempt < first_wave:
+                start.wait()  # release the first wave together
+            try:
+                with transaction.atomic():
+                    reserve_stock(cart if attempt % 2 else reversed(cart))
+                outcome = 'reserved'
+            except InsufficientStock:
+                outcome = 'out_of_stock'
+            except OperationalError:
+                # Lock wait timeout / deadlock: the transaction rolled back
+                outcome = 'errors'
+            finally:
+                connection.close()
+            with lock:
+                results[outcome] += 1
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                list(pool.map(checkout, range(options['checkouts'])))
+            elapsed = time.perf_counter() - started
+
+            failures = []
+            for book in Book.objects.filter(pk__in=[book.pk for book in books]):
+                sold = options['stock'] - book.stock
+                if book.stock < 0:
+                    failures.append(f'{book.title}: stock went negative ({book.stock})')
+                if sold != results['reserved'] * quantity:
+                    failures.append(f'{book.title}: {sold} sold for {results["reserved"]} successful checkouts')
+                if book.sales != sold:
+                    failures.append(f'{book.title}: sales {book.sales} != sold {sold}')
+            if results['reserved'] * quantity > options['stock']:
+                failures.append(f'{results["reserved"]} checkouts succeeded for {options["stock"]} in stock')
+            if results['out_of_stock'] and results['reserved'] * quantity + quantity <= options['stock']:
+                failures.append('Checkouts were refused while stock was still available')
+        finally:
+            Book.objects.filter(pk__in=[book.pk for book in books]).delete()
+
+        self.stdout.write(
+            f"{options['checkouts']} checkouts of {len(books)} books x {quantity} "
+            f"({options['stock']} in stock), {options['workers']} workers, {elapsed:.2f}s"
+        )
+        self.stdout.write(
+            f"Reserved: {results['reserved']}  out of stock: {results['out_of_stock']}  "
+            f"lock errors: {results['errors']}"
+        )
+        if failures:
+            raise CommandError('Oversold:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('No overselling'))
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+
+def release_cancelled_orders(apps, schema_editor):
+    # Cancelling already put these orders' books back in stock
+    Order = apps.get_model('orders', 'Order')
+    Order.objects.filter(status='cancelled').update(stock_reserved=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_shippingfee'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stock_reserved',
+            field=models.BooleanField(default=True, editable=False, help_text='The ordered books are taken out of stock (cleared when the order is cancelled or its payment fails)'),
+        ),
+        migrations.RunPython(release_cancelled_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_stock_reserved'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shippingfee',
+            name='aliases',
+            field=models.TextField(blank=True, default='', help_text='Other spellings of the city that get this fee (one per line or comma-separated)'),
+        ),
+    ]
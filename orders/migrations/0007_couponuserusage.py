@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_existing_usages(apps, schema_editor):
+    # Seed the per-user counters from the usage history
+    CouponUsage = apps.get_model('orders', 'CouponUsage')
+    CouponUserUsage = apps.get_model('orders', 'CouponUserUsage')
+    CouponUserUsage.objects.bulk_create([
+        CouponUserUsage(coupon_id=row['coupon_id'], user_id=row['user_id'], uses=row['uses'])
+        for row in CouponUsage.objects.values('coupon_id', 'user_id').annotate(uses=models.Count('id')).order_by()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('orders', '0006_shippingfee_aliases'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CouponUserUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uses', models.PositiveIntegerField(default=0)),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_usages', to='orders.coupon')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coupon_usage_counts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Coupon User Usage',
+                'verbose_name_plural': 'Coupon User Usages',
+                'unique_together': {('coupon', 'user')},
+            },
+        ),
+        migrations.RunPython(count_existing_usages, migrations.RunPython.noop),
+    ]
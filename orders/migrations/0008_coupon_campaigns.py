@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_couponuserusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='campaign_size',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of generated codes'),
+        ),
+        migrations.AddField(
+            model_name='coupon',
+            name='is_campaign',
+            field=models.BooleanField(default=False, help_text='Redeemed only through its generated single-use codes (the code above is their prefix)'),
+        ),
+        migrations.CreateModel(
+            name='CampaignCode',
+            fields=[
+                ('code', models.CharField(max_length=24, primary_key=True, serialize=False)),
+                ('is_used', models.BooleanField(default=False)),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='campaign_codes', to='orders.coupon')),
+            ],
+            options={
+                'verbose_name': 'Campaign Code',
+                'verbose_name_plural': 'Campaign Codes',
+            },
+        ),
+    ]
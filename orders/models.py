@@ -44,6 +44,10 @@ class Order(models.Model):
     # Order Status
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
+    stock_reserved = models.BooleanField(
+        default=True, editable=False,
+        help_text='The ordered books are taken out of stock (cleared when the order is cancelled or its payment fails)'
+    )
     
     # Payment Info
     payment_method = models.CharField(max_length=50)  # bkash, nagad, rocket, cod, sslcommerz
@@ -246,6 +250,11 @@ class ShippingFee(models.Model):
         verbose_name="City Name (Bangla)",
         help_text="City name in Bangla (optional)"
     )
+    aliases = models.TextField(
+        blank=True,
+        default='',
+        help_text="Other spellings of the city that get this fee (one per line or comma-separated)"
+    )
     fee = models.DecimalField(
         max_digits=10, 
         decimal_places=2,
@@ -386,6 +395,13 @@ class Coupon(models.Model):
     # Status
     is_active = models.BooleanField(default=True, help_text="Whether the coupon is currently active")
     
+    # Bulk campaigns: the coupon holds the rules, customers enter its generated single-use codes
+    is_campaign = models.BooleanField(
+        default=False,
+        help_text="Redeemed only through its generated single-use codes (the code above is their prefix)"
+    )
+    campaign_size = models.PositiveIntegerField(default=0, editable=False, help_text="Number of generated codes")
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -423,8 +439,10 @@ class Coupon(models.Model):
         if not self.is_valid():
             return False, "This coupon is not valid"
         
-        # Check user usage count
-        usage_count = CouponUsage.objects.filter(coupon=self, user=user).count()
+        # Check user usage count (one indexed row per coupon and user)
+        usage_count = CouponUserUsage.objects.filter(
+            coupon=self, user=user
+        ).values_list('uses', flat=True).first() or 0
         if usage_count >= self.max_uses_per_user:
             return False, f"You have already used this coupon {self.max_uses_per_user} time(s)"
         
@@ -460,3 +478,34 @@ class CouponUsage(models.Model):
     
     def __str__(self):
         return f"{self.user.email} used {self.coupon.code}"
+
+
+class CampaignCode(models.Model):
+    """A single-use code of a bulk campaign (the rules live on its coupon, see orders/campaigns.py)"""
+    
+    code = models.CharField(max_length=24, primary_key=True)
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='campaign_codes')
+    is_used = models.BooleanField(default=False)
+    
+    class Meta:
+        verbose_name = 'Campaign Code'
+        verbose_name_plural = 'Campaign Codes'
+    
+    def __str__(self):
+        return self.code
+
+
+class CouponUserUsage(models.Model):
+    """How many times a user has redeemed a coupon, counted atomically (see orders/coupons.py)"""
+    
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='user_usages')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='coupon_usage_counts')
+    uses = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Coupon User Usage'
+        verbose_name_plural = 'Coupon User Usages'
+        unique_together = ('coupon', 'user')
+    
+    def __str__(self):
+        return f"{self.user.email}: {self.coupon.code} x{self.uses}"
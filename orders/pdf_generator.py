@@ -248,7 +248,7 @@ class InvoicePDFGenerator:
         ]
         
         # Add order items
-        for item in self.order.items.all():
+        for item in self.order.items.select_related('book'):
             table_data.append([
                 item.book.title if item.book else item.book_title,
                 item.book.author if item.book else item.book_author,
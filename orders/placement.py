@@ -0,0 +1,65 @@
+"""
+Order placement
+
+Checkout prices the cart once (cart_lines) and reuses those lines for the
+displayed totals, the order's subtotal and its items. place_order then
+writes the order in a fixed number of statements, whatever the cart size:
+
+    UPDATE books_book ...          stock and sales for every book (inventory.reserve_stock)
+    INSERT INTO orders_order ...
+    INSERT INTO orders_orderitem   all items, one bulk_create
+    INSERT INTO orders_orderstatushistory
+"""
+from django.db import transaction
+
+from .inventory import reserve_stock
+from .models import Order, OrderItem, OrderStatusHistory
+
+
+class OrderLine:
+    """A cart item priced at checkout time (`id` is the cart row's)"""
+
+    __slots__ = ('id', 'book', 'quantity', 'price', 'subtotal')
+
+    def __init__(self, book, quantity, id=None):
+        self.id = id
+        self.book = book
+        self.quantity = quantity
+        self.price = book.final_price
+        self.subtotal = self.price * quantity
+
+
+def cart_lines(cart_items):
+    """Price each cart item once (cart items must come with select_related('book'))"""
+    return [OrderLine(item.book, item.quantity, item.pk) for item in cart_items]
+
+
+def lines_subtotal(lines):
+    return sum(line.subtotal for line in lines)
+
+
+def place_order(user, lines, notes='Order placed', **order_fields):
+    """Reserve stock for the lines and write the order, its items and first status
+
+    All or nothing: raises inventory.InsufficientStock before anything is
+    written if a book ran out. order_fields go to Order (pricing, payment
+    method, shipping and gift fields).
+    """
+    with transaction.atomic():
+        reserve_stock((line.book.pk, line.quantity) for line in lines)
+        order = Order.objects.create(user=user, **order_fields)
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                book=line.book,
+                book_title=line.book.title,
+                book_author=line.book.author,
+                book_isbn=line.book.isbn,
+                quantity=line.quantity,
+                price=line.price,
+                subtotal=line.subtotal,
+            )
+            for line in lines
+        ])
+        OrderStatusHistory.objects.create(order=order, status='pending', notes=notes, changed_by=user)
+    return order
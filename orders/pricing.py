@@ -0,0 +1,115 @@
+"""
+Checkout pricing
+
+A Quote prices a cart snapshot once: its lines (see placement.OrderLine),
+subtotal, shipping for a city, coupon discount and total. The checkout page,
+apply_coupon, remove_coupon and order placement all read their numbers from
+a quote instead of summing cart rows and looking up the shipping fee and
+address each time. The order is created from the quote, so payment
+initiation charges exactly its total.
+
+Quotes are memoized in the cache under everything they depend on: the cart
+version (bumped by invalidate_cart), the catalog version (book prices), the
+shipping fee table version, the shipping city and the coupon. Changing any
+of them makes a new key. QUOTE_TIMEOUT bounds how long coupon validity
+(dates, use counts) can lag. Order placement always reprices from the
+database.
+
+Only the coupon's id is kept in the session. Its discount is computed from
+the current subtotal by each quote, so it can't go stale after the cart changes.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from accounts.models import Address
+from books.cart_utils import get_cart_owner, get_cart_queryset, get_cart_version
+from books.catalog_cache import get_catalog_version
+
+from .models import Coupon
+from .placement import cart_lines, lines_subtotal
+from .shipping import calculate_shipping_fee, get_shipping_fees_version, normalize_city
+
+QUOTE_TIMEOUT = 60 * 5
+
+CENTS = Decimal('0.01')
+
+# Session keys of the applied coupon ('discount' is only cleared, from older sessions)
+COUPON_SESSION_KEYS = ('coupon_code', 'coupon_id', 'discount')
+
+
+def coupon_discount(coupon, subtotal):
+    """What a coupon takes off this subtotal (0 if it doesn't apply)"""
+    if coupon is None or not subtotal or not coupon.is_valid() or subtotal < coupon.min_purchase_amount:
+        return Decimal('0.00')
+    return Decimal(coupon.calculate_discount(subtotal)).quantize(CENTS)
+
+
+class Quote:
+    """Prices of one cart snapshot for a shipping city and coupon"""
+
+    def __init__(self, lines, shipping_city=None, coupon=None):
+        self.lines = lines
+        self.subtotal = lines_subtotal(lines)
+        self.shipping_city = shipping_city
+        self.shipping = calculate_shipping_fee(shipping_city) if self.subtotal > 0 else Decimal('0.00')
+        self.discount = coupon_discount(coupon, self.subtotal)
+        # A coupon that no longer applies (expired, below its minimum) is dropped
+        self.coupon = coupon if self.discount > 0 else None
+        self.total = self.subtotal + self.shipping - self.discount
+
+    def reprice(self, shipping_city=None, coupon=None):
+        """The same lines for another shipping city or coupon"""
+        return Quote(self.lines, shipping_city, coupon)
+
+    def summary(self):
+        """Totals for JSON responses"""
+        return {
+            'subtotal': float(self.subtotal),
+            'shipping_cost': float(self.shipping),
+            'discount': float(self.discount),
+            'total': float(self.total),
+            'cart_count': len(self.lines),
+        }
+
+
+def default_shipping_city(user):
+    """City of the user's default (or first) address, which checkout prices shipping for"""
+    if not user.is_authenticated:
+        return None
+    return (
+        Address.objects.filter(user=user).order_by('-is_default', '-id').values_list('city', flat=True).first()
+    )
+
+
+def session_coupon_id(request):
+    return request.session.get('coupon_id')
+
+
+def quote_cache_key(owner, shipping_city, coupon_id):
+    return (
+        f'checkout_quote:{owner}:{get_cart_version(owner)}:{get_catalog_version()}:'
+        f'{get_shipping_fees_version()}:{coupon_id or 0}:{normalize_city(shipping_city)}'
+    )
+
+
+def get_quote(request, shipping_city=None, coupon_id=None, refresh=False):
+    """Quote the request's cart, memoized per cart version, city and coupon
+
+    refresh=True reprices from the database (order placement does).
+    """
+    owner = get_cart_owner(request)
+    if owner is None:
+        return Quote([], shipping_city)
+    key = quote_cache_key(owner, shipping_city, coupon_id)
+    quote = None if refresh else cache.get(key)
+    if quote is None:
+        coupon = Coupon.objects.filter(pk=coupon_id).first() if coupon_id else None
+        quote = Quote(cart_lines(get_cart_queryset(request).select_related('book')), shipping_city, coupon)
+        cache.set(key, quote, QUOTE_TIMEOUT)
+    return quote
+
+
+def clear_session_coupon(request):
+    for key in COUPON_SESSION_KEYS:
+        request.session.pop(key, None)
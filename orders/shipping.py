@@ -0,0 +1,282 @@
+"""
+Shipping fee lookup
+
+The whole active ShippingFee table is small, so each worker process keeps it
+in memory (ShippingFeeTable) with no database query per lookup. The table is
+bound to a version counter in the shared cache. Saving or deleting a
+ShippingFee or GiftCity bumps the version (see orders/signals.py), and every
+process reloads the table (two queries) on its next lookup, so admin edits
+apply immediately.
+
+Customers type cities freely ("Dhaka", "dhaka city", "ঢাকা", "Dhakka"), so a
+city is resolved in steps, cheapest first:
+
+1. exact: the normalized name matches a fee's English or Bangla name or an alias
+2. alias: it matches once filler words are dropped ("city", "district", "জেলা")
+3. sound: its transliteration key matches ("ঢাকা" and "dhaka" both give "dk",
+   see books.normalization), if only one fee has that key. Consonants alone
+   say little about short or English names ("Kalna" and "Khulna" share one),
+   so the hit must also be within a small edit distance of one of that
+   city's names, both spelled in Latin letters
+4. fuzzy: it is within a small edit distance of a known name, found through
+   a trigram index instead of comparing against every name
+
+GiftCity names are indexed too. They carry no fee of their own, so a known
+city without a fee row resolves to itself and gets the default fee. It is not
+fuzzy-matched onto a different city with a similar spelling. Each process
+remembers every resolution, keyed by normalized input, until the table is
+reloaded.
+"""
+import re
+import time
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from books.normalization import is_bangla, normalize_text, romanize_bangla, transliteration_key
+
+from .models import GiftCity, ShippingFee
+
+SHIPPING_FEES_VERSION_KEY = 'shipping_fees_version'
+
+# Charged when no city matches and no default fee is set
+FALLBACK_FEE = Decimal('120.00')
+NO_CITY_FEE = Decimal('0.00')
+
+CITY_PUNCTUATION_RE = re.compile(r"[.,;:'’`\"()/\\_-]")
+
+# Words customers add around a city name
+CITY_NOISE_WORDS = frozenset([
+    'city', 'district', 'zila', 'zilla', 'jela', 'sadar', 'town', 'division', 'metro', 'bangladesh', 'bd',
+    'শহর', 'সিটি', 'জেলা', 'সদর', 'বিভাগ', 'বাংলাদেশ',
+])
+
+# Fuzzy matching: names sharing the most trigrams are compared by edit distance
+FUZZY_CANDIDATES = 8
+FUZZY_MIN_LENGTH = 4
+
+# Resolutions remembered per process (cleared when full or the table reloads)
+RESOLUTION_CACHE_SIZE = 10000
+
+
+def normalize_city(name):
+    """Case, Unicode form, digits, punctuation and spacing folded, so spellings compare equal"""
+    return ' '.join(CITY_PUNCTUATION_RE.sub(' ', normalize_text(name or '')).split())
+
+
+def strip_noise_words(key):
+    return ' '.join(word for word in key.split() if word not in CITY_NOISE_WORDS)
+
+
+def sound_key(key):
+    """Transliteration key of a normalized name, word by word ('' if a word has none)"""
+    parts = []
+    for word in key.split():
+        word_key = transliteration_key(word)
+        if not word_key:
+            return ''
+        parts.append(word_key[1:])
+    return ' '.join(parts)
+
+
+def latin_spelling(key):
+    """A normalized name in Latin letters, so Bangla and English spellings can be compared"""
+    return romanize_bangla(key) if is_bangla(key) else key
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def max_edits(key):
+    """Edits tolerated for a name of this length"""
+    return 1 if len(key) <= 6 else 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (adjacent swaps count once), or limit + 1 if above limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def city_aliases(fee):
+    return [alias for alias in fee.aliases.replace(',', '\n').splitlines() if alias.strip()]
+
+
+class CityMatch:
+    """A free-text city resolved to a known city (`method` says how)"""
+
+    __slots__ = ('city', 'fee', 'method')
+
+    def __init__(self, city, fee, method):
+        self.city = city
+        self.fee = fee
+        self.method = method
+
+    def __repr__(self):
+        return f"CityMatch({self.city!r}, {self.fee}, {self.method!r})"
+
+
+class ShippingFeeTable:
+    """Known cities and their fees, indexed for exact, sound-alike and fuzzy lookups"""
+
+    def __init__(self, cities, default_fee, version=None):
+        # cities: [(name, canonical city, fee or None for cities without a fee row)]
+        self.default_fee = default_fee
+        self.version = version
+        self.names = {}
+        sounds = defaultdict(set)
+        self.sound_spellings = defaultdict(list)
+        for name, city, fee in cities:
+            key = normalize_city(name)
+            if key and key not in self.names:
+                self.names[key] = (city, fee)
+                sound = sound_key(key)
+                if sound:
+                    sounds[sound].add((city, fee))
+                    self.sound_spellings[sound].append(latin_spelling(key))
+        # A sound shared by different cities can't tell them apart
+        self.sounds = {sound: next(iter(entries)) for sound, entries in sounds.items() if len(entries) == 1}
+        self.grams = defaultdict(list)
+        for key in self.names:
+            for gram in trigrams(key):
+                self.grams[gram].append(key)
+        self.resolved = {}
+
+    @classmethod
+    def build(cls, version=None):
+        cities = []
+        default_fee = None
+        # Fee rows first so their names win over gift cities; name order settles shared aliases
+        for fee in ShippingFee.objects.filter(is_active=True).order_by('city_name'):
+            if fee.is_default:
+                default_fee = fee.fee
+            cities.extend((name, fee.city_name, fee.fee) for name in [fee.city_name, fee.city_name_bn, *city_aliases(fee)])
+        cities.extend((name, name, None) for name in GiftCity.objects.order_by('name').values_list('name', flat=True))
+        return cls(cities, default_fee if default_fee is not None else FALLBACK_FEE, version)
+
+    def _match(self, entry, method):
+        city, fee = entry
+        return CityMatch(city, fee if fee is not None else self.default_fee, method)
+
+    def _fuzzy(self, key):
+        shared = Counter(name for gram in trigrams(key) for name in self.grams.get(gram, ()))
+        limit = max_edits(key)
+        best, best_distance = set(), limit + 1
+        for name, _ in shared.most_common(FUZZY_CANDIDATES):
+            distance = edit_distance(key, name, limit)
+            if distance < best_distance:
+                best, best_distance = {self.names[name]}, distance
+            elif distance == best_distance and distance <= limit:
+                best.add(self.names[name])
+        # Two different cities equally close: don't guess
+        return next(iter(best)) if len(best) == 1 and best_distance <= limit else None
+
+    def _sound(self, key):
+        sound = sound_key(key)
+        if sound not in self.sounds:
+            return None
+        spelling = latin_spelling(key)
+        limit = max_edits(spelling)
+        if any(edit_distance(spelling, name, limit) <= limit for name in self.sound_spellings[sound]):
+            return self.sounds[sound]
+        return None
+
+    def _resolve(self, key):
+        if key in self.names:
+            return self._match(self.names[key], 'exact')
+        stripped = strip_noise_words(key) or key
+        if stripped in self.names:
+            return self._match(self.names[stripped], 'alias')
+        if len(stripped) < FUZZY_MIN_LENGTH:
+            return None
+        entry = self._sound(stripped)
+        if entry is not None:
+            return self._match(entry, 'sound')
+        entry = self._fuzzy(stripped)
+        if entry is not None:
+            return self._match(entry, 'fuzzy')
+        return None
+
+    def resolve(self, city):
+        """The known city a free-text city refers to, or None"""
+        key = normalize_city(city)
+        if not key:
+            return None
+        try:
+            return self.resolved[key]
+        except KeyError:
+            pass
+        match = self._resolve(key)
+        if len(self.resolved) >= RESOLUTION_CACHE_SIZE:
+            self.resolved.clear()
+        self.resolved[key] = match
+        return match
+
+    def fee_for(self, city):
+        if not city:
+            return NO_CITY_FEE
+        match = self.resolve(city)
+        return match.fee if match is not None else self.default_fee
+
+
+_local_table = None
+
+
+def get_shipping_fees_version():
+    version = cache.get(SHIPPING_FEES_VERSION_KEY)
+    if version is None:
+        # Seeded from the clock so an evicted counter never repeats an old version
+        cache.add(SHIPPING_FEES_VERSION_KEY, int(time.time()), None)
+        version = cache.get(SHIPPING_FEES_VERSION_KEY)
+    return version
+
+
+def invalidate_shipping_fees():
+    try:
+        cache.incr(SHIPPING_FEES_VERSION_KEY)
+    except ValueError:
+        cache.set(SHIPPING_FEES_VERSION_KEY, int(time.time()), None)
+
+
+def get_fee_table():
+    """This process's copy of the fee table, reloaded when the version changed"""
+    global _local_table
+
+    version = get_shipping_fees_version()
+    table = _local_table
+    if table is None or version is None or table.version != version:
+        table = ShippingFeeTable.build(version)
+        _local_table = table
+    return table
+
+
+def resolve_city(city):
+    """Resolve a free-text city to a known city and its fee (None if unknown)"""
+    return get_fee_table().resolve(city)
+
+
+def calculate_shipping_fee(city):
+    """Calculate shipping fee based on city
+
+    Args:
+        city: City name (string, English, Bangla, an alias or a near spelling)
+
+    Returns:
+        Decimal: Shipping fee (0 if no city, the matched city's fee, or the default fee)
+    """
+    return get_fee_table().fee_for(city)
@@ -0,0 +1,25 @@
+"""
+Signal handlers for orders app
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .coupons import invalidate_coupons
+from .models import Coupon, GiftCity, ShippingFee
+from .shipping import invalidate_shipping_fees
+
+
+@receiver(post_save, sender=ShippingFee)
+@receiver(post_delete, sender=ShippingFee)
+@receiver(post_save, sender=GiftCity)
+@receiver(post_delete, sender=GiftCity)
+def shipping_fee_changed(sender, instance, **kwargs):
+    """Reload the shipping fee table (and its city index) in every process on its next lookup"""
+    invalidate_shipping_fees()
+
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def coupon_changed(sender, instance, **kwargs):
+    """Drop every cached coupon (codes can be renamed, and unknown codes are cached too)"""
+    invalidate_coupons()
@@ -53,3 +53,15 @@ def send_order_delivered_task(order_id):
         send_order_delivered_email(order)
     except Order.DoesNotExist:
         pass
+
+
+@shared_task
+def generate_campaign_codes_task(coupon_id, count):
+    """Generate a bulk campaign's single-use codes task"""
+    from orders.campaigns import generate_codes
+    from orders.models import Coupon
+    try:
+        coupon = Coupon.objects.get(id=coupon_id, is_campaign=True)
+    except Coupon.DoesNotExist:
+        return 0
+    return generate_codes(coupon, count)
@@ -0,0 +1,274 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User
+from books.catalog_cache import get_catalog_version, get_stock_version
+from books.cart_utils import invalidate_cart
+from books.models import Book, Cart
+
+from .campaigns import find_campaign_code, generate_codes, mark_code_used
+from .coupons import CouponUnavailable, get_coupon, redeem_coupon
+from .inventory import InsufficientStock, release_order_stock, reserve_order_stock, reserve_stock, return_stock
+from .models import Coupon, ShippingFee
+from .placement import OrderLine, place_order
+from .pricing import Quote, get_quote
+from .shipping import ShippingFeeTable
+
+SHIPPING = {
+    'shipping_full_name': 'Test Customer',
+    'shipping_phone': '01700000000',
+    'shipping_address_line1': 'Road 1',
+    'shipping_city': 'Dhaka',
+    'shipping_state': 'Dhanmondi',
+    'shipping_postal_code': '1205',
+}
+
+
+class OrderTestMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(email='customer@example.com', password='secret', full_name='Customer')
+        self.book = Book.objects.create(title='Stocked Book', author='A. Writer', price=200, stock=5)
+        self.other_book = Book.objects.create(title='Scarce Book', author='A. Writer', price=100, stock=1)
+
+    def place(self, *quantities, **fields):
+        lines = [OrderLine(book, quantity) for book, quantity in quantities]
+        subtotal = sum(line.subtotal for line in lines)
+        return place_order(
+            self.user, lines, payment_method='cod', subtotal=subtotal, total=subtotal, **SHIPPING, **fields
+        )
+
+    def stock(self, book):
+        book.refresh_from_db()
+        return book.stock
+
+
+class StockReservationTests(OrderTestMixin, TestCase):
+    def test_reserve_takes_stock_and_counts_sales(self):
+        reserve_stock([(self.book.pk, 2), (self.book.pk, 1)])
+
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.stock, self.book.sales), (2, 3))
+
+    def test_shortage_reserves_nothing(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            reserve_stock([(self.book.pk, 1), (self.other_book.pk, 2)])
+
+        self.assertEqual([book.pk for book, _ in raised.exception.shortages], [self.other_book.pk])
+        self.assertEqual((self.stock(self.book), self.stock(self.other_book)), (5, 1))
+
+    def test_failed_placement_writes_no_order(self):
+        with self.assertRaises(InsufficientStock):
+            self.place((self.book, 1), (self.other_book, 2))
+
+        self.assertFalse(self.user.orders.exists())
+        self.assertEqual(self.stock(self.book), 5)
+
+    def test_release_returns_stock_once(self):
+        order = self.place((self.book, 2))
+        self.assertEqual(self.stock(self.book), 3)
+
+        self.assertTrue(release_order_stock(order))
+        self.assertFalse(release_order_stock(order))
+        self.assertEqual(self.stock(self.book), 5)
+
+        self.assertTrue(reserve_order_stock(order))
+        self.assertFalse(reserve_order_stock(order))
+        self.assertEqual(self.stock(self.book), 3)
+
+    def test_api_cancel_releases_stock(self):
+        order = self.place((self.book, 2))
+        self.client.force_login(self.user)
+
+        response = self.client.post(f'/api/orders/{order.pk}/cancel/')
+
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'cancelled')
+        self.assertFalse(order.stock_reserved)
+        self.assertEqual(self.stock(self.book), 5)
+
+    def test_only_selling_out_or_restocking_bumps_stock_version(self):
+        catalog_version, stock_version = get_catalog_version(), get_stock_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock([(self.book.pk, 1)])
+        self.assertEqual((get_catalog_version(), get_stock_version()), (catalog_version, stock_version))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_stock([(self.other_book.pk, 1)])
+        self.assertGreater(get_stock_version(), stock_version)
+
+        stock_version = get_stock_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            return_stock([(self.other_book.pk, 1)])
+        self.assertGreater(get_stock_version(), stock_version)
+        self.assertEqual(get_catalog_version(), catalog_version)
+
+
+class OrderPlacementTests(OrderTestMixin, TestCase):
+    def test_order_keeps_its_lines_and_status(self):
+        order = self.place((self.book, 2), (self.other_book, 1))
+
+        self.assertEqual(
+            list(order.items.order_by('book_title').values_list('book_title', 'quantity', 'price', 'subtotal')),
+            [('Scarce Book', 1, Decimal('100.00'), Decimal('100.00')), ('Stocked Book', 2, Decimal('200.00'), Decimal('400.00'))],
+        )
+        self.assertEqual(list(order.status_history.values_list('status', flat=True)), ['pending'])
+        self.assertEqual(order.total, 500)
+
+    def test_query_count_does_not_grow_with_lines(self):
+        books = [Book.objects.create(title=f'Book {index}', author='A. Writer', price=50, stock=5) for index in range(4)]
+
+        with CaptureQueriesContext(connection) as one_line:
+            self.place((self.book, 1))
+        with CaptureQueriesContext(connection) as many_lines:
+            self.place(*[(book, 1) for book in books])
+
+        self.assertEqual(len(many_lines), len(one_line))
+
+
+class QuoteTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        ShippingFee.objects.create(city_name='Dhaka', fee=60)
+        ShippingFee.objects.create(city_name='Outside Dhaka', fee=120, is_default=True)
+        now = timezone.now()
+        self.coupon = Coupon.objects.create(
+            code='SAVE10', discount_type='percentage', discount_value=10, min_purchase_amount=300,
+            valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1),
+        )
+        self.coupon.refresh_from_db()
+
+    def test_prices_lines_shipping_and_coupon(self):
+        quote = Quote([OrderLine(self.book, 2)], 'Dhaka City', self.coupon)
+
+        self.assertEqual(
+            (quote.subtotal, quote.shipping, quote.discount, quote.total),
+            (Decimal('400'), Decimal('60.00'), Decimal('40.00'), Decimal('420.00')),
+        )
+
+    def test_coupon_below_minimum_is_dropped(self):
+        quote = Quote([OrderLine(self.book, 1)], 'Sylhet', self.coupon)
+
+        self.assertIsNone(quote.coupon)
+        self.assertEqual((quote.shipping, quote.discount, quote.total), (Decimal('120.00'), 0, Decimal('320.00')))
+
+    def test_quote_is_memoized_until_the_cart_changes(self):
+        cart_item = Cart.objects.create(user=self.user, book=self.book, quantity=1)
+        request = RequestFactory().get('/checkout/')
+        request.user = self.user
+
+        self.assertEqual(get_quote(request, 'Dhaka').total, Decimal('260.00'))
+        with self.assertNumQueries(0):
+            self.assertEqual(get_quote(request, 'Dhaka').total, Decimal('260.00'))
+
+        cart_item.quantity = 2
+        cart_item.save()
+        invalidate_cart(request)
+        self.assertEqual(get_quote(request, 'Dhaka').total, Decimal('460.00'))
+
+
+class CouponRedemptionTests(OrderTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.other_user = User.objects.create_user(email='other@example.com', password='secret', full_name='Other')
+        now = timezone.now()
+        self.coupon = Coupon.objects.create(
+            code='FLASH', discount_type='fixed', discount_value=50, max_uses=1, max_uses_per_user=1,
+            valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1),
+        )
+
+    def assert_refused(self, user, reason, **kwargs):
+        with self.assertRaises(CouponUnavailable) as raised:
+            redeem_coupon(self.coupon, user, **kwargs)
+        self.assertEqual(raised.exception.reason, reason)
+
+    def test_max_uses_is_never_exceeded(self):
+        redeem_coupon(self.coupon, self.user)
+        self.assert_refused(self.other_user, 'used_up')
+
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 1)
+        self.assertEqual(self.coupon.usages.count(), 1)
+
+    def test_per_user_limit(self):
+        Coupon.objects.filter(pk=self.coupon.pk).update(max_uses=None)
+        self.coupon.refresh_from_db()
+        redeem_coupon(self.coupon, self.user)
+        self.assert_refused(self.user, 'user_limit')
+        redeem_coupon(self.coupon, self.other_user)
+
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.used_count, 2)
+
+    def test_campaign_code_is_redeemed_once(self):
+        Coupon.objects.filter(pk=self.coupon.pk).update(is_campaign=True, max_uses=None)
+        self.coupon.refresh_from_db()
+        generate_codes(self.coupon, 1)
+        code = self.coupon.campaign_codes.get().code
+
+        self.assertIsNone(get_coupon('FLASH'))
+        redeem_coupon(self.coupon, self.user, code=code)
+        self.assert_refused(self.other_user, 'code_used', code=code)
+
+
+class CityResolutionTests(TestCase):
+    def setUp(self):
+        self.table = ShippingFeeTable([
+            ('Dhaka', 'Dhaka', Decimal('60.00')),
+            ('ঢাকা', 'Dhaka', Decimal('60.00')),
+            ('Khulna', 'Khulna', Decimal('100.00')),
+            ('Rajshahi', 'Rajshahi', Decimal('110.00')),
+        ], Decimal('120.00'))
+
+    def test_spellings_resolve_to_their_city(self):
+        cases = {
+            'ঢাকা': ('Dhaka', 'exact'),
+            'Dhaka City': ('Dhaka', 'alias'),
+            'Dhakka': ('Dhaka', 'sound'),
+            'রাজশাহী': ('Rajshahi', 'sound'),
+            'Khulma': ('Khulna', 'fuzzy'),
+        }
+        for city, expected in cases.items():
+            with self.subTest(city=city):
+                match = self.table.resolve(city)
+                self.assertEqual((match.city, match.method), expected)
+
+    def test_different_places_sharing_consonants_get_default_fee(self):
+        for city in ['Kalna', 'Dak', 'Dhk', 'Dhuki']:
+            with self.subTest(city=city):
+                self.assertIsNone(self.table.resolve(city))
+                self.assertEqual(self.table.fee_for(city), Decimal('120.00'))
+
+
+class CampaignCodeTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.coupon = Coupon.objects.create(
+            code='EID24', description='Eid campaign', discount_type='fixed', discount_value=50, is_campaign=True,
+            valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1),
+        )
+
+    def test_generates_codes_in_batches_counting_once(self):
+        # Count before, three inserts, count after, campaign size
+        with self.assertNumQueries(6):
+            self.assertEqual(generate_codes(self.coupon, 12, batch_size=5), 12)
+
+        self.assertEqual(generate_codes(self.coupon, 3), 3)
+        self.coupon.refresh_from_db()
+        self.assertEqual(self.coupon.campaign_size, 15)
+        self.assertEqual(self.coupon.campaign_codes.count(), 15)
+
+    def test_code_is_found_and_used_once(self):
+        generate_codes(self.coupon, 1)
+        code = self.coupon.campaign_codes.get().code
+
+        self.assertEqual(find_campaign_code(code).coupon, self.coupon)
+        self.assertIsNone(find_campaign_code('EID24-NOTACODE0'))
+        self.assertTrue(mark_code_used(self.coupon, code))
+        self.assertFalse(mark_code_used(self.coupon, code))
@@ -4,13 +4,18 @@ from django.contrib import messages
 from django.utils import timezone
 from django.core.paginator import Paginator
 from django.conf import settings
-from decimal import Decimal
+from django.db import transaction
 from .models import Order, OrderItem, OrderStatusHistory
 from django.http import JsonResponse
 from .models import GiftCity, GiftArea, GiftZone, GiftForm, GiftOccasion
 from .forms import CheckoutForm, OrderTrackingForm
 from .email_utils import send_order_confirmation_email
-from books.models import Cart
+from .inventory import InsufficientStock, release_order_stock
+from .campaigns import find_campaign_code
+from .coupons import CouponUnavailable, forget_coupon, get_coupon, redeem_coupon
+from .placement import place_order
+from .pricing import clear_session_coupon, default_shipping_city, get_quote, session_coupon_id
+from books.cart_utils import get_cart_queryset, invalidate_cart
 from accounts.models import Address
 from payments.utils import initiate_payment
 import logging
@@ -18,81 +23,20 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def calculate_shipping_fee(city):
-    """Calculate shipping fee based on city
-    
-    Args:
-        city: City name (string)
-        
-    Returns:
-        Decimal: Shipping fee (0 if no city, database value for city, or default fee)
-    """
-    from .models import ShippingFee
-    from django.core.cache import cache
-    
-    if not city:
-        return Decimal('0.00')  # Return 0 if no city selected
-    
-    # Normalize city name for comparison (case-insensitive, strip whitespace)
-    city_normalized = city.strip().lower()
-    
-    # Check cache first for performance
-    cache_key = f'shipping_fee_{city_normalized}'
-    cached_fee = cache.get(cache_key)
-    if cached_fee is not None:
-        return Decimal(str(cached_fee))
-    
-    # Query database for city-specific fee
-    try:
-        shipping_fee = ShippingFee.objects.get(
-            city_name__iexact=city,
-            is_active=True
-        )
-        fee = shipping_fee.fee
-    except ShippingFee.DoesNotExist:
-        # Get default fee for cities not in the list
-        default_fee = ShippingFee.objects.filter(
-            is_default=True,
-            is_active=True
-        ).first()
-        fee = default_fee.fee if default_fee else Decimal('120.00')  # Fallback if no default set
-    
-    # Cache for 1 hour (3600 seconds)
-    cache.set(cache_key, float(fee), 3600)
-    return fee
-
-
 def checkout(request):
     """Checkout view - Shows cart and handles order placement"""
-    # Get cart items for both authenticated and guest users
-    cart_items = []
-    
-    if request.user.is_authenticated:
-        cart_items = Cart.objects.filter(user=request.user).select_related('book')
-    elif request.session.session_key:
-        cart_items = Cart.objects.filter(session_key=request.session.session_key).select_related('book')
-    
-    # Calculate totals
-    subtotal = sum(item.subtotal for item in cart_items) if cart_items else 0
-    
-    # Get addresses if user is authenticated (needed for shipping calculation)
-    addresses = Address.objects.filter(user=request.user).order_by('-is_default', '-id') if request.user.is_authenticated else []
-    
-    # Calculate shipping based on default/first address city
-    shipping_city = None
-    if request.user.is_authenticated and addresses:
-        # Get default address or first address
-        default_address = addresses.filter(is_default=True).first() or addresses.first()
-        if default_address:
-            shipping_city = default_address.city
-    
-    shipping = calculate_shipping_fee(shipping_city) if subtotal > 0 else Decimal('0.00')
-    
-    # Get coupon discount from session
-    discount = Decimal(str(request.session.get('discount', 0)))
-    coupon_code = request.session.get('coupon_code', None)
-    
-    total = subtotal + shipping - discount
+    # Price the cart once for the default address city and the applied coupon;
+    # placing an order reprices it from the database
+    quote = get_quote(
+        request, default_shipping_city(request.user), session_coupon_id(request),
+        refresh=request.method == 'POST',
+    )
+    lines = quote.lines
+    subtotal = quote.subtotal
+    shipping = quote.shipping
+    discount = quote.discount
+    coupon_code = request.session.get('coupon_code') if quote.coupon else None
+    total = quote.total
     
     # Handle form submission - REQUIRE LOGIN for order placement
     if request.method == 'POST':
@@ -102,16 +46,21 @@ def checkout(request):
             return redirect(f"{settings.LOGIN_URL}?next={request.path}")
         
         # Check if cart is empty
-        cart_items = Cart.objects.filter(user=request.user).select_related('book')
-        if not cart_items.exists():
+        if not lines:
             messages.error(request, 'Your cart is empty.')
             return redirect('orders:checkout')
         
+        # The applied coupon ran out or expired since it was applied: show the new total first
+        if session_coupon_id(request) and not quote.coupon:
+            clear_session_coupon(request)
+            messages.error(request, 'Your coupon has expired or is no longer available. Please review the new total.')
+            return redirect('orders:checkout')
+        
         # VALIDATION: Import MAX_ORDER_QUANTITY constraint
         from books.models import MAX_ORDER_QUANTITY_PER_BOOK
         
         # Check stock availability and order quantity limits
-        for item in cart_items:
+        for item in lines:
             # BUSINESS RULE: Maximum order quantity validation at checkout
             # Location: orders/views.py - checkout_view function
             # Constraint: Validates each cart item doesn't exceed MAX_ORDER_QUANTITY_PER_BOOK
@@ -126,9 +75,6 @@ def checkout(request):
                 messages.error(request, f'{item.book.title} has insufficient stock.')
                 return redirect('orders:checkout')
         
-        # Recalculate totals for order placement
-        subtotal = sum(item.subtotal for item in cart_items)
-        
         # Determine shipping city from selected/entered address
         shipping_city = None
         is_gift = request.POST.get('is_gift') == 'on'
@@ -176,7 +122,8 @@ def checkout(request):
                 else:
                     shipping_city = request.POST.get('city')
         
-        shipping = calculate_shipping_fee(shipping_city)
+        quote = quote.reprice(shipping_city, quote.coupon)
+        shipping = quote.shipping
         
         form = CheckoutForm(request.POST, user=request.user)
         if form.is_valid():
@@ -280,136 +227,106 @@ def checkout(request):
                         'shipping_country': 'Bangladesh',
                     }
             
-            # Get discount from session
-            discount = Decimal(str(request.session.get('discount', 0)))
-            final_total = subtotal + shipping - discount
+            discount = quote.discount
+            final_total = quote.total
             
-            # Create order
-            order = Order.objects.create(
-                user=request.user,
-                payment_method=form.cleaned_data['payment_method'],
-                subtotal=subtotal,
-                shipping_cost=shipping,
-                discount=discount,
-                total=final_total,
-                customer_notes=form.cleaned_data.get('customer_notes', ''),
-                # Gift related fields
-                is_gift=form.cleaned_data.get('is_gift', False),
-                gift_from_name=form.cleaned_data.get('gift_from_name', '') or None,
-                gift_from_phone=form.cleaned_data.get('gift_from_phone', '') or None,
-                gift_from_alt_phone=form.cleaned_data.get('gift_from_alt_phone', '') or None,
-                gift_message=form.cleaned_data.get('gift_message', '') or None,
-                gift_occasion=form.cleaned_data.get('gift_to_occasion', '') or None,
-                gift_zone=form.cleaned_data.get('gift_to_zone', '') or None,
-                gift_deliver_date=form.cleaned_data.get('gift_deliver_date', None),
-                **shipping_data
-            )
-
-            # If this was a gift order, create a separate GiftForm record for admin handling
-            if form.cleaned_data.get('is_gift'):
+            with transaction.atomic():
+                # Reserve stock and create the order with its items; nothing is written if any book ran out
                 try:
-                    city_obj = None
-                    area_obj = None
-                    zone_obj = None
-                    occasion_obj = None
-
-                    city_id = form.cleaned_data.get('gift_to_city')
-                    area_id = form.cleaned_data.get('gift_to_area')
-                    zone_id = form.cleaned_data.get('gift_to_zone')
-                    occasion_key = form.cleaned_data.get('gift_to_occasion')
-
-                    if city_id:
-                        try:
-                            city_obj = GiftCity.objects.get(pk=city_id)
-                        except GiftCity.DoesNotExist:
-                            city_obj = None
-                    if area_id:
-                        try:
-                            area_obj = GiftArea.objects.get(pk=area_id)
-                        except GiftArea.DoesNotExist:
-                            area_obj = None
-                    if zone_id:
-                        try:
-                            zone_obj = GiftZone.objects.get(pk=zone_id)
-                        except GiftZone.DoesNotExist:
-                            zone_obj = None
-                    if occasion_key:
-                        occasion_obj = GiftOccasion.objects.filter(key=occasion_key).first()
-
-                    GiftForm.objects.create(
-                        order=order,
-                        is_gift=True,
-                        from_name=form.cleaned_data.get('gift_from_name') or None,
-                        from_phone=form.cleaned_data.get('gift_from_phone') or None,
-                        from_alt_phone=form.cleaned_data.get('gift_from_alt_phone') or None,
-                        to_name=form.cleaned_data.get('gift_to_name') or None,
-                        to_phone=form.cleaned_data.get('gift_to_phone') or None,
-                        to_email=form.cleaned_data.get('gift_to_email') or None,
-                        to_address_line1=form.cleaned_data.get('gift_to_address_line1') or None,
-                        to_address_line2=None,
-                        city=city_obj,
-                        area=area_obj,
-                        zone=zone_obj,
-                        postal_code=None,
-                        state=None,
-                        occasion=occasion_obj,
-                        message=form.cleaned_data.get('gift_message') or None,
-                        deliver_date=form.cleaned_data.get('gift_deliver_date') or None,
+                    order = place_order(
+                        request.user,
+                        lines,
+                        payment_method=form.cleaned_data['payment_method'],
+                        subtotal=subtotal,
+                        shipping_cost=shipping,
+                        discount=discount,
+                        total=final_total,
+                        customer_notes=form.cleaned_data.get('customer_notes', ''),
+                        # Gift related fields
+                        is_gift=form.cleaned_data.get('is_gift', False),
+                        gift_from_name=form.cleaned_data.get('gift_from_name', '') or None,
+                        gift_from_phone=form.cleaned_data.get('gift_from_phone', '') or None,
+                        gift_from_alt_phone=form.cleaned_data.get('gift_from_alt_phone', '') or None,
+                        gift_message=form.cleaned_data.get('gift_message', '') or None,
+                        gift_occasion=form.cleaned_data.get('gift_to_occasion', '') or None,
+                        gift_zone=form.cleaned_data.get('gift_to_zone', '') or None,
+                        gift_deliver_date=form.cleaned_data.get('gift_deliver_date', None),
+                        **shipping_data
                     )
-                except Exception as e:
-                    logger.exception('Failed to create GiftForm record: %s', e)
-            
-            # Create order items
-            for item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    book=item.book,
-                    book_title=item.book.title,
-                    book_author=item.book.author,
-                    book_isbn=item.book.isbn,
-                    quantity=item.quantity,
-                    price=item.book.final_price,
-                    subtotal=item.subtotal
-                )
-                
-                # Update book stock and sales
-                item.book.stock -= item.quantity
-                item.book.sales += item.quantity
-                item.book.save(update_fields=['stock', 'sales'])
-            
-            # Create initial status history
-            OrderStatusHistory.objects.create(
-                order=order,
-                status='pending',
-                notes='Order placed',
-                changed_by=request.user
-            )
+                except InsufficientStock as e:
+                    for book, _ in e.shortages:
+                        messages.error(request, f'{book.title} has insufficient stock.')
+                    return redirect('orders:checkout')
+
+                # If this was a gift order, create a separate GiftForm record for admin handling
+                if form.cleaned_data.get('is_gift'):
+                    try:
+                        city_obj = None
+                        area_obj = None
+                        zone_obj = None
+                        occasion_obj = None
+
+                        city_id = form.cleaned_data.get('gift_to_city')
+                        area_id = form.cleaned_data.get('gift_to_area')
+                        zone_id = form.cleaned_data.get('gift_to_zone')
+                        occasion_key = form.cleaned_data.get('gift_to_occasion')
+
+                        if city_id:
+                            try:
+                                city_obj = GiftCity.objects.get(pk=city_id)
+                            except GiftCity.DoesNotExist:
+                                city_obj = None
+                        if area_id:
+                            try:
+                                area_obj = GiftArea.objects.get(pk=area_id)
+                            except GiftArea.DoesNotExist:
+                                area_obj = None
+                        if zone_id:
+                            try:
+                                zone_obj = GiftZone.objects.get(pk=zone_id)
+                            except GiftZone.DoesNotExist:
+                                zone_obj = None
+                        if occasion_key:
+                            occasion_obj = GiftOccasion.objects.filter(key=occasion_key).first()
+
+                        with transaction.atomic():
+                            GiftForm.objects.create(
+                                order=order,
+                                is_gift=True,
+                                from_name=form.cleaned_data.get('gift_from_name') or None,
+                                from_phone=form.cleaned_data.get('gift_from_phone') or None,
+                                from_alt_phone=form.cleaned_data.get('gift_from_alt_phone') or None,
+                                to_name=form.cleaned_data.get('gift_to_name') or None,
+                                to_phone=form.cleaned_data.get('gift_to_phone') or None,
+                                to_email=form.cleaned_data.get('gift_to_email') or None,
+                                to_address_line1=form.cleaned_data.get('gift_to_address_line1') or None,
+                                to_address_line2=None,
+                                city=city_obj,
+                                area=area_obj,
+                                zone=zone_obj,
+                                postal_code=None,
+                                state=None,
+                                occasion=occasion_obj,
+                                message=form.cleaned_data.get('gift_message') or None,
+                                deliver_date=form.cleaned_data.get('gift_deliver_date') or None,
+                            )
+                    except Exception as e:
+                        logger.exception('Failed to create GiftForm record: %s', e)
             
-            # Record coupon usage if coupon was used
-            coupon_id = request.session.get('coupon_id')
-            if coupon_id:
-                from .models import Coupon, CouponUsage
-                try:
-                    coupon = Coupon.objects.get(id=coupon_id)
-                    # Create coupon usage record
-                    CouponUsage.objects.create(
-                        coupon=coupon,
-                        user=request.user,
-                        order=order
-                    )
-                    # Increment coupon used count
-                    coupon.used_count += 1
-                    coupon.save(update_fields=['used_count'])
-                    
-                    # Clear coupon from session
-                    for key in ['coupon_code', 'coupon_id', 'discount']:
-                        if key in request.session:
-                            del request.session[key]
-                except Coupon.DoesNotExist:
-                    pass
+                # Count the coupon use within its limits; a coupon used up meanwhile cancels the order
+                if quote.coupon:
+                    try:
+                        redeem_coupon(quote.coupon, request.user, order, code=request.session.get('coupon_code'))
+                    except CouponUnavailable as e:
+                        transaction.set_rollback(True)
+                        clear_session_coupon(request)
+                        messages.error(request, f'{e}. Your order was not placed, please review the new total.')
+                        return redirect('orders:checkout')
+                clear_session_coupon(request)
             
-            # Clear cart
-            cart_items.delete()
+                # Clear cart
+                get_cart_queryset(request).delete()
+                invalidate_cart(request)
             
             # Handle payment
             payment_method = form.cleaned_data['payment_method']
@@ -463,7 +380,7 @@ def checkout(request):
     # Prepare context (discount already calculated above)
     context = {
         'form': form,
-        'cart_items': cart_items,
+        'cart_items': lines,
         'subtotal': subtotal,
         'shipping_cost': shipping,
         'discount': discount,
@@ -649,11 +566,7 @@ def cancel_order(request, order_number):
         )
         
         # Restore stock
-        for item in order.items.all():
-            if item.book:
-                item.book.stock += item.quantity
-                item.book.sales -= item.quantity
-                item.book.save(update_fields=['stock', 'sales'])
+        release_order_stock(order, 'cancelled by customer')
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({'success': True, 'message': 'Order cancelled successfully.'})
@@ -729,9 +642,6 @@ def gift_zones(request):
 def apply_coupon(request):
     """Apply coupon code"""
     from django.http import JsonResponse
-    from .models import Coupon
-    from books.models import Cart
-    from decimal import Decimal
     
     if request.method == 'POST':
         coupon_code = request.POST.get('coupon_code', '').strip().upper()
@@ -739,10 +649,15 @@ def apply_coupon(request):
         if not coupon_code:
             return JsonResponse({'success': False, 'message': 'Please enter a coupon code'})
         
-        # Get coupon from database
-        try:
-            coupon = Coupon.objects.get(code=coupon_code)
-        except Coupon.DoesNotExist:
+        # A bulk campaign code is one primary key lookup; other coupons come from the cache
+        campaign_code = find_campaign_code(coupon_code)
+        if campaign_code is not None:
+            coupon = campaign_code.coupon
+            if campaign_code.is_used:
+                return JsonResponse({'success': False, 'message': 'This coupon code has already been used'})
+        else:
+            coupon = get_coupon(coupon_code)
+        if coupon is None:
             return JsonResponse({'success': False, 'message': 'Invalid coupon code'})
         
         # Check if coupon is valid
@@ -755,50 +670,34 @@ def apply_coupon(request):
             if not can_use:
                 return JsonResponse({'success': False, 'message': message})
         
-        # Calculate cart subtotal
-        if request.user.is_authenticated:
-            cart_items = Cart.objects.filter(user=request.user)
-        else:
-            cart_items = Cart.objects.filter(session_key=request.session.session_key)
-        
-        subtotal = sum(item.subtotal for item in cart_items)
+        # Quote the cart with this coupon (cached; checkout reuses it)
+        quote = get_quote(request, default_shipping_city(request.user), coupon.id)
         
         # Check minimum purchase amount
-        if subtotal < coupon.min_purchase_amount:
+        if quote.subtotal < coupon.min_purchase_amount:
             return JsonResponse({
                 'success': False,
                 'message': f'Minimum purchase amount of ৳{coupon.min_purchase_amount} required to use this coupon'
             })
         
-        # Calculate discount
-        discount = coupon.calculate_discount(subtotal)
+        # The cached coupon may not show it was used up; the quote reads it from the database
+        if quote.coupon is None:
+            forget_coupon(coupon.code)
+            return JsonResponse({'success': False, 'message': 'This coupon has expired or is no longer active'})
         
-        # Store coupon in session
-        request.session['coupon_code'] = coupon.code
+        # Store the coupon in session; its discount is recomputed by every quote
+        clear_session_coupon(request)
+        request.session['coupon_code'] = coupon_code
         request.session['coupon_id'] = coupon.id
-        request.session['discount'] = float(discount)
         
-        # Recalculate totals to return to frontend (so page doesn't need full reload)
-        # Get shipping city from default address
-        shipping_city = None
-        if request.user.is_authenticated:
-            default_address = Address.objects.filter(user=request.user, is_default=True).first()
-            if default_address:
-                shipping_city = default_address.city
-        
-        shipping = calculate_shipping_fee(shipping_city) if subtotal > 0 else Decimal('0.00')
-        total = Decimal(subtotal) + shipping - Decimal(str(discount))
-
+        # Return updated totals so the page doesn't need a full reload
+        discount = quote.discount
         return JsonResponse({
             'success': True,
             'message': f'Coupon applied! You saved ৳{discount:.2f}',
-            'discount': float(discount),
-            'coupon_code': coupon.code,
+            'coupon_code': coupon_code,
             'discount_display': f'৳{discount:.2f}',
-            'subtotal': float(subtotal),
-            'shipping_cost': float(shipping),
-            'total': float(total),
-            'cart_count': cart_items.count() if hasattr(cart_items, 'count') else len(cart_items)
+            **quote.summary(),
         })
     
     return JsonResponse({'success': False, 'message': 'Invalid request'})
@@ -810,37 +709,13 @@ def remove_coupon(request):
     
     if request.method == 'POST':
         # Remove coupon from session
-        for key in ['coupon_code', 'coupon_id', 'discount']:
-            if key in request.session:
-                del request.session[key]
-        # Recalculate totals and return updated summary so frontend can update without reload
-        from books.models import Cart
-        if request.user.is_authenticated:
-            cart_items = Cart.objects.filter(user=request.user)
-        else:
-            cart_items = Cart.objects.filter(session_key=request.session.session_key)
-
-        subtotal = sum(item.subtotal for item in cart_items) if cart_items else 0
-        
-        # Get shipping city from default address for coupon removal
-        shipping_city = None
-        if request.user.is_authenticated:
-            default_address = Address.objects.filter(user=request.user, is_default=True).first()
-            if default_address:
-                shipping_city = default_address.city
-        
-        shipping = calculate_shipping_fee(shipping_city) if subtotal > 0 else Decimal('0.00')
-        discount = Decimal(str(request.session.get('discount', 0)))
-        total = Decimal(subtotal) + shipping - discount
-
+        clear_session_coupon(request)
+        # Return the updated summary so the frontend can update without reload
+        quote = get_quote(request, default_shipping_city(request.user))
         return JsonResponse({
             'success': True,
             'message': 'Coupon removed successfully',
-            'subtotal': float(subtotal),
-            'shipping_cost': float(shipping),
-            'total': float(total),
-            'discount': float(discount),
-            'cart_count': cart_items.count() if hasattr(cart_items, 'count') else len(cart_items)
+            **quote.summary(),
         })
     
     return JsonResponse({'success': False, 'message': 'Invalid request'})
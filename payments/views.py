@@ -9,6 +9,7 @@ from .models import Payment
 from orders.models import Order, OrderStatusHistory
 from rentals.models import BookRental, RentalStatusHistory
 from orders.email_utils import send_order_confirmation_email
+from orders.inventory import InsufficientStock, release_order_stock, reserve_order_stock
 from .sslcommerz import SSLCommerzPayment
 import logging
 import json
@@ -57,6 +58,19 @@ def ensure_session_valid(request, order):
         return None
 
 
+def take_back_stock(order):
+    """Reserve stock again for an order paid after an earlier failed attempt released it"""
+    try:
+        reserve_order_stock(order)
+    except InsufficientStock as e:
+        logger.error(f"Order {order.order_number} was paid but is no longer in stock: {e}")
+        OrderStatusHistory.objects.create(
+            order=order,
+            status=order.status,
+            notes=f'Paid after its stock was released, and no longer in stock: {e}',
+        )
+
+
 def bkash_callback(request):
     """bKash payment callback"""
     payment_id = request.GET.get('paymentID')
@@ -264,6 +278,7 @@ def sslcommerz_success(request):
             reference_obj.status = 'confirmed'
             reference_obj.confirmed_at = timezone.now()
             reference_obj.save()
+            take_back_stock(reference_obj)
             
             # Create order status history
             OrderStatusHistory.objects.create(
@@ -346,6 +361,7 @@ def sslcommerz_fail(request):
             order = payment.order
             order.payment_status = 'failed'
             order.save()
+            release_order_stock(order, 'payment failed')
             
             OrderStatusHistory.objects.create(
                 order=order,
@@ -409,6 +425,7 @@ def sslcommerz_cancel(request):
             order = payment.order
             order.payment_status = 'pending'
             order.save()
+            release_order_stock(order, 'payment cancelled')
             
             OrderStatusHistory.objects.create(
                 order=order,
@@ -484,6 +501,7 @@ def sslcommerz_ipn(request):
                         order.status = 'confirmed'
                         order.confirmed_at = timezone.now()
                         order.save()
+                        take_back_stock(order)
                         
                         OrderStatusHistory.objects.create(
                             order=order,
@@ -0,0 +1,43 @@
+"""
+Rental availability map
+
+Which books can be rented, and under which active plans, as one dict keyed by
+book ID (book_id -> plan IDs in display order). It is built with a single
+query over the RentalPlan.books table and cached per catalog version; plan
+saves, deletes and RentalPlan.books changes bump the version (see
+rentals/signals.py), so the map is rebuilt on the next read.
+
+Listings and book_detail look books up in the map instead of querying plans
+per book.
+"""
+from books.catalog_cache import get_or_build
+
+from .models import RentalPlan
+
+
+def build_rental_availability():
+    availability = {}
+    rows = RentalPlan.books.through.objects.filter(
+        rentalplan__is_active=True
+    ).order_by('rentalplan__order', 'rentalplan__days', 'rentalplan_id').values_list('book_id', 'rentalplan_id')
+    for book_id, plan_id in rows:
+        availability.setdefault(book_id, []).append(plan_id)
+    return availability
+
+
+def get_rental_availability():
+    """book_id -> IDs of the active rental plans the book is offered under"""
+    return get_or_build('rental_availability', build_rental_availability)
+
+
+def rental_plan_ids(book_id):
+    return get_rental_availability().get(book_id, [])
+
+
+def annotate_rentable(books):
+    """Set `is_rentable` on each book; returns the books as a list"""
+    availability = get_rental_availability()
+    books = list(books)
+    for book in books:
+        book.is_rentable = book.id in availability
+    return books
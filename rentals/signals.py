@@ -0,0 +1,23 @@
+"""
+Signal handlers for rentals app
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from books.catalog_cache import bump_catalog_version
+
+from .models import RentalPlan
+
+
+@receiver(post_save, sender=RentalPlan)
+@receiver(post_delete, sender=RentalPlan)
+def rental_plan_changed(sender, instance, **kwargs):
+    """Rebuild the rental availability map (and the pages showing it)"""
+    bump_catalog_version()
+
+
+@receiver(m2m_changed, sender=RentalPlan.books.through)
+def rental_plan_books_changed(sender, action, **kwargs):
+    """Books added to or removed from a plan, from either side of the relation"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_catalog_version()
@@ -79,6 +79,51 @@ $(document).ready(function() {
     }, 5000);
 });
 
+// Catalog page bodies come from a shared fragment cache and render every
+// wishlist heart empty; mark this visitor's books here. Pages pass the IDs
+// inline (#wishlist-book-ids), otherwise they are fetched with the cart count.
+function markWishlistButtons(bookIds) {
+    const ids = new Set(bookIds.map(String));
+    document.querySelectorAll('.toggle-wishlist[data-book-id]').forEach(function(button) {
+        if (!ids.has(String(button.dataset.bookId))) {
+            return;
+        }
+        button.classList.add('active');
+        button.dataset.inWishlist = 'true';
+        const icon = button.querySelector('i');
+        if (icon) {
+            icon.classList.remove('far');
+            icon.classList.add('fas');
+        }
+    });
+}
+
+function applyUserFragments() {
+    const inline = document.getElementById('wishlist-book-ids');
+    if (inline) {
+        markWishlistButtons(JSON.parse(inline.textContent));
+        return;
+    }
+    if (!document.querySelector('.toggle-wishlist')) {
+        return;
+    }
+    fetch('/api/user-fragments/', {credentials: 'same-origin'})
+        .then(response => response.json())
+        .then(data => {
+            markWishlistButtons(data.wishlist_book_ids || []);
+            const cartBadge = $('.cart-count');
+            cartBadge.text(data.cart_count);
+            if (data.cart_count > 0) {
+                cartBadge.show();
+            } else {
+                cartBadge.hide();
+            }
+        })
+        .catch(error => console.error('User fragments:', error));
+}
+
+document.addEventListener('DOMContentLoaded', applyUserFragments);
+
 // Helper function to get CSRF token
 function getCookie(name) {
     let cookieValue = null;